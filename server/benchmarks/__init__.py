@@ -0,0 +1,7 @@
+"""
+Benchmarks for the voice module
+
+Run from the ``server`` directory, e.g. ``python -m benchmarks.tts_pipeline``.
+All external services are replaced with the local stand-ins in
+``benchmarks.fakes``, so no credentials or network access are required.
+"""
@@ -0,0 +1,136 @@
+"""
+Per-session serialization and upstream admission control under load
+
+1. Same session: ``--same-session`` requests of one session arrive at
+   once. Without session locks their turns interleave, so the stored
+   history has runs of user messages and Link AI sees other requests'
+   questions; with the locks every turn is a user/assistant pair. A
+   session pending limit sheds the excess instead of queuing it.
+2. Spike: ``--requests`` requests of different sessions arrive at once at
+   a Link AI stub that answers HTTP 429 beyond ``--upstream-capacity``
+   concurrent calls. Without admission control most of the spike fails
+   upstream after a full round trip; with a Link AI limit matching the
+   upstream capacity requests wait in a bounded queue and the excess is
+   rejected with a 503 in milliseconds. Prints outcomes, latency
+   percentiles and the limiter's queue and wait metrics.
+
+Usage: python -m benchmarks.admission [--requests 400] [--same-session 8]
+"""
+import time
+import asyncio
+import argparse
+
+from .fakes import FakeStorage, FakeTextToSpeech, LinkAIStub, build_dialogue, print_table
+
+REPLY = "我明白你的感受，我们慢慢来。"
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def interleaved(messages):
+    """Number of places where two messages of the same role follow each other"""
+    return sum(a["role"] == b["role"] for a, b in zip(messages, messages[1:]))
+
+
+async def same_session(args, stub, options):
+    async with build_dialogue(
+        stub.url,
+        tts=FakeTextToSpeech(base_latency=args.tts_latency, per_char_latency=0),
+        storage=FakeStorage(latency=0),
+        history_max_turns=None,
+        **options
+    ) as dialogue:
+        results = await asyncio.gather(*(
+            dialogue.process_text_message(f"question {i}", "shared", "bench-voice")
+            for i in range(args.same_session)
+        ))
+        messages = dialogue._get_session_messages("shared")
+    ok = sum(result["success"] for result in results)
+    shed = sum(result.get("status") == 503 for result in results)
+    return ok, shed, interleaved(messages), len(messages)
+
+
+async def spike(args, options):
+    async with LinkAIStub(REPLY, latency=args.llm_latency, max_concurrency=args.upstream_capacity) as stub:
+        async with build_dialogue(
+            stub.url,
+            tts=FakeTextToSpeech(base_latency=args.tts_latency, per_char_latency=0),
+            storage=FakeStorage(latency=0),
+            tts_workers=args.upstream_capacity,
+            storage_workers=args.upstream_capacity,
+            **options
+        ) as dialogue:
+            async def request(i):
+                start = time.perf_counter()
+                result = await dialogue.process_text_message("hello", f"session-{i}", "bench-voice")
+                return result, time.perf_counter() - start
+
+            start = time.perf_counter()
+            outcomes = await asyncio.gather(*(request(i) for i in range(args.requests)))
+            elapsed = time.perf_counter() - start
+            stats = dialogue.admission_stats()
+    return outcomes, elapsed, stub, stats
+
+
+async def main(args):
+    rows = []
+    async with LinkAIStub(REPLY, latency=args.llm_latency) as stub:
+        for name, options in (
+            ("no session locks", dict(serialize_sessions=False)),
+            ("session locks", dict(session_max_pending=None)),
+            ("session locks, 4 pending", dict(session_max_pending=4)),
+        ):
+            ok, shed, mixed, stored = await same_session(args, stub, options)
+            rows.append((name, ok, shed, stored, mixed))
+    print(f"{args.same_session} concurrent requests on one session")
+    print_table(rows, ("mode", "succeeded", "shed (503)", "messages stored", "interleaved pairs"))
+
+    rows = []
+    limiter_rows = []
+    for name, options in (
+        ("no admission control", dict(upstream_limits={"llm": None, "tts": None, "storage": None})),
+        (f"llm limit {args.upstream_capacity}", dict(
+            upstream_limits={"llm": args.upstream_capacity},
+            upstream_max_queue=args.max_queue,
+            upstream_max_wait=args.max_wait
+        )),
+    ):
+        outcomes, elapsed, stub, stats = await spike(args, options)
+        ok = [latency for result, latency in outcomes if result["success"]]
+        shed = [latency for result, latency in outcomes if result.get("status") == 503]
+        failed = len(outcomes) - len(ok) - len(shed)
+        rows.append((
+            name, len(ok), failed, len(shed), stub.throttled,
+            f"{percentile(ok, 0.5) * 1000:.0f} / {percentile(ok, 0.95) * 1000:.0f} ms",
+            f"{percentile(shed, 0.95) * 1000:.0f} ms" if shed else "-",
+            f"{elapsed:.2f} s"
+        ))
+        llm = stats["upstreams"]["llm"]
+        limiter_rows.append((
+            name, llm["peak_in_flight"], llm["peak_queued"],
+            llm["rejected_queue_full"], llm["rejected_timeout"],
+            f"{llm['wait_ms_p50']:.0f} / {llm['wait_ms_p95']:.0f} / {llm['wait_ms_max']:.0f} ms"
+        ))
+
+    print(f"\n{args.requests} concurrent requests, Link AI stub: {args.llm_latency * 1000:.0f} ms, "
+          f"429 beyond {args.upstream_capacity} in flight; queue {args.max_queue}, max wait {args.max_wait:g} s")
+    print_table(rows, ("mode", "succeeded", "failed upstream", "shed (503)", "upstream 429s",
+                       "ok p50 / p95", "shed p95", "wall time"))
+    print()
+    print_table(limiter_rows, ("llm limiter", "peak in flight", "peak queued", "rejected (queue full)",
+                               "rejected (timeout)", "wait p50 / p95 / max"))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--same-session', type=int, default=8)
+    parser.add_argument('--upstream-capacity', type=int, default=16)
+    parser.add_argument('--max-queue', type=int, default=64)
+    parser.add_argument('--max-wait', type=float, default=1.0)
+    parser.add_argument('--llm-latency', type=float, default=0.2)
+    parser.add_argument('--tts-latency', type=float, default=0.05)
+    asyncio.run(main(parser.parse_args()))
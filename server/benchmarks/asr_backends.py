@@ -0,0 +1,82 @@
+"""
+ASR latency per backend and the effect of routing short utterances
+
+Two stub backends stand in for a remote engine (a fixed network round trip)
+and a local engine (cost grows with the audio length). A mix of short and
+long utterances is recognized with the remote engine only, the local engine
+only, and with short utterances routed to the local engine; the per-backend
+counters from SpeechRecognizer.backend_stats() are printed for each run.
+
+Usage: python -m benchmarks.asr_backends [--requests 200]
+"""
+import random
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from voice.asr_backends import StubBackend, register_backend
+from voice.speech_recognition import SpeechRecognizer
+
+from .asr_in_memory import make_wav
+from .fakes import print_table
+
+
+@register_backend("remote-stub")
+class RemoteStub(StubBackend):
+    """Stub with the latency profile of a hosted recognizer"""
+
+
+@register_backend("local-stub")
+class LocalStub(StubBackend):
+    """Stub with the latency profile of an on-box engine"""
+
+
+def run(utterances, args, **options):
+    recognizer = SpeechRecognizer(**options)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(recognizer.recognize_from_bytes, utterances))
+    elapsed = time.perf_counter() - start
+    assert all(set(result) == {"text", "success"} and result["success"] for result in results), results[0]
+    return elapsed, recognizer.backend_stats()
+
+
+def main(args):
+    rng = random.Random(0)
+    short, long = make_wav(1.5), make_wav(8.0)
+    utterances = [short if rng.random() < args.short_share else long for _ in range(args.requests)]
+
+    remote = {"text": "你好", "latency": args.remote_latency}
+    local = {"text": "你好", "latency": args.local_latency, "per_second_latency": args.local_per_second}
+    configs = (
+        ("remote only", dict(backend="remote-stub", backend_options=remote)),
+        ("local only", dict(backend="local-stub", backend_options=local)),
+        ("short -> local", dict(backend="remote-stub", backend_options=remote,
+                                short_backend="local-stub", short_backend_options=local)),
+    )
+
+    rows = []
+    for name, options in configs:
+        elapsed, stats = run(utterances, args, **options)
+        total = f"{elapsed * 1000:.0f} ms"
+        for backend, snapshot in sorted(stats.items()):
+            rows.append((
+                name, total, backend, snapshot["requests"],
+                f"{snapshot['p50_ms']:.0f} ms", f"{snapshot['p95_ms']:.0f} ms",
+                f"{snapshot['real_time_factor']:.3f}"
+            ))
+            name = total = ""
+
+    print(f"{args.requests} utterances ({args.short_share:.0%} of 1.5 s, rest 8 s) on {args.workers} ASR threads")
+    print_table(rows, ("routing", "total", "backend", "requests", "p50", "p95", "real-time factor"))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--short-share', type=float, default=0.7)
+    parser.add_argument('--remote-latency', type=float, default=0.25)
+    parser.add_argument('--local-latency', type=float, default=0.01)
+    parser.add_argument('--local-per-second', type=float, default=0.05)
+    main(parser.parse_args())
@@ -0,0 +1,101 @@
+"""
+Time to transcript for a long voice note, whole versus in chunks
+
+A voice note of ``--seconds`` of speech phrases separated by short pauses
+is recognized by a stub backend whose latency is a fixed per-request cost
+plus a cost per second of audio. Compares one request for the whole file
+with chunks split at pauses and recognized concurrently, both through
+SpeechRecognizer.recognize_chunked and VoiceDialogue.stream_transcript,
+where the first partial transcript arrives long before the last.
+
+Usage: python -m benchmarks.asr_chunked [--seconds 60] [--chunk-seconds 10]
+"""
+import io
+import time
+import wave
+import asyncio
+import argparse
+
+import numpy as np
+
+from voice.speech_recognition import SpeechRecognizer
+
+from .fakes import LinkAIStub, build_dialogue, print_table
+
+
+def make_voice_note(seconds, phrase=3.5, pause=0.5, sample_rate=16000, seed=0):
+    """Phrases of speech-level noise separated by pauses of room noise"""
+    rng = np.random.default_rng(seed)
+    parts, length = [], 0.0
+    while length < seconds:
+        parts.append(rng.normal(0, 0.2, int(phrase * sample_rate)))
+        parts.append(rng.normal(0, 0.001, int(pause * sample_rate)))
+        length += phrase + pause
+    pcm = (np.clip(np.concatenate(parts), -1, 1) * 32767).astype(np.int16)
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def make_recognizer(args):
+    return SpeechRecognizer(
+        backend="stub",
+        backend_options={"text": "一段话。", "latency": args.latency, "per_second_latency": args.per_second},
+        chunk_seconds=args.chunk_seconds,
+        chunk_workers=args.workers
+    )
+
+
+async def stream(stub_url, audio, args):
+    recognizer = make_recognizer(args)
+    async with build_dialogue(stub_url, recognizer=recognizer, asr_workers=args.workers) as dialogue:
+        start = time.perf_counter()
+        first = None
+        async for event in dialogue.stream_transcript(audio):
+            if event["type"] == "partial" and first is None:
+                first = time.perf_counter() - start
+            if event["type"] == "transcript":
+                assert event["success"], event
+                chunks = len(event["text"]) // len("一段话。")
+    return first, time.perf_counter() - start, chunks
+
+
+async def main(args):
+    audio = make_voice_note(args.seconds)
+    rows = []
+
+    recognizer = make_recognizer(args)
+    start = time.perf_counter()
+    assert recognizer.recognize_from_bytes(audio)["success"]
+    elapsed = time.perf_counter() - start
+    rows.append(("whole file", 1, f"{elapsed * 1000:.0f} ms", f"{elapsed * 1000:.0f} ms"))
+
+    start = time.perf_counter()
+    result = recognizer.recognize_chunked(audio)
+    elapsed = time.perf_counter() - start
+    assert result["success"], result
+    chunks = recognizer.backend_stats()["stub"]["requests"] - 1
+    rows.append(("recognize_chunked", chunks, "-", f"{elapsed * 1000:.0f} ms"))
+
+    async with LinkAIStub("好的。", latency=0.05) as stub:
+        first, elapsed, chunks = await stream(stub.url, audio, args)
+    rows.append(("stream_transcript", chunks, f"{first * 1000:.0f} ms", f"{elapsed * 1000:.0f} ms"))
+
+    print(f"{args.seconds:.0f}s voice note, stub ASR {args.latency * 1000:.0f} ms + "
+          f"{args.per_second * 1000:.0f} ms per audio second, {args.workers} workers")
+    print_table(rows, ("mode", "requests", "first transcript", "full transcript"))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=60.0)
+    parser.add_argument('--chunk-seconds', type=float, default=10.0)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.3)
+    parser.add_argument('--per-second', type=float, default=0.08)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,105 @@
+"""
+Per-request disk I/O of speech recognition under concurrent voice turns
+
+Runs the real SpeechRecognizer on generated WAV audio, with the Google
+request replaced by a fixed delay, from a pool of ASR threads. Compares
+the previous path (write the upload to a temp file, recognize from the
+path, unlink it) with recognition straight from memory, and reports the
+write syscalls and bytes written per request as seen in /proc/self/io.
+
+Usage: python -m benchmarks.asr_in_memory [--requests 200] [--seconds 5]
+"""
+import io
+import os
+import time
+import wave
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from voice.speech_recognition import SpeechRecognizer
+
+from .fakes import print_table
+
+
+def make_wav(seconds, sample_rate=16000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(os.urandom(int(seconds * sample_rate) * 2))
+    return buffer.getvalue()
+
+
+def recognize_via_temp_file(recognizer, audio_data):
+    """Previous behaviour of process_voice_message/recognize_from_bytes"""
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
+        temp_file_path = temp_file.name
+        temp_file.write(audio_data)
+    try:
+        return recognizer.recognize_from_file(temp_file_path)
+    finally:
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+
+
+def recognize_in_memory(recognizer, audio_data):
+    return recognizer.recognize_from_bytes(audio_data)
+
+
+def io_counters():
+    """write syscalls and bytes written by this process so far"""
+    counters = {}
+    with open("/proc/self/io") as f:
+        for line in f:
+            name, value = line.split(":")
+            counters[name] = int(value)
+    return counters["syscw"], counters["wchar"]
+
+
+def run(recognize, recognizer, audio_data, args):
+    syscw, wchar = io_counters()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(lambda _: recognize(recognizer, audio_data), range(args.requests)))
+    elapsed = time.perf_counter() - start
+    assert all(result["success"] for result in results), results[0]
+
+    end_syscw, end_wchar = io_counters()
+    return elapsed, (end_syscw - syscw) / args.requests, (end_wchar - wchar) / args.requests
+
+
+def main(args):
+    audio_data = make_wav(args.seconds)
+    recognizer = SpeechRecognizer()
+
+    def fake_google(audio, language=None, **kwargs):
+        time.sleep(args.asr_latency)
+        return "我今天心情不太好"
+
+    rows = []
+    with mock.patch.object(recognizer.recognizer, "recognize_google", fake_google):
+        for name, recognize in (("temp file", recognize_via_temp_file), ("in memory", recognize_in_memory)):
+            elapsed, syscw, wchar = run(recognize, recognizer, audio_data, args)
+            rows.append((
+                name,
+                f"{elapsed * 1000:.0f} ms",
+                f"{elapsed / args.requests * args.workers * 1000:.1f} ms",
+                f"{syscw:.1f}",
+                f"{wchar / 1024:.1f} KiB"
+            ))
+
+    print(f"{args.requests} requests of {len(audio_data) / 1024:.0f} KiB WAV on {args.workers} ASR threads, "
+          f"temp dir {tempfile.gettempdir()}")
+    print_table(rows, ("mode", "total", "per request", "write syscalls/req", "written/req"))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--asr-latency', type=float, default=0.0)
+    main(parser.parse_args())
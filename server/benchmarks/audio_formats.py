@@ -0,0 +1,133 @@
+"""
+Reply payload size and end-to-end latency per negotiated audio format
+
+Text turns run through the real VoiceDialogue and TextToSpeech against
+the Link AI stub and the DashScope websocket stub, which sizes the audio
+by the requested format and bit rate for speech at ``--chars-per-second``.
+Replies are uploaded to the in-memory bucket at ``--upload-bandwidth``,
+and the client is assumed to download them at ``--client-kbps``. For each
+reply profile prints the payload, the server-side turn latency and the
+latency until the client has the whole reply.
+
+Then enrolls a voice from a stereo 48 kHz recording with and without
+normalizing it to mono 16 kHz first, and prints the sample size and the
+conversion and upload times.
+
+Usage: python -m benchmarks.audio_formats [--turns 20] [--client-kbps 1000]
+"""
+import io
+import time
+import wave
+import asyncio
+import logging
+import argparse
+import statistics
+
+import dashscope
+import numpy as np
+
+from voice.speech_synthesis import TextToSpeech
+from voice.transcode import AUDIO_PROFILES
+
+from .fakes import FakeStorage, FakeVoiceManager, LinkAIStub, TtsWebsocketStub, build_dialogue, print_table
+
+REPLY = "听起来你最近真的很辛苦。先深呼吸一下，我们可以慢慢聊聊让你感到压力的事情，好吗？"
+
+
+def make_recording(seconds, sample_rate=48000, channels=2, seed=0):
+    """Speech-like noise bursts as a 16-bit WAV recording"""
+    rng = np.random.default_rng(seed)
+    frames = int(seconds * sample_rate)
+    envelope = np.abs(np.sin(np.linspace(0, seconds * np.pi, frames)))
+    samples = rng.normal(0, 0.2, (frames, channels)) * envelope[:, None]
+    pcm = (np.clip(samples, -1, 1) * 32767).astype(np.int16)
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+async def reply_turns(args, link_ai_url, profile):
+    tts = TextToSpeech(api_key="bench", pool_size=args.concurrency)
+    storage = FakeStorage(latency=args.upload_latency, bandwidth=args.upload_bandwidth)
+    async with build_dialogue(link_ai_url, tts=tts, storage=storage, tts_workers=args.concurrency) as dialogue:
+        async def turn(i):
+            start = time.perf_counter()
+            result = await dialogue.process_text_message("我最近压力很大", f"session-{i}", "bench-voice",
+                                                         audio_format=profile)
+            return result, time.perf_counter() - start
+
+        outcomes = await asyncio.gather(*(turn(i) for i in range(args.turns)))
+
+    assert all(result["success"] and result["audio_format"] == profile for result, _ in outcomes), outcomes[0][0]
+    payload = statistics.mean(len(data) for data in storage.bucket.objects.values())
+    return payload, statistics.median(latency for _, latency in outcomes)
+
+
+async def enroll(args, link_ai_url, recording, sample_rate):
+    storage = FakeStorage(latency=args.upload_latency, bandwidth=args.upload_bandwidth)
+    async with build_dialogue(link_ai_url, storage=storage, voice_manager=FakeVoiceManager(),
+                              enrollment_sample_rate=sample_rate) as dialogue:
+        result = await dialogue.clone_voice_from_audio(recording, "bench", "")
+    sample = next(data for key, data in storage.bucket.objects.items() if key.startswith("voice_samples/"))
+    with wave.open(io.BytesIO(sample), "rb") as wav:
+        layout = f"{wav.getnchannels()} ch, {wav.getframerate() / 1000:g} kHz"
+    return layout, len(sample), result["stage_ms"]
+
+
+async def main(args):
+    client_bandwidth = args.client_kbps * 1000 / 8
+
+    async with LinkAIStub(REPLY, latency=args.llm_latency) as link_ai, \
+            TtsWebsocketStub(latency=0.05, per_char_latency=0.005, chars_per_second=args.chars_per_second) as stub:
+        dashscope.base_websocket_api_url = stub.url
+        dashscope.api_key = "bench"
+        logging.getLogger("dashscope").setLevel(logging.CRITICAL)
+
+        rows = []
+        for name, profile in AUDIO_PROFILES.items():
+            payload, server = await reply_turns(args, link_ai.url, name)
+            download = payload / client_bandwidth
+            rate = f"{profile['bit_rate']} kbps" if profile["bit_rate"] else "-"
+            rows.append((
+                name,
+                profile["content_type"],
+                f"{profile['sample_rate'] / 1000:g} kHz",
+                rate,
+                f"{payload / 1024:.1f} KiB",
+                f"{server * 1000:.0f} ms",
+                f"{download * 1000:.0f} ms",
+                f"{(server + download) * 1000:.0f} ms"
+            ))
+
+        recording = make_recording(args.sample_seconds)
+        enroll_rows = []
+        for name, sample_rate in (("as uploaded", None), ("mono 16 kHz", 16000)):
+            layout, size, stage_ms = await enroll(args, link_ai.url, recording, sample_rate)
+            enroll_rows.append((name, layout, f"{size / 1024:.0f} KiB",
+                                f"{stage_ms.get('transcode', 0.0):.1f} ms", f"{stage_ms['upload']:.0f} ms"))
+
+    print(f"{args.turns} text turns per format, reply of {len(REPLY)} chars spoken at {args.chars_per_second:g} chars/s; "
+          f"upload {args.upload_bandwidth / 1e6:g} MB/s, client download {args.client_kbps:g} kbps")
+    print_table(rows, ("format", "content type", "rate", "bit rate", "payload", "server p50",
+                       "client download", "end to end"))
+    print(f"\nvoice enrollment from a {args.sample_seconds:g} s stereo 48 kHz recording "
+          f"({len(recording) / 1024:.0f} KiB)")
+    print_table(enroll_rows, ("sample", "layout", "uploaded", "conversion", "upload"))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--turns', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--llm-latency', type=float, default=0.2)
+    parser.add_argument('--chars-per-second', type=float, default=4.5)
+    parser.add_argument('--upload-latency', type=float, default=0.02)
+    parser.add_argument('--upload-bandwidth', type=float, default=5e6)
+    parser.add_argument('--client-kbps', type=float, default=1000)
+    parser.add_argument('--sample-seconds', type=float, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,175 @@
+"""
+Cold start of the voice package and of VoiceDialogue
+
+1. Import: ``python -X importtime -c "import voice"`` in a fresh
+   interpreter, next to the same import with the DashScope, OSS and
+   speech_recognition SDKs loaded up front like before. Prints the total,
+   the cumulative time of each SDK and which of them got loaded.
+2. Construction: a fresh interpreter imports VoiceDialogue and builds one
+   with the real components against a local OSS stub. "eager (previous)"
+   also creates every component and waits for the bucket check, which is
+   what the constructor used to do; "lazy" only constructs, then warms the
+   components up afterwards the way a server would in the background. Run
+   with OSS answering normally, slowly (``--oss-latency``) and not at all
+   (connection refused): eagerly a dead OSS fails startup, lazily the
+   dialogue starts and bucket_status() reports the error.
+
+Usage: python -m benchmarks.cold_start [--runs 3] [--oss-latency 2.0]
+"""
+import os
+import sys
+import json
+import socket
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+from .fakes import OssStub, print_table
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SDKS = ("dashscope", "oss2", "speech_recognition")
+
+IMPORT_VOICE = """
+import sys, json, time
+start = time.perf_counter()
+{eager}import voice
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [name for name in {sdks!r} if name in sys.modules]}}))
+"""
+
+CONSTRUCT = """
+import sys, json, time
+start = time.perf_counter()
+from voice.voice_dialogue import VoiceDialogue
+imported = time.perf_counter()
+mode, endpoint, work_dir = sys.argv[1:4]
+result = {"import": imported - start}
+try:
+    dialogue = VoiceDialogue(
+        dashscope_api_key="bench",
+        oss_access_key_id="bench",
+        oss_access_key_secret="bench",
+        link_ai_api_url="http://127.0.0.1:9/v1/chat/completions",
+        link_ai_api_key="bench",
+        link_ai_app_code="bench",
+        voice_db_path=work_dir + "/voice_db.json",
+        audio_cache_dir=work_dir + "/cache",
+        oss_options={"endpoint": endpoint, "bucket_name": "bench", "upload_retries": 0}
+    )
+    if mode == "eager":
+        # What the constructor did before: SDKs, clients and the bucket check up front
+        dialogue.initialize()
+        status = dialogue.storage.wait_for_bucket()
+        if not status["exists"]:
+            raise RuntimeError(status["error"])
+    result["ready"] = time.perf_counter() - start
+    if mode == "lazy":
+        dialogue.initialize()
+        result["warm"] = time.perf_counter() - start
+        status = dialogue.storage.wait_for_bucket()
+        result["bucket_checked"] = time.perf_counter() - start
+    result["bucket"] = "exists" if status["exists"] else "error reported"
+except Exception as e:
+    result["ready"] = None
+    result["error"] = type(e).__name__
+print(json.dumps(result))
+"""
+
+
+def run_python(code, *args, importtime=False):
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code, *args]
+    completed = subprocess.run(command, cwd=SERVER_DIR, capture_output=True, text=True, check=True)
+    return completed.stdout.strip().splitlines()[-1], completed.stderr
+
+
+def sdk_import_times(stderr):
+    """Cumulative microseconds of the first import of each SDK package"""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        if name in SDKS and name not in times and cumulative.strip().isdigit():
+            times[name] = int(cumulative)
+    return times
+
+
+def refused_endpoint():
+    """URL of a local port nothing listens on"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+def measure_import(args):
+    rows = []
+    for name, eager in (
+        ("eager SDKs (previous)", "import dashscope.audio.tts_v2, oss2, speech_recognition\n"),
+        ("lazy SDKs", ""),
+    ):
+        seconds = []
+        for _ in range(args.runs):
+            line, stderr = run_python(IMPORT_VOICE.format(eager=eager, sdks=SDKS), importtime=True)
+            result = json.loads(line)
+            seconds.append(result["seconds"])
+        sdk_times = sdk_import_times(stderr)
+        rows.append((
+            name,
+            f"{statistics.median(seconds) * 1000:.0f} ms",
+            *(f"{sdk_times[sdk] / 1000:.0f} ms" if sdk in sdk_times else "-" for sdk in SDKS),
+            ", ".join(result["loaded"]) or "none"
+        ))
+    print(f"import voice, median of {args.runs} fresh interpreters")
+    print_table(rows, ("mode", "total", *SDKS, "SDKs loaded"))
+
+
+def measure_construct(args, condition, endpoint):
+    rows = []
+    for mode in ("eager", "lazy"):
+        runs = []
+        for _ in range(args.runs):
+            work_dir = tempfile.mkdtemp(prefix="cold-start-bench-")
+            line, _ = run_python(CONSTRUCT, mode, endpoint, work_dir)
+            runs.append(json.loads(line))
+        result = runs[-1]
+
+        def median(key):
+            values = [run[key] for run in runs if run.get(key) is not None]
+            return f"{statistics.median(values) * 1000:.0f} ms" if values else "-"
+
+        rows.append((
+            condition,
+            "eager (previous)" if mode == "eager" else "lazy",
+            median("import"),
+            median("ready") if result.get("ready") is not None else f"failed ({result['error']})",
+            median("warm"),
+            median("bucket_checked"),
+            result.get("bucket", "-")
+        ))
+    return rows
+
+
+def main(args):
+    measure_import(args)
+
+    rows = []
+    with OssStub(latency=0.02) as stub:
+        rows += measure_construct(args, "OSS normal", stub.endpoint)
+    with OssStub(latency=args.oss_latency) as stub:
+        rows += measure_construct(args, f"OSS slow ({args.oss_latency:g} s)", stub.endpoint)
+    rows += measure_construct(args, "OSS down", refused_endpoint())
+    print(f"\nVoiceDialogue startup in a fresh interpreter, median of {args.runs} runs "
+          f"(times since the script started)")
+    print_table(rows, ("OSS", "mode", "import", "ready for requests", "components warm",
+                       "bucket checked", "bucket"))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--oss-latency', type=float, default=2.0)
+    main(parser.parse_args())
@@ -0,0 +1,94 @@
+"""
+N simultaneous voice conversations with blocking ASR/TTS/OSS stand-ins
+
+Compares the previous behaviour (blocking SDK calls made directly on the
+event loop) with the per-stage thread pools. With the pools, N turns
+finish in roughly the latency of one turn instead of N times it, and the
+event loop keeps responding while the SDK calls are in flight. Fails if
+the pooled run takes more than --max-slowdown times one turn or lags the
+event loop by more than --max-loop-lag seconds.
+
+Usage: python -m benchmarks.concurrent_sessions [--sessions 16]
+"""
+import argparse
+import asyncio
+import time
+
+from .fakes import FakeRecognizer, FakeStorage, FakeTextToSpeech, LinkAIStub, build_dialogue, print_table
+
+
+async def run_inline(stage, func, *args, **kwargs):
+    """Previous behaviour: call the blocking function on the event loop"""
+    return func(*args, **kwargs)
+
+
+async def heartbeat(interval, lags, stop):
+    """Record how late the event loop wakes this task up"""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - expected)
+
+
+async def measure(dialogue, sessions):
+    lags, stop = [], asyncio.Event()
+    beat = asyncio.ensure_future(heartbeat(0.01, lags, stop))
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        dialogue.process_voice_message(b"RIFF-fake-audio", f"session-{i}", "bench-voice")
+        for i in range(sessions)
+    ))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await beat
+    assert all(result["success"] for result in results), results
+    return elapsed, max(lags)
+
+
+async def main(args):
+    reply = "我明白你的感受，我们慢慢来。"
+    tts = FakeTextToSpeech(base_latency=args.tts_latency, per_char_latency=0)
+    per_turn = args.asr_latency + args.llm_latency + args.tts_latency + args.upload_latency
+
+    async with LinkAIStub(reply, latency=args.llm_latency) as stub:
+        rows, pooled = [], None
+        for name in ("blocking on event loop", "stage thread pools"):
+            async with build_dialogue(
+                stub.url,
+                tts=tts,
+                storage=FakeStorage(latency=args.upload_latency),
+                recognizer=FakeRecognizer(latency=args.asr_latency),
+                asr_workers=args.sessions,
+                tts_workers=args.sessions,
+                storage_workers=args.sessions
+            ) as dialogue:
+                if name.startswith("blocking"):
+                    dialogue._run_blocking = run_inline
+                elapsed, lag = await measure(dialogue, args.sessions)
+            if not name.startswith("blocking"):
+                pooled = elapsed, lag
+            rows.append((name, f"{elapsed:.2f} s", f"{lag * 1000:.0f} ms"))
+
+    print(f"{args.sessions} concurrent turns; one turn = {per_turn:.2f} s "
+          f"(asr {args.asr_latency}, llm {args.llm_latency}, tts {args.tts_latency}, upload {args.upload_latency})")
+    print(f"max-latency bound ~{per_turn:.2f} s, sum-latency bound ~{per_turn * args.sessions:.2f} s")
+    print_table(rows, ("mode", "wall time", "max loop lag"))
+
+    elapsed, lag = pooled
+    assert elapsed <= per_turn * args.max_slowdown, \
+        f"{args.sessions} pooled turns took {elapsed:.2f} s, bound {per_turn * args.max_slowdown:.2f} s"
+    assert lag <= args.max_loop_lag, f"event loop lagged {lag * 1000:.0f} ms"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=16)
+    parser.add_argument('--asr-latency', type=float, default=0.3)
+    parser.add_argument('--llm-latency', type=float, default=0.2)
+    parser.add_argument('--tts-latency', type=float, default=0.4)
+    parser.add_argument('--upload-latency', type=float, default=0.1)
+    parser.add_argument('--max-slowdown', type=float, default=1.5)
+    parser.add_argument('--max-loop-lag', type=float, default=0.05)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,129 @@
+"""
+Time to first byte of reply audio: upload-then-signed-URL versus direct streaming
+
+Text turns run through the real VoiceDialogue and TextToSpeech against
+the Link AI stub and the DashScope websocket stub, which streams audio
+frames while it generates them. Replies are uploaded to the in-memory
+bucket at ``--upload-bandwidth`` after ``--upload-latency``. In the URL
+modes the client still has to fetch each file from OSS, which takes
+``--oss-ttfb`` to the first byte; in direct mode the first chunk is
+already the first byte. Modes:
+
+1. process_text_message: whole reply synthesized, uploaded, then signed.
+2. stream_text_message: sentence by sentence, each uploaded and signed.
+3. stream_reply_audio: chunks streamed as DashScope produces them,
+   sentences archived to OSS in the background.
+
+Prints the median and p95 time to first audio byte at the client, the
+time until the server has sent the whole reply, and for direct mode when
+the background archival finished.
+
+Usage: python -m benchmarks.direct_audio [--turns 5] [--stream-llm]
+"""
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+
+import dashscope
+
+from voice.speech_synthesis import TextToSpeech
+
+from .fakes import FakeStorage, LinkAIStub, TtsWebsocketStub, build_dialogue, print_table
+
+REPLY = ("听起来你最近真的很辛苦。先深呼吸一下，我们可以慢慢聊。"
+         "你愿意说说是什么让你感到压力吗？无论是什么，我都会在这里认真听。")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+async def buffered(dialogue, args, session_id):
+    start = time.perf_counter()
+    result = await dialogue.process_text_message("我最近压力很大", session_id, "bench-voice",
+                                                 stream_llm=args.stream_llm)
+    elapsed = time.perf_counter() - start
+    assert result["success"], result
+    return elapsed + args.oss_ttfb, elapsed, None
+
+
+async def pipelined(dialogue, args, session_id):
+    start = time.perf_counter()
+    first = None
+    async for event in dialogue.stream_text_message("我最近压力很大", session_id, "bench-voice",
+                                                    stream_llm=args.stream_llm):
+        assert event["type"] != "error" and event.get("success", True), event
+        if event["type"] == "audio" and first is None:
+            first = time.perf_counter() - start + args.oss_ttfb
+    return first, time.perf_counter() - start, None
+
+
+async def direct(dialogue, args, session_id):
+    start = time.perf_counter()
+    first = archive = None
+    async for event in dialogue.stream_reply_audio("我最近压力很大", session_id, "bench-voice",
+                                                   stream_llm=args.stream_llm):
+        assert event["type"] != "error" and event.get("success", True), event
+        if event["type"] == "audio" and first is None:
+            first = time.perf_counter() - start
+        elif event["type"] == "done":
+            archive = event["archive"]
+    sent = time.perf_counter() - start
+    results = await archive
+    assert all(result["success"] for result in results), results
+    return first, sent, time.perf_counter() - start
+
+
+async def main(args):
+    async with LinkAIStub(REPLY, latency=args.llm_latency, chars_per_second=args.llm_chars_per_second) as link_ai, \
+            TtsWebsocketStub(latency=0.05, per_char_latency=args.tts_per_char, chars_per_second=4.5,
+                             frame_bytes=2048, stream_frames=True) as stub:
+        dashscope.base_websocket_api_url = stub.url
+        dashscope.api_key = "bench"
+        logging.getLogger("dashscope").setLevel(logging.CRITICAL)
+
+        rows = []
+        for name, turn in (
+            ("upload + signed URL", buffered),
+            ("per-sentence URLs", pipelined),
+            ("direct stream + archive", direct),
+        ):
+            tts = TextToSpeech(api_key="bench", pool_size=4)
+            storage = FakeStorage(latency=args.upload_latency, bandwidth=args.upload_bandwidth)
+            async with build_dialogue(link_ai.url, tts=tts, storage=storage) as dialogue:
+                # Warm the synthesizer pool so every mode starts on open connections
+                await turn(dialogue, args, "warmup")
+                outcomes = [await turn(dialogue, args, f"session-{i}") for i in range(args.turns)]
+
+            ttfb = [first for first, _, _ in outcomes]
+            archived = [done for _, _, done in outcomes if done is not None]
+            rows.append((
+                name,
+                f"{statistics.median(ttfb) * 1000:.0f} ms",
+                f"{percentile(ttfb, 0.95) * 1000:.0f} ms",
+                f"{statistics.median(sent for _, sent, _ in outcomes) * 1000:.0f} ms",
+                f"{statistics.median(archived) * 1000:.0f} ms" if archived else "-",
+                storage.bucket.requests["PutObject"]
+            ))
+
+    print(f"{args.turns} turns per mode, reply of {len(REPLY)} chars "
+          f"({'streamed' if args.stream_llm else 'buffered'} Link AI, first token {args.llm_latency * 1000:.0f} ms); "
+          f"OSS upload {args.upload_latency * 1000:.0f} ms + {args.upload_bandwidth / 1e6:g} MB/s, "
+          f"OSS download first byte {args.oss_ttfb * 1000:.0f} ms")
+    print_table(rows, ("mode", "first byte p50", "first byte p95", "reply sent", "archived", "OSS PUTs"))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--turns', type=int, default=5)
+    parser.add_argument('--stream-llm', action='store_true')
+    parser.add_argument('--llm-latency', type=float, default=0.3)
+    parser.add_argument('--llm-chars-per-second', type=float, default=40)
+    parser.add_argument('--tts-per-char', type=float, default=0.02)
+    parser.add_argument('--upload-latency', type=float, default=0.08)
+    parser.add_argument('--upload-bandwidth', type=float, default=2e6)
+    parser.add_argument('--oss-ttfb', type=float, default=0.08)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,507 @@
+"""
+End-to-end benchmark of VoiceDialogue against local stand-ins, with JSON results
+
+Runs the real VoiceDialogue, TextToSpeech over FakeSpeechSynthesizer,
+VoiceManager over FakeEnrollmentService and OssStorage over the in-memory
+FakeBucket, with the Link AI stub and the fake recognizer. Each upstream
+draws lognormal latencies around its median (shape ``--sigma``) and fails
+``--fail-rate`` of its calls; the draws are seeded by ``--seed``.
+
+Scenarios, each on a fresh dialogue with ``--sessions`` concurrent
+sessions of ``--turns`` turns:
+
+- text: process_text_message
+- voice: process_voice_message on a 3 s mono 16 kHz recording
+- stream: stream_reply_audio with the streamed Link AI reply, waiting for
+  the background archival after each turn
+- clone: clone_voice_from_audio on a 10 s stereo 48 kHz recording
+
+For each prints throughput, failures, turn latency p50/p95/p99, the
+p50/p95/p99 and outcomes of every stage from the pipeline metrics, and the
+process CPU time per turn (stand-ins included). Then:
+
+- memory: ``--long-turns`` quick turns over ``--long-sessions`` sessions
+  under tracemalloc, reporting growth per turn and where it was allocated.
+- profile (``--profile``): the text scenario again with every thread
+  profiled on thread CPU time, split into voice/, the stand-ins and the
+  libraries, with the costliest functions of voice/.
+
+``--output`` writes the results as JSON; ``--compare`` prints the change
+against an earlier results file, e.g. one written on another commit.
+
+Usage: python -m benchmarks.end_to_end [--turns 10] [--sessions 8] [--output run.json] [--compare base.json] [--profile]
+"""
+import gc
+import io
+import os
+import json
+import time
+import wave
+import pstats
+import shutil
+import asyncio
+import cProfile
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+import statistics
+import subprocess
+import tracemalloc
+from collections import Counter, defaultdict
+from unittest import mock
+
+import numpy as np
+
+import voice
+from voice.metrics import InMemoryExporter, Metrics
+from voice.speech_synthesis import TextToSpeech
+from voice.voice_enrollment import VoiceManager
+
+from .fakes import (CallProfile, FakeEnrollmentService, FakeRecognizer, FakeSpeechSynthesizer, FakeStorage,
+                    LinkAIStub, build_dialogue, print_table)
+
+RESULTS_VERSION = 1
+
+SCENARIOS = ("text", "voice", "stream", "clone")
+
+MESSAGE = "我最近压力很大，晚上总是睡不着"
+REPLY = ("听起来你最近真的很辛苦。睡不好会让白天的压力显得更重。"
+         "先深呼吸一下，我们可以慢慢聊。你愿意说说是什么让你放不下吗？")
+
+VOICE_ID = "cosyvoice-v2-bench"
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+VOICE_DIR = os.path.dirname(os.path.abspath(voice.__file__))
+
+
+def make_recording(seconds, sample_rate, channels, seed=0):
+    """Speech-like noise bursts as a 16-bit WAV recording"""
+    rng = np.random.default_rng(seed)
+    frames = int(seconds * sample_rate)
+    envelope = np.abs(np.sin(np.linspace(0, 2 * seconds * np.pi, frames)))
+    samples = rng.normal(0, 0.2, (frames, channels)) * envelope[:, None]
+    pcm = (np.clip(samples, -1, 1) * 32767).astype(np.int16)
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def percentiles(values):
+    """p50/p95/p99, mean and max of latencies in seconds, as milliseconds"""
+    if not values:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    values = sorted(values)
+    pick = lambda q: round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 2)
+    return {
+        "count": len(values),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "mean": round(statistics.fmean(values) * 1000, 2),
+        "max": round(values[-1] * 1000, 2)
+    }
+
+
+def upstream_profiles(args, seed, scale=1.0):
+    """Latency distribution and failure rate of every stand-in"""
+    def profile(median, offset):
+        return CallProfile(median * scale, sigma=args.sigma, fail_rate=args.fail_rate, seed=seed * 100 + offset)
+    return {
+        "llm": profile(args.llm_latency, 1),
+        "asr": profile(args.asr_latency, 2),
+        "tts": profile(args.tts_latency, 3),
+        "storage": profile(args.oss_latency, 4),
+        "enrollment": profile(args.enroll_latency, 5)
+    }
+
+
+def build(args, link_ai, workdir, name, profiles, metrics, chars_per_second=None):
+    """VoiceDialogue over the stand-ins with the given upstream profiles"""
+    link_ai.latency = profiles["llm"]
+    link_ai.chars_per_second = chars_per_second
+    FakeSpeechSynthesizer.latency = profiles["tts"]
+    FakeSpeechSynthesizer.per_char_latency = args.tts_per_char
+    FakeEnrollmentService.latency = profiles["enrollment"]
+
+    return build_dialogue(
+        link_ai.url,
+        tts=TextToSpeech(api_key="bench", pool_size=args.sessions),
+        storage=FakeStorage(latency=profiles["storage"]),
+        recognizer=FakeRecognizer(latency=profiles["asr"]),
+        voice_manager=VoiceManager(api_key="bench", voice_db_path=os.path.join(workdir, f"{name}.json")),
+        metrics=metrics,
+        tts_workers=args.sessions,
+        audio_cache_dir=os.path.join(workdir, f"{name}-cache")
+    )
+
+
+async def run_turn(dialogue, scenario, session_id, turn, samples):
+    """
+    One turn of a scenario
+
+    Returns:
+        (error or None, latency, time to first audio or None)
+    """
+    start = time.perf_counter()
+    first_audio = latency = None
+    try:
+        if scenario == "text":
+            result = await dialogue.process_text_message(MESSAGE, session_id, VOICE_ID)
+        elif scenario == "voice":
+            result = await dialogue.process_voice_message(samples["voice"], session_id, VOICE_ID)
+        elif scenario == "clone":
+            result = await dialogue.clone_voice_from_audio(samples["clone"], f"{session_id}-{turn}", "")
+        else:
+            result, archive = {"success": True}, None
+            async for event in dialogue.stream_reply_audio(MESSAGE, session_id, VOICE_ID, stream_llm=True):
+                if event["type"] == "audio" and first_audio is None:
+                    first_audio = time.perf_counter() - start
+                elif event["type"] == "segment" and not event["success"]:
+                    result = {"success": False, "error": event.get("error")}
+                elif event["type"] == "error":
+                    result = event
+                elif event["type"] == "done":
+                    archive = event["archive"]
+            # The reply is out; archival only adds to the failures
+            latency = time.perf_counter() - start
+            if archive is not None:
+                uploads = await archive
+                if result["success"] and not all(upload["success"] for upload in uploads):
+                    result = {"success": False, "error": "Archival failed"}
+    except Exception as e:
+        return type(e).__name__, time.perf_counter() - start, first_audio
+
+    if latency is None:
+        latency = time.perf_counter() - start
+    return (None if result["success"] else str(result.get("error"))[:80]), latency, first_audio
+
+
+async def run_sessions(dialogue, scenario, sessions, turns, samples):
+    """Run sessions concurrently, each one turn after another"""
+    outcomes = []
+
+    async def session(index):
+        for turn in range(turns):
+            outcomes.append(await run_turn(dialogue, scenario, f"{scenario}-{index}", turn, samples))
+
+    await asyncio.gather(*(session(index) for index in range(sessions)))
+    return outcomes
+
+
+def stage_results(exporter):
+    """Per-stage latency percentiles and outcome counts from the metrics"""
+    latencies, outcomes = defaultdict(list), defaultdict(Counter)
+    for record in exporter.records("voice_stage_seconds"):
+        latencies[record.labels["stage"]].append(record.value)
+    for record in exporter.records("voice_stage_calls_total"):
+        outcomes[record.labels["stage"]][record.labels["outcome"]] += record.value
+    stages = {stage: dict(percentiles(values), outcomes=dict(outcomes[stage])) for stage, values in latencies.items()}
+
+    payload = Counter()
+    for record in exporter.records("voice_payload_bytes_total"):
+        payload[f"{record.labels['stage']}_{record.labels['direction']}"] += record.value
+    return stages, dict(payload)
+
+
+async def run_scenario(args, link_ai, workdir, scenario, seed, samples):
+    exporter = InMemoryExporter()
+    profiles = upstream_profiles(args, seed)
+    async with build(args, link_ai, workdir, scenario, profiles, Metrics([exporter]),
+                     args.llm_chars_per_second) as dialogue:
+        # One unmeasured turn so pools and the HTTP session exist
+        await run_turn(dialogue, scenario, "warmup", 0, samples)
+        exporter.clear()
+
+        cpu, wall = time.process_time(), time.perf_counter()
+        outcomes = await run_sessions(dialogue, scenario, args.sessions, args.turns, samples)
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+    errors = Counter(error for error, _, _ in outcomes if error is not None)
+    stages, payload = stage_results(exporter)
+    turns = len(outcomes)
+    return {
+        "turns": turns,
+        "failures": sum(errors.values()),
+        "failure_rate": round(sum(errors.values()) / turns, 4),
+        "errors": dict(errors),
+        "wall_seconds": round(wall, 3),
+        "turns_per_second": round(turns / wall, 3),
+        "latency_ms": percentiles([latency for error, latency, _ in outcomes if error is None]),
+        "first_audio_ms": percentiles([first for error, _, first in outcomes if error is None and first is not None]),
+        "stages": stages,
+        "payload_bytes": payload,
+        "cpu_ms_per_turn": round(cpu / turns * 1000, 3)
+    }
+
+
+async def run_memory(args, link_ai, workdir, samples):
+    """Memory growth over long sessions of quick text turns"""
+    # Same failure rate, a hundredth of the latency and instant generation:
+    # growth doesn't depend on them
+    profiles = upstream_profiles(args, args.seed + len(SCENARIOS), scale=0.01)
+    async with build(args, link_ai, workdir, "memory", profiles, Metrics()) as dialogue:
+        turns = max(1, args.long_turns // args.long_sessions)
+        await run_sessions(dialogue, "text", args.long_sessions, min(turns, 20), samples)
+
+        gc.collect()
+        tracemalloc.start(10)
+        before = tracemalloc.take_snapshot()
+        start = time.perf_counter()
+        await run_sessions(dialogue, "text", args.long_sessions, turns, samples)
+        elapsed = time.perf_counter() - start
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    measured = turns * args.long_sessions
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+    growth = sum(stat.size_diff for stat in diff)
+    top = [
+        {
+            "location": f"{os.path.relpath(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+            "size_diff": stat.size_diff,
+            "count_diff": stat.count_diff
+        }
+        for stat in sorted(diff, key=lambda stat: stat.size_diff, reverse=True)[:args.top]
+    ]
+    return {
+        "turns": measured,
+        "sessions": args.long_sessions,
+        "seconds": round(elapsed, 3),
+        "growth_bytes": growth,
+        "growth_bytes_per_turn": round(growth / measured, 1),
+        "peak_traced_bytes": peak,
+        "top_growth": top
+    }
+
+
+class ThreadProfiler:
+    """
+    cProfile on the calling thread and on every thread started while active
+
+    Measures thread CPU time, so threads waiting on a stand-in cost nothing.
+    """
+    def __init__(self):
+        self.profiles = []
+        self._lock = threading.Lock()
+
+    def _start(self, *args):
+        profile = cProfile.Profile(time.thread_time)
+        with self._lock:
+            self.profiles.append(profile)
+        profile.enable()
+
+    def __enter__(self):
+        threading.setprofile(self._start)
+        self._start()
+        return self
+
+    def __exit__(self, *exc_info):
+        threading.setprofile(None)
+        self.profiles[0].disable()
+        return False
+
+    def stats(self) -> pstats.Stats:
+        return pstats.Stats(*self.profiles)
+
+
+def owner(filename):
+    path = os.path.abspath(filename)
+    if path.startswith(VOICE_DIR + os.sep):
+        return "voice"
+    if path.startswith(BENCHMARKS_DIR + os.sep):
+        return "stand-ins"
+    return "libraries"
+
+
+async def run_profile(args, link_ai, workdir, samples):
+    """CPU time of voice/ versus the stand-ins and libraries in text turns"""
+    profiles = upstream_profiles(args, args.seed)
+    with ThreadProfiler() as profiler:
+        async with build(args, link_ai, workdir, "profile", profiles, Metrics(),
+                         args.llm_chars_per_second) as dialogue:
+            outcomes = await run_sessions(dialogue, "text", args.sessions, args.turns, samples)
+
+    totals, own = Counter(), []
+    for (filename, lineno, function), (_, _, tottime, _, _) in profiler.stats().stats.items():
+        group = owner(filename)
+        totals[group] += tottime
+        if group == "voice":
+            own.append((tottime, f"{os.path.relpath(filename)}:{lineno}({function})"))
+
+    turns = len(outcomes)
+    cpu = sum(totals.values())
+    return {
+        "turns": turns,
+        "cpu_ms_per_turn": {group: round(seconds / turns * 1000, 3) for group, seconds in totals.items()},
+        "cpu_share": {group: round(seconds / cpu, 4) for group, seconds in totals.items()} if cpu else {},
+        "top_voice_functions": [
+            {"function": name, "cpu_ms_per_turn": round(seconds / turns * 1000, 3)}
+            for seconds, name in sorted(own, reverse=True)[:args.top]
+        ]
+    }
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def print_results(results):
+    print(f"{results['config']['sessions']} sessions x {results['config']['turns']} turns per scenario, "
+          f"{results['config']['fail_rate']:.0%} upstream failures, latency sigma {results['config']['sigma']:g}")
+    rows = []
+    for name, scenario in results["scenarios"].items():
+        latency, first_audio = scenario["latency_ms"], scenario["first_audio_ms"]["p50"]
+        rows.append((
+            name,
+            f"{scenario['turns_per_second']:.2f}/s",
+            f"{scenario['failures']} ({scenario['failure_rate']:.1%})",
+            *(f"{latency[q]:.0f} ms" if latency[q] is not None else "-" for q in ("p50", "p95", "p99")),
+            f"{first_audio:.0f} ms" if first_audio is not None else "-",
+            f"{scenario['cpu_ms_per_turn']:.1f} ms"
+        ))
+    print_table(rows, ("scenario", "throughput", "failed", "p50", "p95", "p99", "first audio p50", "CPU/turn"))
+
+    rows = []
+    for name, scenario in results["scenarios"].items():
+        for stage, stats in sorted(scenario["stages"].items()):
+            failed = {outcome: int(count) for outcome, count in stats["outcomes"].items() if outcome != "success"}
+            rows.append((name, stage, stats["count"], f"{stats['p50']:.0f} ms", f"{stats['p95']:.0f} ms",
+                         f"{stats['p99']:.0f} ms", ", ".join(f"{k} {v}" for k, v in failed.items()) or "-"))
+    print("\nper stage")
+    print_table(rows, ("scenario", "stage", "calls", "p50", "p95", "p99", "failures"))
+
+    memory = results.get("memory")
+    if memory:
+        print(f"\nmemory: {memory['turns']} turns over {memory['sessions']} sessions grew "
+              f"{memory['growth_bytes'] / 1024:.1f} KiB ({memory['growth_bytes_per_turn']:.0f} B/turn), "
+              f"peak traced {memory['peak_traced_bytes'] / 1024 / 1024:.1f} MiB")
+        print_table([(top["location"], f"{top['size_diff'] / 1024:+.1f} KiB", f"{top['count_diff']:+d}")
+                     for top in memory["top_growth"]], ("allocated at", "growth", "blocks"))
+
+    profile = results.get("profile")
+    if profile:
+        print(f"\nCPU per text turn by owner ({profile['turns']} turns, profiled)")
+        print_table([(group, f"{ms:.2f} ms", f"{profile['cpu_share'].get(group, 0):.0%}")
+                     for group, ms in sorted(profile["cpu_ms_per_turn"].items())], ("code", "CPU/turn", "share"))
+        print_table([(top["function"], f"{top['cpu_ms_per_turn']:.3f} ms") for top in profile["top_voice_functions"]],
+                    ("voice/ function", "CPU/turn"))
+
+
+def compared_metrics(results):
+    """Flat metric name -> value of the results worth comparing across runs"""
+    metrics = {}
+    for name, scenario in results["scenarios"].items():
+        metrics[f"{name} throughput (turns/s)"] = scenario["turns_per_second"]
+        metrics[f"{name} failure rate"] = scenario["failure_rate"]
+        for q in ("p50", "p95", "p99"):
+            metrics[f"{name} latency {q} (ms)"] = scenario["latency_ms"][q]
+        metrics[f"{name} CPU per turn (ms)"] = scenario["cpu_ms_per_turn"]
+    if results.get("memory"):
+        metrics["memory growth per turn (B)"] = results["memory"]["growth_bytes_per_turn"]
+    if results.get("profile"):
+        metrics["voice/ CPU per turn (ms)"] = results["profile"]["cpu_ms_per_turn"].get("voice")
+    return metrics
+
+
+def print_comparison(baseline, results):
+    label = lambda run: (run.get("commit") or "unknown")[:10] + (" (dirty)" if run.get("dirty") else "")
+    print(f"\ncompared with {label(baseline)} -> {label(results)}")
+    changed = sorted(key for key in set(baseline["config"]) | set(results["config"])
+                     if key not in ("output", "compare") and baseline["config"].get(key) != results["config"].get(key))
+    if changed:
+        print(f"warning: the runs differ in {', '.join(changed)}")
+
+    before, after = compared_metrics(baseline), compared_metrics(results)
+    rows = []
+    for name in after:
+        old, new = before.get(name), after[name]
+        if old is None or new is None:
+            continue
+        change = f"{(new - old) / old:+.1%}" if old else "-"
+        rows.append((name, f"{old:g}", f"{new:g}", change))
+    print_table(rows, ("metric", "baseline", "this run", "change"))
+
+
+async def main(args):
+    # Injected failures are counted in the results, not logged
+    logging.disable(logging.CRITICAL)
+    workdir = tempfile.mkdtemp(prefix="voice-e2e-")
+    samples = {
+        "voice": make_recording(3, 16000, 1, seed=args.seed),
+        "clone": make_recording(10, 48000, 2, seed=args.seed)
+    }
+    commit, dirty = git_revision()
+    results = {
+        "version": RESULTS_VERSION,
+        "commit": commit,
+        "dirty": dirty,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "scenarios": {}
+    }
+
+    try:
+        with mock.patch("dashscope.audio.tts_v2.SpeechSynthesizer", FakeSpeechSynthesizer), \
+                mock.patch("dashscope.audio.tts_v2.VoiceEnrollmentService", FakeEnrollmentService):
+            async with LinkAIStub(REPLY) as link_ai:
+                for scenario in args.scenarios:
+                    results["scenarios"][scenario] = await run_scenario(
+                        args, link_ai, workdir, scenario, args.seed + SCENARIOS.index(scenario), samples)
+                if args.long_turns:
+                    results["memory"] = await run_memory(args, link_ai, workdir, samples)
+                if args.profile:
+                    results["profile"] = await run_profile(args, link_ai, workdir, samples)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\nresults written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(json.load(f), results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--sessions', type=int, default=8)
+    parser.add_argument('--turns', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--sigma', type=float, default=0.35)
+    parser.add_argument('--fail-rate', type=float, default=0.01)
+    parser.add_argument('--llm-latency', type=float, default=0.3)
+    parser.add_argument('--llm-chars-per-second', type=float, default=150)
+    parser.add_argument('--asr-latency', type=float, default=0.2)
+    parser.add_argument('--tts-latency', type=float, default=0.1)
+    parser.add_argument('--tts-per-char', type=float, default=0.002)
+    parser.add_argument('--oss-latency', type=float, default=0.03)
+    parser.add_argument('--enroll-latency', type=float, default=0.15)
+    parser.add_argument('--long-turns', type=int, default=400)
+    parser.add_argument('--long-sessions', type=int, default=4)
+    parser.add_argument('--top', type=int, default=8)
+    parser.add_argument('--profile', action='store_true')
+    parser.add_argument('--output')
+    parser.add_argument('--compare')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,916 @@
+"""
+Local stand-ins for the external services used by the voice module
+"""
+import json
+import math
+import uuid
+import random
+import socket
+import asyncio
+import hashlib
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Union
+from unittest import mock
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.etree import ElementTree
+
+import oss2
+from aiohttp import web
+
+from voice import voice_dialogue
+from voice.oss_storage import OssStorage
+from voice.voice_dialogue import VoiceDialogue
+
+
+class InjectedFailure(Exception):
+    """Failure of a fake upstream call drawn from its CallProfile"""
+
+
+class CallProfile:
+    """
+    Latency distribution and failure rate of a fake upstream call
+
+    Fakes take one wherever they take a fixed latency. Latencies are
+    lognormal around ``median`` with shape ``sigma`` (0 for a fixed
+    latency) and ``fail_rate`` of the calls fail. Draws come from a
+    generator seeded with ``seed``, so runs are repeatable.
+    """
+    def __init__(self, median: float, sigma: float = 0.0, fail_rate: float = 0.0, seed: Optional[int] = None):
+        self.median = median
+        self.sigma = sigma
+        self.fail_rate = fail_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        if not self.sigma or self.median <= 0:
+            return self.median
+        with self._lock:
+            return self._rng.lognormvariate(math.log(self.median), self.sigma)
+
+    def fails(self) -> bool:
+        if not self.fail_rate:
+            return False
+        with self._lock:
+            return self._rng.random() < self.fail_rate
+
+
+# A fixed latency in seconds or a CallProfile
+Latency = Union[float, CallProfile]
+
+
+def delay(latency: Latency) -> float:
+    """Seconds to wait for a fixed latency or one drawn from a CallProfile"""
+    return latency.sample() if isinstance(latency, CallProfile) else latency
+
+
+def fails(latency: Latency) -> bool:
+    """Whether a call with this latency (or CallProfile) fails"""
+    return isinstance(latency, CallProfile) and latency.fails()
+
+
+def _wait(latency: Latency) -> bool:
+    """Sleep for a call's latency; True if the call should fail"""
+    time.sleep(delay(latency))
+    return fails(latency)
+
+
+class FakeTextToSpeech:
+    """
+    Blocking TTS stand-in whose latency grows with the text length
+
+    With ``on_audio`` the audio is handed over ``chunk_chars`` characters at
+    a time as it is "generated", like DashScope streaming frames. A
+    CallProfile as ``base_latency`` also injects failures.
+    """
+    def __init__(
+        self,
+        base_latency: Latency = 0.15,
+        per_char_latency: float = 0.01,
+        bytes_per_char: int = 400,
+        chunk_chars: int = 4
+    ):
+        self.base_latency = base_latency
+        self.per_char_latency = per_char_latency
+        self.bytes_per_char = bytes_per_char
+        self.chunk_chars = chunk_chars
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def synthesize(self, text: str, voice_id: str, on_audio=None, **kwargs) -> Dict[str, Any]:
+        with self._lock:
+            self.calls += 1
+            request_id = f"fake-tts-{self.calls}"
+        if _wait(self.base_latency):
+            return {"audio": None, "request_id": request_id, "success": False,
+                    "error": "injected failure", "error_type": "InjectedFailure"}
+        if on_audio is None:
+            time.sleep(self.per_char_latency * len(text))
+        else:
+            for start in range(0, len(text), self.chunk_chars):
+                chars = len(text[start:start + self.chunk_chars])
+                time.sleep(self.per_char_latency * chars)
+                on_audio(b"\x00" * (self.bytes_per_char * chars))
+        return {
+            "audio": b"\x00" * (self.bytes_per_char * len(text)),
+            "request_id": request_id,
+            "cached": False,
+            "success": True
+        }
+
+    def invalidate_voice(self, voice_id: str):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeSpeechSynthesizer:
+    """
+    Stand-in for ``dashscope.audio.tts_v2.SpeechSynthesizer``
+
+    Patch it over ``dashscope.audio.tts_v2.SpeechSynthesizer`` to exercise
+    the real TextToSpeech without DashScope. Latency is configured on the
+    class (a CallProfile there also injects failures) and ``calls`` counts
+    synthesis requests across instances. It also has the private SDK hooks
+    SynthesizerPool relies on to reuse an instance.
+    """
+    latency = 0.2
+    per_char_latency = 0.005
+    bytes_per_char = 400
+    calls = 0
+    _lock = threading.Lock()
+
+    def __init__(self, model: str, voice: str, format=None, **kwargs):
+        self.model = model
+        self.voice = voice
+        self.format = format
+        self.callback = None
+        self.connected = True
+        self._last_request_id = None
+
+    def _SpeechSynthesizer__reset(self):
+        pass
+
+    def _SpeechSynthesizer__update_params(self, model: str, voice: str, format=None, callback=None, **kwargs):
+        self.model = model
+        self.voice = voice
+        self.format = format
+        self.callback = callback
+
+    def _SpeechSynthesizer__is_connected(self) -> bool:
+        return self.connected
+
+    def close(self):
+        self.connected = False
+
+    def call(self, text: str) -> bytes:
+        cls = type(self)
+        with cls._lock:
+            cls.calls += 1
+            self._last_request_id = f"fake-synth-{cls.calls}"
+        if _wait(cls.latency):
+            raise InjectedFailure(f"synthesis task {self._last_request_id} failed")
+        time.sleep(cls.per_char_latency * len(text))
+        audio = f"{self.voice}:{text}".encode("utf-8").ljust(cls.bytes_per_char * len(text), b"\x00")
+        if self.callback is not None:
+            self.callback.on_data(audio)
+        return audio
+
+    def get_last_request_id(self) -> Optional[str]:
+        return self._last_request_id
+
+
+class FakeEnrollmentService:
+    """
+    Stand-in for ``dashscope.audio.tts_v2.VoiceEnrollmentService``
+
+    Patch it over ``dashscope.audio.tts_v2.VoiceEnrollmentService``. New
+    voices report DEPLOYING until ``ready_after`` seconds have passed.
+    ``latency`` may be a CallProfile to inject failures.
+    """
+    latency = 0.0
+    ready_after = 0.0
+
+    def __init__(self, *args, **kwargs):
+        self.voices: Dict[str, Dict] = {}
+        self.requests: Counter = Counter()
+        self._created: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _call(self, operation: str):
+        with self._lock:
+            self.requests[operation] += 1
+        if _wait(self.latency):
+            raise InjectedFailure(f"{operation} failed")
+
+    def _view(self, voice_id: str) -> Dict:
+        voice = dict(self.voices[voice_id])
+        created = self._created.get(voice_id)
+        if created is not None and voice["status"] == "DEPLOYING" and time.monotonic() - created >= self.ready_after:
+            voice["status"] = "OK"
+        return voice
+
+    def create_voice(self, target_model: str, prefix: str, url: str) -> str:
+        self._call("create_voice")
+        with self._lock:
+            voice_id = f"{target_model}-{prefix}-{len(self.voices):08d}"
+            self.voices[voice_id] = {
+                "voice_id": voice_id,
+                "status": "DEPLOYING",
+                "gmt_create": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "target_model": target_model,
+                "resource_link": url
+            }
+            self._created[voice_id] = time.monotonic()
+        return voice_id
+
+    def list_voices(self, prefix: Optional[str] = None, page_index: int = 0, page_size: int = 10):
+        self._call("list_voices")
+        voice_ids = list(self.voices)[page_index * page_size:(page_index + 1) * page_size]
+        return [self._view(voice_id) for voice_id in voice_ids]
+
+    def query_voice(self, voice_id: str) -> Dict:
+        self._call("query_voice")
+        return self._view(voice_id)
+
+    def update_voice(self, voice_id: str, url: str):
+        self._call("update_voice")
+        self.voices[voice_id]["resource_link"] = url
+
+    def delete_voice(self, voice_id: str):
+        self._call("delete_voice")
+        self.voices.pop(voice_id, None)
+
+
+class FakeBucket:
+    """
+    In-memory stand-in for ``oss2.Bucket`` that counts requests per operation
+
+    Every request waits ``latency``; with ``bandwidth`` set, uploads also
+    take their size divided by that many bytes per second. With a
+    CallProfile as ``latency``, failed requests raise a 503 ServerError.
+    """
+    def __init__(self, latency: Latency = 0.05, bandwidth: Optional[float] = None):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.objects: Dict[str, bytes] = {}
+        self.requests: Counter = Counter()
+        self.bytes_uploaded = 0
+        self._lock = threading.Lock()
+
+    def _request(self, operation: str):
+        with self._lock:
+            self.requests[operation] += 1
+        if _wait(self.latency):
+            raise oss2.exceptions.ServerError(503, {}, b"", {"Code": "ServiceUnavailable", "Message": "injected failure"})
+
+    def get_bucket_info(self):
+        self._request("GetBucketInfo")
+        return SimpleNamespace(status=200)
+
+    def create_bucket(self, permission=None):
+        self._request("PutBucket")
+        return SimpleNamespace(status=200)
+
+    def put_object(self, key: str, data, headers=None):
+        self._request("PutObject")
+        data = bytes(data)
+        if self.bandwidth:
+            time.sleep(len(data) / self.bandwidth)
+        with self._lock:
+            self.objects[key] = data
+            self.bytes_uploaded += len(data)
+        return SimpleNamespace(status=200)
+
+    def put_object_from_file(self, key: str, filename: str, headers=None):
+        with open(filename, "rb") as f:
+            return self.put_object(key, f.read(), headers)
+
+    def object_exists(self, key: str) -> bool:
+        self._request("HeadObject")
+        return key in self.objects
+
+    def get_object_to_file(self, key: str, filename: str):
+        self._request("GetObject")
+        with open(filename, "wb") as f:
+            f.write(self.objects[key])
+
+    def delete_object(self, key: str):
+        self._request("DeleteObject")
+        with self._lock:
+            self.objects.pop(key, None)
+
+    def batch_delete_objects(self, key_list):
+        self._request("DeleteMultipleObjects")
+        with self._lock:
+            deleted = [key for key in key_list if self.objects.pop(key, None) is not None]
+        return SimpleNamespace(status=200, deleted_keys=deleted)
+
+    def list_objects_v2(self, prefix: str = "", continuation_token: str = "", max_keys: int = 100, **kwargs):
+        self._request("ListObjectsV2")
+        keys = sorted(key for key in self.objects if key.startswith(prefix) and key > continuation_token)
+        page = keys[:max_keys]
+        return SimpleNamespace(
+            status=200,
+            object_list=[SimpleNamespace(key=key, size=len(self.objects[key])) for key in page],
+            is_truncated=len(keys) > max_keys,
+            next_continuation_token=page[-1] if page else ""
+        )
+
+    def sign_url(self, method: str, key: str, expires: int, slash_safe: bool = False, **kwargs) -> str:
+        # Signing is a local computation in oss2, so it doesn't count as a request
+        return f"https://bench.oss.local/{key}?Expires={int(time.time()) + expires}"
+
+
+class FakeStorage(OssStorage):
+    """
+    The real OssStorage running against an in-memory FakeBucket
+    """
+    def __init__(self, latency: Latency = 0.05, bandwidth: Optional[float] = None, **kwargs):
+        bucket = FakeBucket(latency=latency, bandwidth=bandwidth)
+        with mock.patch("oss2.Bucket", lambda *args, **kw: bucket):
+            super().__init__(access_key_id="bench", access_key_secret="bench", **kwargs)
+
+
+class OssStub:
+    """
+    Local HTTP server speaking the part of the OSS API that uploads use
+
+    Handles GetBucketInfo, PutObject, DeleteObject, DeleteMultipleObjects,
+    ListObjectsV2 and the multipart calls (initiate, upload part, list parts, complete,
+    abort) with path-style URLs, so a real ``oss2.Bucket``
+    pointed at ``endpoint`` works against it. Every request waits
+    ``latency`` and bodies are read at ``bandwidth`` bytes per second per
+    connection, like a single TCP stream to a distant region. Upload
+    requests (PUTs) whose ordinal is in ``fail_requests`` are answered with
+    HTTP 500 once their body has been received. Objects are kept as their
+    size and MD5 only.
+    """
+    def __init__(self, latency: float = 0.02, bandwidth: float = 25e6, fail_requests=()):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.fail_requests = set(fail_requests)
+        self.requests: Counter = Counter()
+        self.bytes_received = 0
+        self.objects: Dict[str, Dict[str, Any]] = {}
+        self.uploads: Dict[str, Dict[int, bytes]] = {}
+        self.endpoint: Optional[str] = None
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _read_body(self, handler: BaseHTTPRequestHandler) -> bytes:
+        """Read the request body at the configured bandwidth"""
+        length = handler.headers.get("Content-Length")
+        if length is None and handler.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(handler.rfile.readline().strip(), 16)
+                if size == 0:
+                    handler.rfile.readline()
+                    break
+                chunks.append(self._read_exact(handler, size))
+                handler.rfile.readline()
+            return b"".join(chunks)
+        return self._read_exact(handler, int(length or 0))
+
+    def _read_exact(self, handler: BaseHTTPRequestHandler, size: int) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            chunk = handler.rfile.read(min(256 * 1024, size - len(data)))
+            if not chunk:
+                break
+            data += chunk
+            with self._lock:
+                self.bytes_received += len(chunk)
+            time.sleep(len(chunk) / self.bandwidth)
+        return bytes(data)
+
+    def _handle(self, handler: BaseHTTPRequestHandler):
+        url = urlsplit(handler.path)
+        query = parse_qs(url.query, keep_blank_values=True)
+        key = unquote(url.path.split("/", 2)[2]) if url.path.count("/") >= 2 else ""
+        body = self._read_body(handler)
+        time.sleep(self.latency)
+
+        if handler.command == "PUT":
+            operation = "UploadPart" if "partNumber" in query else "PutObject"
+            with self._lock:
+                self._puts += 1
+                fail = self._puts in self.fail_requests
+            self.requests[operation] += 1
+            if fail:
+                return self._reply(handler, 500, _xml("Error", Code="InternalError", Message="injected failure"))
+
+            etag = f'"{hashlib.md5(body).hexdigest().upper()}"'
+            if operation == "UploadPart":
+                with self._lock:
+                    self.uploads[query["uploadId"][0]][int(query["partNumber"][0])] = body
+            else:
+                self.objects[key] = {"size": len(body), "md5": hashlib.md5(body).hexdigest()}
+            return self._reply(handler, 200, b"", {"ETag": etag})
+
+        if handler.command == "POST" and "uploads" in query:
+            self.requests["InitiateMultipartUpload"] += 1
+            upload_id = uuid.uuid4().hex
+            self.uploads[upload_id] = {}
+            return self._reply(handler, 200, _xml(
+                "InitiateMultipartUploadResult", Bucket="bench", Key=key, UploadId=upload_id))
+
+        if handler.command == "POST" and "uploadId" in query:
+            self.requests["CompleteMultipartUpload"] += 1
+            parts = self.uploads.pop(query["uploadId"][0])
+            numbers = [int(e.text) for e in ElementTree.fromstring(body).iter("PartNumber")]
+            md5 = hashlib.md5()
+            for number in numbers:
+                md5.update(parts[number])
+            self.objects[key] = {"size": sum(len(parts[n]) for n in numbers), "md5": md5.hexdigest()}
+            return self._reply(handler, 200, _xml(
+                "CompleteMultipartUploadResult", Bucket="bench", Key=key, ETag=f'"{md5.hexdigest().upper()}-{len(numbers)}"'))
+
+        if handler.command == "GET" and "uploadId" in query:
+            self.requests["ListParts"] += 1
+            root = ElementTree.Element("ListPartsResult")
+            for tag, text in (("Bucket", "bench"), ("Key", key), ("UploadId", query["uploadId"][0]),
+                              ("PartNumberMarker", "0"), ("NextPartNumberMarker", "0"),
+                              ("MaxParts", "1000"), ("IsTruncated", "false")):
+                ElementTree.SubElement(root, tag).text = text
+            for number, data in sorted(self.uploads.get(query["uploadId"][0], {}).items()):
+                part = ElementTree.SubElement(root, "Part")
+                ElementTree.SubElement(part, "PartNumber").text = str(number)
+                ElementTree.SubElement(part, "LastModified").text = "2024-01-01T00:00:00.000Z"
+                ElementTree.SubElement(part, "ETag").text = f'"{hashlib.md5(data).hexdigest().upper()}"'
+                ElementTree.SubElement(part, "Size").text = str(len(data))
+            return self._reply(handler, 200, ElementTree.tostring(root))
+
+        if handler.command == "DELETE" and "uploadId" in query:
+            self.requests["AbortMultipartUpload"] += 1
+            self.uploads.pop(query["uploadId"][0], None)
+            return self._reply(handler, 204, b"")
+
+        if handler.command == "DELETE":
+            self.requests["DeleteObject"] += 1
+            with self._lock:
+                self.objects.pop(key, None)
+            return self._reply(handler, 204, b"")
+
+        if handler.command == "POST" and "delete" in query:
+            self.requests["DeleteMultipleObjects"] += 1
+            root = ElementTree.Element("DeleteResult")
+            with self._lock:
+                for element in ElementTree.fromstring(body).iter("Key"):
+                    if self.objects.pop(element.text, None) is not None:
+                        ElementTree.SubElement(ElementTree.SubElement(root, "Deleted"), "Key").text = element.text
+            return self._reply(handler, 200, ElementTree.tostring(root))
+
+        if handler.command == "GET" and "bucketInfo" in query:
+            self.requests["GetBucketInfo"] += 1
+            root = ElementTree.Element("BucketInfo")
+            bucket = ElementTree.SubElement(root, "Bucket")
+            for tag, text in (("Name", "bench"), ("CreationDate", "2024-01-01T00:00:00.000Z"),
+                              ("StorageClass", "Standard"), ("ExtranetEndpoint", "127.0.0.1"),
+                              ("IntranetEndpoint", "127.0.0.1"), ("Location", "oss-bench")):
+                ElementTree.SubElement(bucket, tag).text = text
+            owner = ElementTree.SubElement(bucket, "Owner")
+            ElementTree.SubElement(owner, "DisplayName").text = "bench"
+            ElementTree.SubElement(owner, "ID").text = "bench"
+            acl = ElementTree.SubElement(bucket, "AccessControlList")
+            ElementTree.SubElement(acl, "Grant").text = "private"
+            return self._reply(handler, 200, ElementTree.tostring(root))
+
+        if handler.command == "GET" and query.get("list-type") == ["2"]:
+            self.requests["ListObjectsV2"] += 1
+            prefix = query.get("prefix", [""])[0]
+            token = query.get("continuation-token", [""])[0]
+            max_keys = int(query.get("max-keys", ["100"])[0])
+            with self._lock:
+                keys = sorted(k for k in self.objects if k.startswith(prefix) and k > token)
+                page = [(k, self.objects[k]) for k in keys[:max_keys]]
+            root = ElementTree.Element("ListBucketResult")
+            truncated = len(keys) > max_keys
+            ElementTree.SubElement(root, "IsTruncated").text = "true" if truncated else "false"
+            if truncated:
+                ElementTree.SubElement(root, "NextContinuationToken").text = page[-1][0]
+            for k, info in page:
+                contents = ElementTree.SubElement(root, "Contents")
+                for tag, text in (("Key", k), ("LastModified", "2024-01-01T00:00:00.000Z"),
+                                  ("ETag", f'"{info["md5"].upper()}"'), ("Type", "Normal"),
+                                  ("Size", str(info["size"])), ("StorageClass", "Standard")):
+                    ElementTree.SubElement(contents, tag).text = text
+            return self._reply(handler, 200, ElementTree.tostring(root))
+
+        return self._reply(handler, 400, _xml("Error", Code="NotImplemented", Message=handler.command))
+
+    @staticmethod
+    def _reply(handler: BaseHTTPRequestHandler, status: int, body: bytes, headers: Optional[Dict[str, str]] = None):
+        handler.send_response(status)
+        handler.send_header("x-oss-request-id", uuid.uuid4().hex)
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def start(self) -> str:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_request(self):
+                stub._handle(self)
+
+            do_GET = do_PUT = do_POST = do_DELETE = do_HEAD = do_request
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self.endpoint = f"http://127.0.0.1:{self._server.server_port}"
+        return self.endpoint
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self) -> "OssStub":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def _xml(root: str, **fields: str) -> bytes:
+    element = ElementTree.Element(root)
+    for tag, text in fields.items():
+        ElementTree.SubElement(element, tag).text = text
+    return ElementTree.tostring(element)
+
+
+class FakeRecognizer:
+    """
+    Blocking speech recognizer stand-in returning a fixed transcript
+
+    A CallProfile as ``latency`` also injects failed recognitions.
+    """
+    def __init__(self, text: str = "我今天心情不太好", latency: Latency = 0.3):
+        self.text = text
+        self.latency = latency
+
+    def _recognize(self) -> Dict[str, Any]:
+        if _wait(self.latency):
+            return {"text": "", "success": False, "error": "injected failure", "error_type": "InjectedFailure"}
+        return {"text": self.text, "success": True}
+
+    def recognize_from_file(self, audio_file_path: str) -> Dict[str, Any]:
+        return self._recognize()
+
+    def recognize_from_bytes(self, audio_bytes: bytes, file_format: str = "wav") -> Dict[str, Any]:
+        return self._recognize()
+
+    def close(self):
+        pass
+
+
+class FakeVoiceManager:
+    """
+    Voice manager stand-in that never talks to DashScope
+    """
+    def __init__(self, **kwargs):
+        self.voices: Dict[str, Dict] = {}
+        self.listeners = []
+
+    def add_voice_listener(self, callback):
+        self.listeners.append(callback)
+
+    def close(self):
+        pass
+
+    def create_voice(self, target_model: str, name: str, description: str, audio_url: str) -> Dict:
+        voice_id = f"{target_model}-{name}-{len(self.voices)}"
+        self.voices[voice_id] = {
+            "voice_id": voice_id,
+            "name": name,
+            "description": description,
+            "target_model": target_model,
+            "audio_url": audio_url,
+            "status": "PENDING"
+        }
+        return self.voices[voice_id]
+
+
+class LinkAIStub:
+    """
+    Local aiohttp server imitating the Link AI chat completions endpoint
+
+    ``latency`` is the time to the first token, plus ``latency_per_kb`` for
+    every KiB of request body to model prompt processing, and
+    ``chars_per_second`` the generation speed after that. Requests with ``"stream": true`` get the
+    reply as server-sent events in chunks of ``chunk_chars`` characters;
+    other requests get a single JSON body once the whole reply is generated.
+    With ``max_concurrency`` set, requests beyond that many in flight are
+    answered with HTTP 429 like a rate-limited upstream. With a CallProfile
+    as ``latency``, failed requests are answered with HTTP 500 after it.
+    """
+    def __init__(
+        self,
+        reply: str,
+        latency: Latency = 0.5,
+        chars_per_second: Optional[float] = None,
+        chunk_chars: int = 4,
+        latency_per_kb: float = 0.0,
+        max_concurrency: Optional[int] = None
+    ):
+        self.reply = reply
+        self.latency = latency
+        self.latency_per_kb = latency_per_kb
+        self.chars_per_second = chars_per_second
+        self.chunk_chars = chunk_chars
+        self.max_concurrency = max_concurrency
+        self.requests = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.request_bytes: List[int] = []
+        self.url: Optional[str] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    def _generation_time(self, chars: int) -> float:
+        return chars / self.chars_per_second if self.chars_per_second else 0.0
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        if self.max_concurrency is not None and self.in_flight >= self.max_concurrency:
+            self.throttled += 1
+            return web.json_response({"error": "rate limited"}, status=429)
+
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return await self._respond(request)
+        finally:
+            self.in_flight -= 1
+
+    async def _respond(self, request: web.Request) -> web.StreamResponse:
+        raw = await request.read()
+        self.request_bytes.append(len(raw))
+        body = json.loads(raw)
+        await asyncio.sleep(delay(self.latency) + self.latency_per_kb * len(raw) / 1024)
+        if fails(self.latency):
+            return web.json_response({"error": "injected failure"}, status=500)
+
+        if not body.get("stream"):
+            await asyncio.sleep(self._generation_time(len(self.reply)))
+            return web.json_response({
+                "choices": [{"message": {"role": "assistant", "content": self.reply}}]
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for i in range(0, len(self.reply), self.chunk_chars):
+            chunk = self.reply[i:i + self.chunk_chars]
+            event = {"choices": [{"index": 0, "delta": {"content": chunk}}]}
+            await response.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+            await asyncio.sleep(self._generation_time(len(chunk)))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post('/v1/chat/completions', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        await web.SockSite(self._runner, sock).start()
+
+        self.url = f"http://127.0.0.1:{port}/v1/chat/completions"
+        return self.url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def __aenter__(self) -> "LinkAIStub":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+
+class TtsWebsocketStub:
+    """
+    Local aiohttp websocket server speaking the DashScope tts_v2 protocol
+
+    Point ``dashscope.base_websocket_api_url`` at ``url`` to run the real
+    SpeechSynthesizer against it. A new connection waits ``handshake_latency``
+    before the upgrade completes, like the TLS and auth round trips to
+    DashScope. Each task waits ``latency`` before task-started and then
+    ``per_char_latency`` per character of text before the audio, which is
+    sent in ``frame_bytes`` frames followed by task-finished.
+    drop_connections() closes every open connection from the server side,
+    like DashScope dropping idle sockets. With ``rate_limit`` set, tasks
+    beyond that many started within a second fail with
+    Throttling.RateQuota, and ``fail_rate`` of the other tasks fail with
+    InternalError. With ``chars_per_second`` set, the audio is as long as
+    the text spoken at that rate and as large as the requested format and
+    bit rate would make it, instead of ``bytes_per_char`` per character.
+    With ``stream_frames`` the per-character time is spread over the
+    frames, so audio arrives while it is still being generated.
+    """
+    def __init__(
+        self,
+        handshake_latency: float = 0.05,
+        latency: float = 0.02,
+        per_char_latency: float = 0.0005,
+        bytes_per_char: int = 400,
+        frame_bytes: int = 4096,
+        rate_limit: Optional[float] = None,
+        fail_rate: float = 0.0,
+        seed: int = 0,
+        chars_per_second: Optional[float] = None,
+        stream_frames: bool = False
+    ):
+        self.handshake_latency = handshake_latency
+        self.latency = latency
+        self.per_char_latency = per_char_latency
+        self.bytes_per_char = bytes_per_char
+        self.frame_bytes = frame_bytes
+        self.rate_limit = rate_limit
+        self.fail_rate = fail_rate
+        self.chars_per_second = chars_per_second
+        self.stream_frames = stream_frames
+        self.connections = 0
+        self.tasks = 0
+        self.throttled = 0
+        self.failed = 0
+        self._started: List[float] = []
+        self._random = random.Random(seed)
+        self.open_connections = 0
+        self.peak_connections = 0
+        self.url: Optional[str] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._sockets = set()
+
+    async def drop_connections(self):
+        for ws in list(self._sockets):
+            await ws.close()
+
+    async def _handle(self, request: web.Request) -> web.WebSocketResponse:
+        await asyncio.sleep(self.handshake_latency)
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+        self.open_connections += 1
+        self.peak_connections = max(self.peak_connections, self.open_connections)
+        self._sockets.add(ws)
+        text = []
+        parameters = {}
+        try:
+            async for message in ws:
+                if message.type != web.WSMsgType.TEXT:
+                    continue
+                header = json.loads(message.data)["header"]
+                action, task_id = header["action"], header["task_id"]
+                if action == "run-task":
+                    self.tasks += 1
+                    text = []
+                    parameters = json.loads(message.data)["payload"]["parameters"]
+                    await asyncio.sleep(self.latency)
+                    error = self._task_error()
+                    if error is not None:
+                        await ws.send_str(json.dumps({"header": {
+                            "event": "task-failed", "task_id": task_id,
+                            "error_code": error, "error_message": "injected by stub"
+                        }}))
+                        continue
+                    await ws.send_str(json.dumps({"header": {"event": "task-started", "task_id": task_id}}))
+                elif action == "continue-task":
+                    text.append(json.loads(message.data)["payload"]["input"].get("text", ""))
+                elif action == "finish-task":
+                    chars = sum(len(part) for part in text)
+                    audio = b"\x00" * self._audio_bytes(chars, parameters)
+                    frames = range(0, len(audio), self.frame_bytes)
+                    frame_delay = self.per_char_latency * chars / max(1, len(frames))
+                    if not self.stream_frames:
+                        await asyncio.sleep(self.per_char_latency * chars)
+                    for start in frames:
+                        if self.stream_frames:
+                            await asyncio.sleep(frame_delay)
+                        await ws.send_bytes(audio[start:start + self.frame_bytes])
+                    await ws.send_str(json.dumps({"header": {"event": "task-finished", "task_id": task_id}}))
+        finally:
+            self.open_connections -= 1
+            self._sockets.discard(ws)
+        return ws
+
+    def _audio_bytes(self, chars: int, parameters: Dict[str, Any]) -> int:
+        """Size of the audio for chars characters in the requested format"""
+        if not self.chars_per_second:
+            return self.bytes_per_char * chars
+        seconds = chars / self.chars_per_second
+        if parameters.get("format") == "opus":
+            return int(seconds * parameters["bit_rate"] * 1000 / 8)
+        if parameters.get("format") == "mp3":
+            # DashScope's MP3 formats are 128 kbps up to 16 kHz, 256 kbps above
+            return int(seconds * (128 if parameters["sample_rate"] <= 16000 else 256) * 1000 / 8)
+        return int(seconds * parameters["sample_rate"] * 2)
+
+    def _task_error(self) -> Optional[str]:
+        """Error code a new task fails with, None if it runs"""
+        if self.rate_limit is not None:
+            now = time.monotonic()
+            self._started = [t for t in self._started if now - t < 1.0]
+            if len(self._started) >= self.rate_limit:
+                self.throttled += 1
+                return "Throttling.RateQuota"
+            self._started.append(now)
+        if self._random.random() < self.fail_rate:
+            self.failed += 1
+            return "InternalError"
+        return None
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get('/api-ws/v1/inference', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        await web.SockSite(self._runner, sock).start()
+
+        self.url = f"ws://127.0.0.1:{port}/api-ws/v1/inference"
+        return self.url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def __aenter__(self) -> "TtsWebsocketStub":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+
+def build_dialogue(
+    link_ai_url: str,
+    tts: Optional[FakeTextToSpeech] = None,
+    storage: Optional[FakeStorage] = None,
+    recognizer: Optional[FakeRecognizer] = None,
+    voice_manager: Optional[FakeVoiceManager] = None,
+    **kwargs
+) -> VoiceDialogue:
+    """
+    Build a VoiceDialogue wired to local fakes instead of DashScope and OSS
+    """
+    tts = tts or FakeTextToSpeech()
+    storage = storage or FakeStorage()
+    recognizer = recognizer or FakeRecognizer()
+    voice_manager = voice_manager or FakeVoiceManager()
+
+    with mock.patch.object(voice_dialogue, 'VoiceManager', lambda **kw: voice_manager), \
+            mock.patch.object(voice_dialogue, 'TextToSpeech', lambda **kw: tts), \
+            mock.patch.object(voice_dialogue, 'SpeechRecognizer', lambda **kw: recognizer), \
+            mock.patch.object(voice_dialogue, 'OssStorage', lambda **kw: storage):
+        kwargs.setdefault('audio_cache_dir', tempfile.mkdtemp(prefix='voice-bench-'))
+        dialogue = VoiceDialogue(
+            dashscope_api_key='bench',
+            oss_access_key_id='bench',
+            oss_access_key_secret='bench',
+            link_ai_api_url=link_ai_url,
+            link_ai_api_key='bench',
+            link_ai_app_code='bench',
+            **kwargs
+        )
+        # Components are created lazily; create them while the fakes are patched in
+        dialogue.initialize()
+    return dialogue
+
+
+def print_table(rows, headers):
+    """Print rows as a plain fixed-width table"""
+    widths = [max(len(str(x)) for x in col) for col in zip(headers, *rows)]
+    line = "  ".join(f"{{:<{w}}}" for w in widths)
+    print(line.format(*headers))
+    print(line.format(*("-" * w for w in widths)))
+    for row in rows:
+        print(line.format(*row))
+
@@ -0,0 +1,75 @@
+"""
+Link AI turns/sec with a new ClientSession per call versus the pooled session
+
+The per-call variant reproduces the previous behaviour: a fresh
+``aiohttp.ClientSession`` (connector, DNS lookup, TCP connect) for every
+turn. Against the local plain-HTTP stub this only shows the connection
+setup cost; over TLS to the real endpoint the gap is larger.
+
+Usage: python -m benchmarks.link_ai_pool [--turns 2000] [--concurrency 20]
+"""
+import argparse
+import asyncio
+import time
+
+import aiohttp
+
+from .fakes import LinkAIStub, build_dialogue, print_table
+
+
+async def request_per_call(dialogue, session_id):
+    """Previous implementation: one ClientSession per chat turn"""
+    await dialogue._save_session_message(session_id, "user", "你好")
+    request_body = {
+        "app_code": dialogue.link_ai_app_code,
+        "messages": dialogue._get_session_messages(session_id),
+        "stream": False
+    }
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {dialogue.link_ai_api_key}"
+    }
+    async with aiohttp.ClientSession() as session:
+        async with session.post(dialogue.link_ai_api_url, json=request_body, headers=headers) as response:
+            data = await response.json()
+            await dialogue._save_session_message(session_id, "assistant", data["choices"][0]["message"]["content"])
+
+
+async def request_pooled(dialogue, session_id):
+    await dialogue._save_session_message(session_id, "user", "你好")
+    await dialogue._request_link_ai(session_id)
+
+
+async def measure(request, dialogue, turns, concurrency):
+    queue = iter(range(turns))
+
+    async def worker():
+        for turn in queue:
+            await request(dialogue, f"turn-{turn}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return turns / (time.perf_counter() - start)
+
+
+async def main(args):
+    async with LinkAIStub("好的，我在听。", latency=args.llm_latency) as stub:
+        rows = []
+        for name, request in (("per-call session", request_per_call), ("pooled session", request_pooled)):
+            async with build_dialogue(stub.url, link_ai_pool_size=args.pool_size) as dialogue:
+                # Warm up so both variants start from a running server
+                await measure(request, dialogue, args.concurrency, args.concurrency)
+                rate = await measure(request, dialogue, args.turns, args.concurrency)
+            rows.append((name, f"{rate:.0f}"))
+
+    print(f"{args.turns} turns, concurrency {args.concurrency}, stub latency {args.llm_latency}s")
+    print_table(rows, ("client", "turns/sec"))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--turns', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--pool-size', type=int, default=100)
+    parser.add_argument('--llm-latency', type=float, default=0.0)
+    asyncio.run(main(parser.parse_args()))
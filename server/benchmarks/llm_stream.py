@@ -0,0 +1,72 @@
+"""
+Streamed versus buffered Link AI replies feeding the sentence pipeline
+
+Runs both modes against a local SSE stub, checks that the streamed reply is
+reassembled and saved to the session, and reports time to first text, time
+to first audio and total time.
+
+Usage: python -m benchmarks.llm_stream [--chars-per-second 40] [--runs 3]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from .fakes import FakeStorage, FakeTextToSpeech, LinkAIStub, build_dialogue, print_table
+from .tts_pipeline import REPLY
+
+
+async def run(dialogue, session_id, stream_llm):
+    start = time.perf_counter()
+    first_text = first_audio = None
+    text = ""
+    async for event in dialogue.stream_text_message("我今天很难过", session_id, "bench-voice", stream_llm=stream_llm):
+        now = time.perf_counter() - start
+        if event["type"] == "error":
+            raise RuntimeError(event["error"])
+        if event["type"] == "text":
+            first_text = first_text if first_text is not None else now
+            text += event["delta"]
+        elif event["type"] == "audio":
+            assert event["success"], event
+            first_audio = first_audio if first_audio is not None else now
+        elif event["type"] == "done":
+            assert event["response_text"] == REPLY
+            assert not stream_llm or text == REPLY
+
+    # The reply must have been saved once the stream completed
+    assert dialogue._get_session_messages(session_id)[-1] == {"role": "assistant", "content": REPLY}
+    if first_text is None:
+        first_text = first_audio
+    return first_text, first_audio, time.perf_counter() - start
+
+
+async def main(args):
+    async with LinkAIStub(REPLY, latency=args.llm_latency, chars_per_second=args.chars_per_second) as stub:
+        async with build_dialogue(
+            stub.url,
+            tts=FakeTextToSpeech(base_latency=args.tts_latency, per_char_latency=args.tts_per_char),
+            storage=FakeStorage(latency=args.upload_latency),
+            tts_pipeline_depth=args.depth
+        ) as dialogue:
+            rows = []
+            for name, stream_llm in (("buffered", False), ("streamed", True)):
+                results = [await run(dialogue, f"{name}-{i}", stream_llm) for i in range(args.runs)]
+                rows.append((name,) + tuple(
+                    f"{statistics.median(column) * 1000:.0f} ms" for column in zip(*results)
+                ))
+
+    print(f"reply: {len(REPLY)} chars; first token={args.llm_latency}s, {args.chars_per_second} chars/s")
+    print_table(rows, ("mode", "first text", "first audio", "total"))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--llm-latency', type=float, default=0.3)
+    parser.add_argument('--chars-per-second', type=float, default=40)
+    parser.add_argument('--tts-latency', type=float, default=0.15)
+    parser.add_argument('--tts-per-char', type=float, default=0.01)
+    parser.add_argument('--upload-latency', type=float, default=0.05)
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--runs', type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,91 @@
+"""
+Cost of the pipeline instrumentation, with metrics disabled and enabled
+
+1. Per call: a stage timer and a counter increment on a Metrics instance
+   without exporters (the default) and with a TextExporter.
+2. Per turn: text turns through VoiceDialogue with the fake TTS and the
+   Link AI stub, metrics disabled versus exported to a TextExporter and
+   an InMemoryExporter.
+
+Then prints the stage records of one traced turn, including the DashScope
+request ID of the synthesis, and an excerpt of the text exposition.
+
+Usage: python -m benchmarks.metrics_overhead [--calls 200000] [--turns 30]
+"""
+import time
+import asyncio
+import argparse
+import statistics
+
+from voice.metrics import InMemoryExporter, Metrics, TextExporter
+
+from .fakes import FakeStorage, FakeTextToSpeech, LinkAIStub, build_dialogue, print_table
+
+REPLY = "听起来你最近真的很辛苦。先深呼吸一下，我们可以慢慢聊。"
+
+
+def per_call_ns(metrics, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        with metrics.timer("tts", operation="synthesize"):
+            pass
+    timer = (time.perf_counter() - start) / calls * 1e9
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        metrics.inc("requests_total", stage="tts")
+    inc = (time.perf_counter() - start) / calls * 1e9
+    return timer, inc
+
+
+async def turns(args, link_ai_url, metrics):
+    tts = FakeTextToSpeech(base_latency=args.tts_latency, per_char_latency=0.0)
+    async with build_dialogue(link_ai_url, tts=tts, storage=FakeStorage(latency=0.0), metrics=metrics) as dialogue:
+        latencies = []
+        for i in range(args.turns):
+            start = time.perf_counter()
+            result = await dialogue.process_text_message("我最近压力很大", f"session-{i}", "bench-voice")
+            latencies.append(time.perf_counter() - start)
+            assert result["success"], result
+    return statistics.median(latencies), result["trace_id"]
+
+
+async def main(args):
+    rows = []
+    for name, metrics in (("disabled", Metrics()), ("TextExporter", Metrics([TextExporter()]))):
+        timer, inc = per_call_ns(metrics, args.calls)
+        rows.append((name, f"{timer:.0f} ns", f"{inc:.0f} ns"))
+    print(f"{args.calls} calls each")
+    print_table(rows, ("metrics", "timer block", "counter inc"))
+
+    text, memory = TextExporter(), InMemoryExporter()
+    async with LinkAIStub(REPLY, latency=args.llm_latency) as link_ai:
+        disabled, _ = await turns(args, link_ai.url, Metrics())
+        enabled, trace_id = await turns(args, link_ai.url, Metrics([text, memory]))
+
+    print(f"\n{args.turns} text turns, LLM {args.llm_latency * 1000:.0f} ms, TTS {args.tts_latency * 1000:.0f} ms")
+    print_table([
+        ("disabled", f"{disabled * 1000:.2f} ms"),
+        ("text + in-memory exporters", f"{enabled * 1000:.2f} ms"),
+        ("difference", f"{(enabled - disabled) * 1e6:+.0f} us")
+    ], ("metrics", "turn p50"))
+
+    print(f"\nstage calls of trace {trace_id}")
+    print_table([
+        (record.labels["stage"], record.labels.get("operation", ""), record.labels["outcome"],
+         record.attributes.get("request_id", ""))
+        for record in memory.records("voice_stage_calls_total", trace_id=trace_id)
+    ], ("stage", "operation", "outcome", "request id"))
+
+    print("\nexposition excerpt")
+    print("\n".join(line for line in text.render().splitlines()
+                    if not line.startswith("voice_stage_seconds_bucket")))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=200000)
+    parser.add_argument('--turns', type=int, default=30)
+    parser.add_argument('--llm-latency', type=float, default=0.02)
+    parser.add_argument('--tts-latency', type=float, default=0.02)
+    asyncio.run(main(parser.parse_args()))
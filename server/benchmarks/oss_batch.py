@@ -0,0 +1,124 @@
+"""
+Request counts and latency of batch and async OssStorage operations
+
+Runs against the local OSS-compatible server (``OssStub``) through the
+real oss2 client:
+
+1. Cleanup: deleting the ``--objects`` reply clips of one session one
+   DELETE at a time, as before, against ``delete_prefix``, which lists the
+   prefix and deletes up to 1000 keys per request.
+2. Upload: ``--uploads`` clips uploaded one after another, with
+   ``upload_many`` and with ``upload_many_async`` (``--concurrency`` in
+   flight).
+3. Event loop: the same uploads made from a coroutine with the blocking
+   method and with its awaitable counterpart, while a heartbeat task
+   measures how late the loop runs it.
+
+Usage: python -m benchmarks.oss_batch [--objects 1200] [--uploads 200]
+"""
+import os
+import time
+import asyncio
+import logging
+import argparse
+
+from voice.oss_storage import OssStorage
+
+from .fakes import OssStub, print_table
+
+
+def make_storage(stub, pool_size):
+    return OssStorage(
+        access_key_id="bench",
+        access_key_secret="bench",
+        bucket_name="bench",
+        endpoint=stub.endpoint,
+        check_bucket=False,
+        pool_size=pool_size
+    )
+
+
+def timed(stub, func):
+    requests = sum(stub.requests.values())
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start, sum(stub.requests.values()) - requests
+
+
+async def heartbeat(interval, lags, stop):
+    """Record how late the event loop wakes this task up"""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - expected)
+
+
+async def loop_lag(storage, items, use_async):
+    lags, stop = [], asyncio.Event()
+    beat = asyncio.ensure_future(heartbeat(0.01, lags, stop))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    for object_name, data in items:
+        if use_async:
+            await storage.upload_bytes_async(data, object_name)
+        else:
+            storage.upload_bytes(data, object_name)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    return elapsed, max(lags) if lags else 0.0
+
+
+def main(args):
+    logging.disable(logging.ERROR)
+    clip = os.urandom(args.clip_kb * 1024)
+
+    with OssStub(latency=args.latency) as stub:
+        storage = make_storage(stub, args.concurrency)
+
+        rows = []
+        for name in ("DELETE per object", "delete_prefix"):
+            names = [f"responses/session-1/{i:05d}.mp3" for i in range(args.objects)]
+            storage.upload_many([(object_name, b"x") for object_name in names])
+            if name == "DELETE per object":
+                _, elapsed, requests = timed(stub, lambda: [storage.delete_object(n) for n in names])
+            else:
+                result, elapsed, requests = timed(stub, lambda: storage.delete_prefix("responses/session-1/"))
+                assert result["deleted"] == args.objects, result
+            assert not stub.objects
+            rows.append((name, requests, f"{elapsed * 1000:.0f} ms"))
+        print(f"cleanup of one session with {args.objects} objects, stub latency {args.latency * 1000:.0f} ms")
+        print_table(rows, ("mode", "requests", "time"))
+
+        rows = []
+        items = [(f"responses/session-2/{i:05d}.mp3", clip) for i in range(args.uploads)]
+        for name, func in (
+            ("one by one", lambda: [storage.upload_bytes(data, object_name) for object_name, data in items]),
+            (f"upload_many ({args.concurrency})", lambda: storage.upload_many(items, args.concurrency)),
+            (f"upload_many_async ({args.concurrency})",
+             lambda: asyncio.run(storage.upload_many_async(items, args.concurrency))),
+        ):
+            results, elapsed, requests = timed(stub, func)
+            assert all(result["success"] for result in results)
+            rows.append((name, requests, f"{elapsed * 1000:.0f} ms", f"{elapsed / len(items) * 1000:.1f} ms"))
+        print(f"\n{args.uploads} uploads of {args.clip_kb} KiB")
+        print_table(rows, ("mode", "requests", "time", "per upload"))
+
+        rows = []
+        for name, use_async in (("upload_bytes", False), ("upload_bytes_async", True)):
+            elapsed, lag = asyncio.run(loop_lag(storage, items[:args.lag_uploads], use_async))
+            rows.append((name, f"{elapsed * 1000:.0f} ms", f"{lag * 1000:.0f} ms"))
+        print(f"\n{args.lag_uploads} sequential uploads from a coroutine")
+        print_table(rows, ("method", "time", "max loop lag"))
+        storage.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--objects', type=int, default=1200)
+    parser.add_argument('--uploads', type=int, default=200)
+    parser.add_argument('--lag-uploads', type=int, default=20)
+    parser.add_argument('--clip-kb', type=int, default=32)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.02)
+    main(parser.parse_args())
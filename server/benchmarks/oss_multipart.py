@@ -0,0 +1,109 @@
+"""
+Upload throughput of single PUTs and multipart uploads of large samples
+
+Uploads files of ``--sizes`` MiB through ``OssStorage.upload_file`` to a
+local OSS-compatible server (``OssStub``) that reads every connection at
+``--bandwidth`` MB/s. A single PUT is bound to one connection, while a
+multipart upload sends ``--threads`` parts at a time.
+
+Then one upload request of a ``--fail-size`` MiB file fails halfway
+through: a single PUT has to be sent again in full, a multipart upload
+resumes from its checkpoint and only re-sends the failed part.
+
+Usage: python -m benchmarks.oss_multipart [--sizes 1 10 50 200] [--threads 8]
+"""
+import os
+import time
+import logging
+import argparse
+import tempfile
+
+from voice.oss_storage import OssStorage
+
+from .fakes import OssStub, print_table
+
+MB = 1024 * 1024
+
+
+def make_file(directory, size_mb):
+    path = os.path.join(directory, f"sample-{size_mb}.wav")
+    block = os.urandom(MB)
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+    return path
+
+
+def make_storage(stub, work_dir, **options):
+    return OssStorage(
+        access_key_id="bench",
+        access_key_secret="bench",
+        bucket_name="bench",
+        endpoint=stub.endpoint,
+        check_bucket=False,
+        upload_checkpoint_dir=os.path.join(work_dir, "checkpoints"),
+        **options
+    )
+
+
+def upload(stub, storage, path, attempts=1):
+    """Upload a file, retrying the whole call like a caller without resume would"""
+    received = stub.bytes_received
+    start = time.perf_counter()
+    for _ in range(attempts):
+        result = storage.upload_file(path, f"voice_samples/{os.path.basename(path)}")
+        if result["success"]:
+            break
+    return result, time.perf_counter() - start, stub.bytes_received - received
+
+
+def main(args):
+    # oss2 logs failed parts at ERROR; the tables report them instead
+    logging.disable(logging.ERROR)
+    work_dir = tempfile.mkdtemp(prefix="oss-multipart-bench-")
+    part_size = args.part_size * MB
+    modes = (
+        ("single PUT", dict(multipart_threshold=1 << 62)),
+        ("multipart, 1 thread", dict(multipart_threshold=part_size, multipart_part_size=part_size, multipart_threads=1)),
+        (f"multipart, {args.threads} threads", dict(
+            multipart_threshold=part_size, multipart_part_size=part_size, multipart_threads=args.threads)),
+    )
+
+    rows = []
+    with OssStub(latency=args.latency, bandwidth=args.bandwidth * 1e6) as stub:
+        for size_mb in args.sizes:
+            path = make_file(work_dir, size_mb)
+            for name, options in modes:
+                result, elapsed, _ = upload(stub, make_storage(stub, work_dir, **options), path)
+                assert result["success"], result
+                assert stub.objects[result["object_name"]]["size"] == size_mb * MB
+                rows.append((f"{size_mb} MiB", name, f"{elapsed:.2f} s", f"{size_mb / elapsed:.1f} MiB/s"))
+            os.remove(path)
+    print(f"stub: {args.latency * 1000:.0f} ms per request, {args.bandwidth:g} MB/s per connection; "
+          f"part size {args.part_size} MiB")
+    print_table(rows, ("size", "mode", "time", "throughput"))
+
+    rows = []
+    path = make_file(work_dir, args.fail_size)
+    parts = -(-args.fail_size * MB // part_size)
+    for name, options, fail_request, attempts in (
+        ("single PUT, retried", modes[0][1], 1, 2),
+        (f"multipart, {args.threads} threads, resumed", modes[2][1], parts // 2, 1),
+    ):
+        with OssStub(latency=args.latency, bandwidth=args.bandwidth * 1e6, fail_requests={fail_request}) as stub:
+            result, elapsed, received = upload(stub, make_storage(stub, work_dir, **options), path, attempts)
+            assert result["success"], result
+            rows.append((name, f"{received / MB:.0f} MiB", f"{received / (args.fail_size * MB):.2f}x", f"{elapsed:.2f} s"))
+    print(f"\n{args.fail_size} MiB upload with one failed request")
+    print_table(rows, ("mode", "bytes sent", "of file size", "time"))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 50, 200])
+    parser.add_argument('--part-size', type=int, default=4, help='MiB')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--bandwidth', type=float, default=25, help='MB/s per connection')
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--fail-size', type=int, default=50)
+    main(parser.parse_args())
@@ -0,0 +1,98 @@
+"""
+Link AI request size and latency as a conversation grows
+
+Plays ``--turns`` text turns of one session against the Link AI stub, whose
+latency grows with the request body to model prompt processing. Compares
+the unbounded history of the previous behaviour with a turn window, a
+token budget and a turn window with a running summary, printing payload
+bytes and latency at regular turn counts and an ASCII plot of the
+payload. ``--csv`` writes every turn for plotting elsewhere.
+
+Usage: python -m benchmarks.session_history [--turns 200] [--csv history.csv]
+"""
+import csv
+import time
+import asyncio
+import argparse
+
+from .fakes import FakeStorage, FakeTextToSpeech, LinkAIStub, build_dialogue, print_table
+
+REPLY = "我明白你现在的感受。很多人在压力大的时候都会这样，先深呼吸，我们一起把事情理一理，看看哪一件最让你担心。"
+MESSAGE = "最近工作上的事情越来越多，晚上总是睡不好，我不知道该从哪里开始处理。"
+
+POLICIES = (
+    ("unbounded", dict(history_max_turns=None)),
+    ("last 10 turns", dict(history_max_turns=10)),
+    ("1500 token budget", dict(history_max_turns=None, history_max_tokens=1500)),
+    ("10 turns + summary", dict(history_max_turns=10, history_summarize=True)),
+)
+
+
+async def run(args, options):
+    async with LinkAIStub(REPLY, latency=args.latency, latency_per_kb=args.latency_per_kb) as stub:
+        tts = FakeTextToSpeech(base_latency=0, per_char_latency=0)
+        async with build_dialogue(stub.url, tts=tts, storage=FakeStorage(latency=0), **options) as dialogue:
+            latencies = []
+            for turn in range(args.turns):
+                start = time.perf_counter()
+                result = await dialogue.process_text_message(f"{MESSAGE}（第{turn + 1}次）", "bench", "bench-voice")
+                latencies.append(time.perf_counter() - start)
+                assert result["success"], result
+            stored = len(dialogue._get_session_messages("bench"))
+    return stub.request_bytes, latencies, stored
+
+
+def plot(series, width=60, height=12):
+    """ASCII plot of several series sharing one y axis"""
+    peak = max(max(values) for _, values in series)
+    marks = "*o+x"
+    grid = [[" "] * width for _ in range(height)]
+    for mark, (_, values) in zip(marks, series):
+        for column in range(width):
+            value = values[min(len(values) - 1, column * len(values) // width)]
+            row = height - 1 - int(value / peak * (height - 1))
+            grid[row][column] = mark
+    print(f"payload bytes (peak {peak:,}) against turn 1..{len(series[0][1])}")
+    for row in grid:
+        print("|" + "".join(row))
+    print("+" + "-" * width)
+    print("  ".join(f"{mark} {name}" for mark, (name, _) in zip(marks, series)))
+
+
+async def main(args):
+    results = {}
+    for name, options in POLICIES:
+        results[name] = await run(args, options)
+
+    checkpoints = sorted({1, *range(args.every, args.turns + 1, args.every)})
+    rows = []
+    for turn in checkpoints:
+        row = [turn]
+        for name, _ in POLICIES:
+            sizes, latencies, _ = results[name]
+            row.append(f"{sizes[turn - 1]:,} B / {latencies[turn - 1] * 1000:.0f} ms")
+        rows.append(row)
+
+    print(f"{args.turns} turns, stub latency {args.latency * 1000:.0f} ms + {args.latency_per_kb * 1000:.0f} ms/KiB")
+    print_table(rows, ["turn"] + [name for name, _ in POLICIES])
+    print("\nmessages held in memory after the last turn: " +
+          ", ".join(f"{name} {results[name][2]}" for name, _ in POLICIES) + "\n")
+    plot([(name, results[name][0]) for name, _ in POLICIES])
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["policy", "turn", "payload_bytes", "latency_ms"])
+            for name, (sizes, latencies, _) in results.items():
+                for turn, (size, latency) in enumerate(zip(sizes, latencies), 1):
+                    writer.writerow([name, turn, size, f"{latency * 1000:.1f}"])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--turns', type=int, default=200)
+    parser.add_argument('--every', type=int, default=25)
+    parser.add_argument('--latency', type=float, default=0.01)
+    parser.add_argument('--latency-per-kb', type=float, default=0.002)
+    parser.add_argument('--csv')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,149 @@
+"""
+Memory, latency and sharing of dialogue session stores
+
+1. Memory: ``--sessions`` one-off sessions of a few turns each are written
+   to the previous plain dict and to the in-memory LRU+TTL store, showing
+   traced memory, live sessions and evictions.
+2. Latency: mean time of a get plus an update per turn for the memory and
+   the SQLite store.
+3. Sharing: two worker processes take turns on the same sessions. With a
+   per-process dict each worker sees only its own half of every history;
+   with the SQLite store both see all of it.
+
+Usage: python -m benchmarks.session_store [--sessions 20000] [--cap 5000]
+"""
+import os
+import time
+import argparse
+import tempfile
+import tracemalloc
+import multiprocessing
+
+from voice.session_store import MemorySessionStore, SqliteSessionStore
+
+from .fakes import print_table
+
+MESSAGE = "最近工作上的事情越来越多，晚上总是睡不好，我不知道该从哪里开始处理。"
+
+
+def append(role, content):
+    def func(session):
+        session["messages"].append({"role": role, "content": content})
+        return session
+    return func
+
+
+def fill_dict(sessions, turns):
+    store = {}
+    for i in range(sessions):
+        messages = store.setdefault(f"session-{i}", [])
+        for _ in range(turns):
+            messages.append({"role": "user", "content": MESSAGE})
+            messages.append({"role": "assistant", "content": MESSAGE})
+    return store, len(store), {}
+
+
+def fill_store(store, sessions, turns):
+    for i in range(sessions):
+        for _ in range(turns):
+            store.update(f"session-{i}", append("user", MESSAGE))
+            store.update(f"session-{i}", append("assistant", MESSAGE))
+    return store, len(store), store.stats()
+
+
+def measure_memory(fill):
+    tracemalloc.start()
+    store, live, stats = fill()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, live, stats
+
+
+def measure_latency(store, turns):
+    start = time.perf_counter()
+    for i in range(turns):
+        session_id = f"latency-{i % 100}"
+        store.get(session_id)
+        store.update(session_id, append("user", MESSAGE))
+    return (time.perf_counter() - start) / turns
+
+
+def worker(db_path, worker_id, sessions, turns, barrier, results):
+    store = SqliteSessionStore(db_path) if db_path else None
+    local = {}
+    for turn in range(turns):
+        for i in range(sessions):
+            if turn % 2 != worker_id:
+                continue
+            session_id = f"shared-{i}"
+            if store is not None:
+                store.update(session_id, append("user", f"worker {worker_id} turn {turn}"))
+            else:
+                local.setdefault(session_id, []).append({"role": "user", "content": f"worker {worker_id} turn {turn}"})
+
+    # Look at the histories once both workers are done
+    barrier.wait()
+    if store is not None:
+        seen = [len(store.get(f"shared-{i}")["messages"]) for i in range(sessions)]
+        store.close()
+    else:
+        seen = [len(local.get(f"shared-{i}", [])) for i in range(sessions)]
+    results.put((worker_id, min(seen)))
+
+
+def measure_sharing(db_path, sessions, turns):
+    results = multiprocessing.Queue()
+    barrier = multiprocessing.Barrier(2)
+    processes = [
+        multiprocessing.Process(target=worker, args=(db_path, worker_id, sessions, turns, barrier, results))
+        for worker_id in (0, 1)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return sorted(results.get() for _ in processes)
+
+
+def main(args):
+    work_dir = tempfile.mkdtemp(prefix="session-store-bench-")
+
+    rows = []
+    for name, fill in (
+        ("plain dict", lambda: fill_dict(args.sessions, args.turns)),
+        (f"memory LRU, cap {args.cap}", lambda: fill_store(
+            MemorySessionStore(max_sessions=args.cap), args.sessions, args.turns)),
+    ):
+        memory, live, stats = measure_memory(fill)
+        evicted = stats.get("evicted_lru", 0) + stats.get("evicted_memory", 0) + stats.get("expired", 0)
+        rows.append((name, f"{memory / 1024 / 1024:.1f} MiB", live, evicted))
+    print(f"{args.sessions} sessions x {args.turns} turns")
+    print_table(rows, ("store", "traced memory", "live sessions", "evicted"))
+
+    rows = []
+    for name, store in (
+        ("memory LRU", MemorySessionStore()),
+        ("SQLite", SqliteSessionStore(os.path.join(work_dir, "latency.sqlite3"))),
+    ):
+        rows.append((name, f"{measure_latency(store, args.latency_turns) * 1e6:.0f} us"))
+        store.close()
+    print()
+    print_table(rows, ("store", "get + update per turn"))
+
+    rows = []
+    for name, db_path in (("per-process dict", None), ("SQLite", os.path.join(work_dir, "shared.sqlite3"))):
+        for worker_id, seen in measure_sharing(db_path, args.shared_sessions, args.shared_turns):
+            rows.append((name, worker_id, f"{seen}/{args.shared_turns}"))
+    print()
+    print_table(rows, ("store", "worker", "messages seen per session"))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=20000)
+    parser.add_argument('--turns', type=int, default=3)
+    parser.add_argument('--cap', type=int, default=5000)
+    parser.add_argument('--latency-turns', type=int, default=5000)
+    parser.add_argument('--shared-sessions', type=int, default=20)
+    parser.add_argument('--shared-turns', type=int, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,143 @@
+"""
+Pre-rendering canned phrases into voices: serial synthesize versus synthesize_batch
+
+Runs the real TextToSpeech and DashScope SDK against the local websocket
+stub, which throttles tasks beyond ``--upstream-rate`` per second and
+fails ``--fail-rate`` of the others with a transient error.
+
+1. serial loop: one synthesize call after another, as before.
+2. synthesize_batch with ``--concurrency`` threads and no rate limit: the
+   spike runs into the upstream limit and lives off its retries.
+3. synthesize_batch with a rate limit just under the upstream's, writing
+   to the cache and uploading to a fake OSS bucket in bulk.
+4. The same batch again: every job is served from the cache and nothing
+   is uploaded twice.
+
+Prints throughput, failures, upstream throttles and retries per mode, and
+a histogram of per-job latency.
+
+Usage: python -m benchmarks.tts_batch [--phrases 200] [--voices 2]
+"""
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import tempfile
+
+import dashscope
+
+from voice.audio_cache import AudioCache
+from voice.speech_synthesis import TextToSpeech
+
+from .fakes import FakeStorage, TtsWebsocketStub, print_table
+
+BUCKETS_MS = (25, 50, 100, 200, 400, 800, 1600, 3200)
+
+OPENINGS = ["我能理解", "听起来", "谢谢你告诉我", "没关系", "我在这里陪着你", "慢慢来"]
+ENDINGS = ["你现在的感受。", "你真的很努力了。", "我们一起想办法。", "先照顾好自己。", "这并不是你的错。"]
+
+
+def phrases(count):
+    return [f"{OPENINGS[i % len(OPENINGS)]}，{ENDINGS[i % len(ENDINGS)]}（{i}）" for i in range(count)]
+
+
+def histogram(latencies, width=40):
+    """Latency histogram as text lines, one per bucket"""
+    counts = [0] * (len(BUCKETS_MS) + 1)
+    for latency in latencies:
+        ms = latency * 1000
+        counts[next((i for i, edge in enumerate(BUCKETS_MS) if ms < edge), len(BUCKETS_MS))] += 1
+    labels = [f"< {edge} ms" for edge in BUCKETS_MS] + [f">= {BUCKETS_MS[-1]} ms"]
+    peak = max(counts) or 1
+    return [f"  {label:>11}  {count:5d}  {'#' * round(width * count / peak)}" for label, count in zip(labels, counts)]
+
+
+def run(stub, name, jobs, func):
+    throttled, failed, tasks = stub.throttled, stub.failed, stub.tasks
+    start = time.perf_counter()
+    results = list(func())
+    elapsed = time.perf_counter() - start
+    ok = [result for result in results if result["success"]]
+    row = (
+        name,
+        f"{len(ok) / elapsed:.1f}",
+        f"{elapsed:.2f} s",
+        len(jobs) - len(ok),
+        stub.tasks - tasks,
+        stub.throttled - throttled,
+        stub.failed - failed,
+        sum(result.get("attempts", 1) - 1 for result in results if not result.get("cached")),
+        sum(bool(result.get("cached")) for result in results)
+    )
+    return row, [result["latency"] for result in ok]
+
+
+def serial(tts, jobs):
+    for text, voice_id in jobs:
+        start = time.perf_counter()
+        result = tts.synthesize(text=text, voice_id=voice_id)
+        yield dict(result, latency=time.perf_counter() - start)
+
+
+async def main(args):
+    voices = [f"cosyvoice-v2-voice{i}" for i in range(args.voices)]
+    jobs = [(text, voice_id) for voice_id in voices for text in phrases(args.phrases)]
+    cache_dir = tempfile.mkdtemp(prefix="tts-batch-bench-")
+
+    async with TtsWebsocketStub(
+        handshake_latency=0.05,
+        latency=args.task_latency,
+        per_char_latency=args.per_char_latency,
+        rate_limit=args.upstream_rate,
+        fail_rate=args.fail_rate
+    ) as stub:
+        dashscope.base_websocket_api_url = stub.url
+        dashscope.api_key = "bench"
+        # The SDK logs every failed task; the table counts them instead
+        logging.getLogger("dashscope").setLevel(logging.CRITICAL)
+        loop = asyncio.get_running_loop()
+
+        tts = TextToSpeech(api_key="bench", pool_size=args.concurrency)
+        cached_tts = TextToSpeech(api_key="bench", cache=AudioCache(cache_dir=cache_dir), pool_size=args.concurrency)
+        storage = FakeStorage(latency=0.02)
+        batch = dict(max_concurrency=args.concurrency, retry_base_delay=0.2)
+
+        # The SDK blocks; keep the stub's event loop free by running each mode on a thread
+        rows, histograms = [], []
+        for name, func in (
+            ("serial synthesize", lambda: serial(tts, jobs)),
+            (f"batch, {args.concurrency} threads", lambda: tts.synthesize_batch(jobs, **batch)),
+            (f"batch, {args.rate:g}/s, cache + OSS", lambda: cached_tts.synthesize_batch(
+                jobs, rate_limit=args.rate, storage=storage, object_prefix="prerender", **batch)),
+            ("same batch again", lambda: cached_tts.synthesize_batch(
+                jobs, rate_limit=args.rate, storage=storage, object_prefix="prerender", **batch)),
+        ):
+            row, latencies = await loop.run_in_executor(None, run, stub, name, jobs, func)
+            rows.append(row)
+            histograms.append((name, latencies))
+        tts.close()
+        cached_tts.close()
+
+    print(f"{len(jobs)} jobs ({args.phrases} phrases x {args.voices} voices); upstream: "
+          f"{args.upstream_rate:g} tasks/s, {args.fail_rate:.0%} transient failures")
+    print_table(rows, ("mode", "jobs/sec", "wall time", "failed", "upstream tasks", "throttled",
+                       "internal errors", "retries", "from cache"))
+    for name, latencies in histograms:
+        print(f"\nper-job latency, {name}")
+        print("\n".join(histogram(latencies)))
+    print(f"\nOSS requests: {dict(storage.bucket.requests)}; cache: {cached_tts.cache.stats()['disk_entries']} entries on disk")
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--phrases', type=int, default=200)
+    parser.add_argument('--voices', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=45)
+    parser.add_argument('--upstream-rate', type=float, default=50)
+    parser.add_argument('--fail-rate', type=float, default=0.02)
+    parser.add_argument('--task-latency', type=float, default=0.05)
+    parser.add_argument('--per-char-latency', type=float, default=0.005)
+    asyncio.run(main(parser.parse_args()))
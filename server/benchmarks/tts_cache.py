@@ -0,0 +1,99 @@
+"""
+TextToSpeech latency and DashScope calls with and without the audio cache
+
+Replays a skewed workload of canned phrases (greetings, apologies, short
+acknowledgements) over a few voices, then checks that a fresh process
+warms up from the disk tier and that updating a voice through
+VoiceManager drops its cached audio.
+
+Usage: python -m benchmarks.tts_cache [--requests 400]
+"""
+import argparse
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from unittest import mock
+
+from voice.audio_cache import AudioCache
+from voice.speech_synthesis import TextToSpeech
+from voice.voice_enrollment import VoiceManager
+
+from .fakes import FakeEnrollmentService, FakeSpeechSynthesizer, print_table
+
+PHRASES = [
+    "你好，很高兴见到你。",
+    "没关系，我们慢慢来。",
+    "嗯，我在听。",
+    "抱歉，我刚才没有听清楚，可以再说一遍吗？",
+    "谢谢你愿意和我分享这些。",
+    "听起来你真的很累了。",
+    "这种感受很正常，你并不孤单。",
+    "要不要先深呼吸一下？",
+]
+
+
+def workload(count, voices, seed=7):
+    rng = random.Random(seed)
+    # Zipf-like popularity: the first phrases are by far the most common
+    weights = [1 / (rank + 1) for rank in range(len(PHRASES))]
+    return [(rng.choices(PHRASES, weights)[0], rng.choice(voices)) for _ in range(count)]
+
+
+def replay(tts, jobs):
+    FakeSpeechSynthesizer.calls = 0
+    latencies = []
+    for text, voice_id in jobs:
+        start = time.perf_counter()
+        assert tts.synthesize(text=text, voice_id=voice_id)["success"]
+        latencies.append(time.perf_counter() - start)
+    return statistics.mean(latencies), FakeSpeechSynthesizer.calls
+
+
+def main(args):
+    FakeSpeechSynthesizer.latency = args.tts_latency
+    voices = [f"cosyvoice-v2-voice{i}" for i in range(args.voices)]
+    jobs = workload(args.requests, voices)
+    cache_dir = tempfile.mkdtemp(prefix="tts-cache-bench-")
+
+    with mock.patch("dashscope.audio.tts_v2.SpeechSynthesizer", FakeSpeechSynthesizer), \
+            mock.patch("dashscope.audio.tts_v2.VoiceEnrollmentService", FakeEnrollmentService):
+        rows = []
+
+        mean, calls = replay(TextToSpeech(api_key="bench"), jobs)
+        rows.append(("no cache", f"{mean * 1000:.1f} ms", calls))
+
+        cache = AudioCache(cache_dir=cache_dir)
+        mean, calls = replay(TextToSpeech(api_key="bench", cache=cache), jobs)
+        rows.append(("cold cache", f"{mean * 1000:.1f} ms", calls))
+
+        # A new process starts with an empty memory tier but a warm disk tier
+        restarted = AudioCache(cache_dir=cache_dir)
+        mean, calls = replay(TextToSpeech(api_key="bench", cache=restarted), jobs)
+        rows.append(("after restart (disk)", f"{mean * 1000:.1f} ms", calls))
+
+        print_table(rows, ("mode", "mean latency", "DashScope calls"))
+        print()
+        print("cache counters after restart:", restarted.stats())
+
+        # Updating a voice must drop its cached audio
+        manager = VoiceManager(api_key="bench", voice_db_path=f"{cache_dir}/voice_db.json")
+        tts = TextToSpeech(api_key="bench", cache=restarted)
+        manager.add_voice_listener(tts.invalidate_voice)
+        voice_id = manager.create_voice("cosyvoice-v2", "bench", "", "https://oss.local/sample.wav")["voice_id"]
+        tts.synthesize(text=PHRASES[0], voice_id=voice_id)
+        manager.update_voice(voice_id, "https://oss.local/sample-v2.wav")
+        FakeSpeechSynthesizer.calls = 0
+        assert not tts.synthesize(text=PHRASES[0], voice_id=voice_id)["cached"]
+        print("voice update invalidated cached audio:", FakeSpeechSynthesizer.calls == 1)
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--voices', type=int, default=3)
+    parser.add_argument('--tts-latency', type=float, default=0.02)
+    main(parser.parse_args())
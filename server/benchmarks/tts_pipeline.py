@@ -0,0 +1,75 @@
+"""
+Time-to-first-audio of the sequential and the sentence-pipelined reply paths
+
+Usage: python -m benchmarks.tts_pipeline [--llm-latency 0.5] [--runs 3]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from .fakes import FakeStorage, FakeTextToSpeech, LinkAIStub, build_dialogue, print_table
+
+REPLY = (
+    "听起来你今天过得很辛苦，我能理解这种感受。"
+    "有时候压力会一点点累积，直到某一刻让人喘不过气来。"
+    "你愿意和我说说，具体是什么事情让你感到难过吗？"
+    "无论是什么，你的感受都是真实而且重要的。"
+    "我们可以一起慢慢梳理，不用着急。"
+    "如果现在只想安静一会儿，也完全没关系；我会一直在这里陪着你。"
+)
+
+
+async def run_sequential(dialogue, session_id):
+    start = time.perf_counter()
+    result = await dialogue.process_text_message("我今天很难过", session_id, "bench-voice")
+    assert result["success"], result
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+async def run_pipelined(dialogue, session_id):
+    start = time.perf_counter()
+    first_audio = None
+    async for event in dialogue.stream_text_message("我今天很难过", session_id, "bench-voice"):
+        if event["type"] == "audio" and first_audio is None:
+            assert event["success"], event
+            first_audio = time.perf_counter() - start
+    return first_audio, time.perf_counter() - start
+
+
+async def main(args):
+    async with LinkAIStub(REPLY, latency=args.llm_latency) as stub:
+        async with build_dialogue(
+            stub.url,
+            tts=FakeTextToSpeech(base_latency=args.tts_latency, per_char_latency=args.tts_per_char),
+            storage=FakeStorage(latency=args.upload_latency),
+            tts_pipeline_depth=args.depth
+        ) as dialogue:
+            rows = []
+            for name, runner in (("sequential", run_sequential), ("pipelined", run_pipelined)):
+                first, total = [], []
+                for run in range(args.runs):
+                    ttfa, elapsed = await runner(dialogue, f"{name}-{run}")
+                    first.append(ttfa)
+                    total.append(elapsed)
+                rows.append((
+                    name,
+                    f"{statistics.median(first) * 1000:.0f} ms",
+                    f"{statistics.median(total) * 1000:.0f} ms"
+                ))
+
+    print(f"reply: {len(REPLY)} chars; llm={args.llm_latency}s "
+          f"tts={args.tts_latency}s+{args.tts_per_char}s/char upload={args.upload_latency}s")
+    print_table(rows, ("mode", "time to first audio", "total"))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--llm-latency', type=float, default=0.5)
+    parser.add_argument('--tts-latency', type=float, default=0.15)
+    parser.add_argument('--tts-per-char', type=float, default=0.01)
+    parser.add_argument('--upload-latency', type=float, default=0.05)
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--runs', type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
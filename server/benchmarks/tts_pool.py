@@ -0,0 +1,110 @@
+"""
+TextToSpeech utterances/sec with a new SpeechSynthesizer per call versus the pool
+
+Runs the real DashScope tts_v2 SpeechSynthesizer against a local websocket
+stub of the DashScope protocol. Per call, every utterance opens its own
+websocket (stub handshake plus the SDK's connection polling) and closes
+it when the task ends; pooled, ``--concurrency`` warm connections per
+voice serve all utterances. Prints throughput, latency percentiles, the
+number of websocket connections opened and the pool counters. Finally the
+stub drops every connection between two pooled batches, and the health
+check on checkout has to replace the dead synthesizers without failures.
+
+Usage: python -m benchmarks.tts_pool [--utterances 400] [--concurrency 8]
+"""
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import dashscope
+
+from voice.speech_synthesis import TextToSpeech
+
+from .fakes import TtsWebsocketStub, print_table
+
+SENTENCES = [
+    "你好，很高兴见到你。",
+    "听起来你最近压力很大。",
+    "我们可以一起想想办法。",
+    "先深呼吸一下，慢慢来。",
+]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+async def run(args, stub, tts):
+    voices = [f"cosyvoice-v2-voice{i}" for i in range(args.voices)]
+
+    def utterance(i):
+        start = time.perf_counter()
+        text = SENTENCES[i % len(SENTENCES)]
+        result = tts.synthesize(text=text, voice_id=voices[i % len(voices)])
+        ok = result["success"] and len(result["audio"]) == stub.bytes_per_char * len(text)
+        return ok, time.perf_counter() - start
+
+    loop = asyncio.get_running_loop()
+    connections = stub.connections
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(*(
+            loop.run_in_executor(executor, utterance, i) for i in range(args.utterances)
+        ))
+        elapsed = time.perf_counter() - start
+    return outcomes, elapsed, stub.connections - connections
+
+
+async def main(args):
+    async with TtsWebsocketStub(
+        handshake_latency=args.handshake_latency,
+        latency=args.task_latency,
+        per_char_latency=args.per_char_latency
+    ) as stub:
+        # The SDK reads its endpoint and key from module globals
+        dashscope.base_websocket_api_url = stub.url
+        dashscope.api_key = "bench"
+
+        rows = []
+        per_call = TextToSpeech(api_key="bench", pool_size=0)
+        pooled = TextToSpeech(api_key="bench", pool_size=args.concurrency)
+        for name, tts, drop in (
+            ("new synthesizer per call", per_call, False),
+            ("pooled synthesizers", pooled, False),
+            ("pooled, after server dropped all", pooled, True),
+        ):
+            if drop:
+                await stub.drop_connections()
+                await asyncio.sleep(0.2)
+            outcomes, elapsed, connections = await run(args, stub, tts)
+            latencies = [latency for ok, latency in outcomes if ok]
+            rows.append((
+                name,
+                f"{len(latencies) / elapsed:.0f}",
+                f"{percentile(latencies, 0.5) * 1000:.0f} ms",
+                f"{percentile(latencies, 0.99) * 1000:.0f} ms",
+                connections,
+                len(outcomes) - len(latencies)
+            ))
+        pool_stats = pooled.pool.stats()
+        pooled.close()
+
+    print(f"{args.utterances} utterances over {args.voices} voices, {args.concurrency} threads; "
+          f"stub handshake {args.handshake_latency * 1000:.0f} ms, task {args.task_latency * 1000:.0f} ms "
+          f"+ {args.per_char_latency * 1000:.1f} ms/char")
+    print_table(rows, ("mode", "utterances/sec", "p50", "p99", "connections opened", "failed"))
+    print()
+    print("pool counters:", pool_stats)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--utterances', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--voices', type=int, default=2)
+    parser.add_argument('--handshake-latency', type=float, default=0.05)
+    parser.add_argument('--task-latency', type=float, default=0.02)
+    parser.add_argument('--per-char-latency', type=float, default=0.0005)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,64 @@
+"""
+OSS requests and bytes for timestamp-named versus content-addressed uploads
+
+Replays chat sessions where replies often repeat (canned greetings and
+acknowledgements served from the TTS cache produce identical audio) and
+several replies land in the same second.
+
+Usage: python -m benchmarks.upload_dedup [--sessions 20] [--turns 30]
+"""
+import argparse
+import random
+import time
+
+from .fakes import FakeStorage, print_table
+
+REPLIES = [b"greeting", b"ack", b"ack", b"apology", b"comfort", b"ack", b"question"]
+
+
+def audio_for(reply: bytes) -> bytes:
+    return reply.ljust(48 * 1024, b"\x00")
+
+
+def replay(storage, sessions, turns, dedup, seed=11):
+    rng = random.Random(seed)
+    urls = 0
+    for session in range(sessions):
+        for _ in range(turns):
+            audio = audio_for(rng.choice(REPLIES))
+            if dedup:
+                result = storage.upload_bytes_dedup(audio, prefix=f"responses/s{session}", extension="mp3")
+            else:
+                # Previous naming: one object per second per session
+                result = storage.upload_bytes(audio, f"responses/s{session}/{int(time.time())}.mp3")
+            assert result["success"]
+            urls += 1
+    return urls
+
+
+def main(args):
+    rows = []
+    for name, dedup in (("timestamp names", False), ("content-addressed", True)):
+        storage = FakeStorage(latency=0)
+        replies = replay(storage, args.sessions, args.turns, dedup)
+        bucket = storage.bucket
+        rows.append((
+            name,
+            replies,
+            bucket.requests["PutObject"],
+            bucket.requests["HeadObject"],
+            f"{bucket.bytes_uploaded / 1024 / 1024:.1f} MB",
+            len(bucket.objects)
+        ))
+
+    print(f"{args.sessions} sessions x {args.turns} replies")
+    print_table(rows, ("naming", "replies", "PUT", "HEAD", "uploaded", "objects kept"))
+    print("(with timestamp names, replies in the same second overwrite each other,"
+          " which is why fewer objects are kept than replies sent)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--turns', type=int, default=30)
+    main(parser.parse_args())
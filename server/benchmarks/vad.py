@@ -0,0 +1,104 @@
+"""
+Effect of silence trimming on recognition latency and upload size
+
+Voice turns and cloning samples are generated as WAV files with speech
+padded by seconds of near-silent room noise. ASR runs on the stub backend
+with a cost per second of audio, and uploads go to the in-memory bucket.
+Compares trimming off and on, and shows that a silent clip is rejected
+before any recognition or upload when reject_silence is set.
+
+Usage: python -m benchmarks.vad [--turns 20] [--leading 2] [--trailing 3]
+"""
+import io
+import time
+import wave
+import asyncio
+import argparse
+import statistics
+
+import numpy as np
+
+from voice.speech_recognition import SpeechRecognizer
+
+from .fakes import FakeStorage, FakeVoiceManager, LinkAIStub, build_dialogue, print_table
+
+
+def make_utterance(leading, speech, trailing, sample_rate=16000, seed=0):
+    """Speech-level noise bursts between stretches of -60 dBFS room noise"""
+    rng = np.random.default_rng(seed)
+    parts = [
+        rng.normal(0, 0.001, int(leading * sample_rate)),
+        rng.normal(0, 0.2, int(speech * sample_rate)) * np.abs(np.sin(np.linspace(0, 6 * np.pi, int(speech * sample_rate)))),
+        rng.normal(0, 0.001, int(trailing * sample_rate)),
+    ]
+    pcm = (np.clip(np.concatenate(parts), -1, 1) * 32767).astype(np.int16)
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+async def run(stub_url, audio, args, **options):
+    recognizer = SpeechRecognizer(
+        backend="stub",
+        backend_options={"text": "我今天心情不太好", "per_second_latency": args.asr_per_second}
+    )
+    storage = FakeStorage(latency=args.upload_latency)
+    async with build_dialogue(stub_url, recognizer=recognizer, storage=storage,
+                              voice_manager=FakeVoiceManager(), **options) as dialogue:
+        results = await asyncio.gather(*(
+            dialogue.process_voice_message(audio, f"session-{i}", "bench-voice") for i in range(args.turns)
+        ))
+        clone = await dialogue.clone_voice_from_audio(audio, "bench", "")
+
+    uploaded = storage.bucket.objects[next(k for k in storage.bucket.objects if k.startswith("voice_samples/"))]
+    stage = lambda name: statistics.mean(r["stage_ms"].get(name, 0.0) for r in results)
+    return stage("vad"), stage("asr"), results[0]["bytes_saved"], len(uploaded), clone["stage_ms"].get("upload", 0.0)
+
+
+async def rejected(stub_url, args):
+    recognizer = SpeechRecognizer(backend="stub", backend_options={"text": "嗯"})
+    storage = FakeStorage(latency=args.upload_latency)
+    silence = make_utterance(args.leading + args.trailing, 0, 0)
+    async with build_dialogue(stub_url, recognizer=recognizer, storage=storage,
+                              voice_manager=FakeVoiceManager(), reject_silence=True) as dialogue:
+        start = time.perf_counter()
+        turn = await dialogue.process_voice_message(silence, "silent", "bench-voice")
+        clone = await dialogue.clone_voice_from_audio(silence, "silent", "")
+        elapsed = time.perf_counter() - start
+    return turn["error"], clone["error"], recognizer.backend_stats(), storage.bucket.requests["PutObject"], elapsed
+
+
+async def main(args):
+    audio = make_utterance(args.leading, args.speech, args.trailing)
+
+    async with LinkAIStub("我明白你的感受。", latency=0.05) as stub:
+        rows = []
+        for name, trim in (("no trimming", False), ("trim silence", True)):
+            vad_ms, asr_ms, saved, uploaded, upload_ms = await run(stub.url, audio, args, trim_silence=trim)
+            rows.append((name, f"{vad_ms:.2f} ms", f"{asr_ms:.0f} ms", f"{saved / 1024:.0f} KiB",
+                         f"{uploaded / 1024:.0f} KiB", f"{upload_ms:.0f} ms"))
+
+        print(f"{args.turns} turns of {args.leading}s silence + {args.speech}s speech + {args.trailing}s silence "
+              f"({len(audio) / 1024:.0f} KiB WAV)")
+        print_table(rows, ("mode", "vad/turn", "asr/turn", "saved/turn", "sample uploaded", "sample upload"))
+
+        turn_error, clone_error, asr_stats, oss_requests, elapsed = await rejected(stub.url, args)
+        print(f"\nsilent clip with reject_silence: turn '{turn_error}', clone '{clone_error}', "
+              f"{sum(s['requests'] for s in asr_stats.values())} ASR calls, {oss_requests} OSS uploads, "
+              f"{elapsed * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--turns', type=int, default=20)
+    parser.add_argument('--leading', type=float, default=2.0)
+    parser.add_argument('--speech', type=float, default=2.5)
+    parser.add_argument('--trailing', type=float, default=3.0)
+    parser.add_argument('--asr-per-second', type=float, default=0.05)
+    parser.add_argument('--upload-latency', type=float, default=0.02)
+    asyncio.run(main(parser.parse_args()))
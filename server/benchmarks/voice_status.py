@@ -0,0 +1,97 @@
+"""
+DashScope calls while UIs poll voices that are still being cloned
+
+Each of N freshly cloned voices has a client calling get_voice every
+``--poll`` seconds until it sees the voice ready. Compares the previous
+behaviour (a query_voice round trip on every get_voice) with the
+background poller plus a staleness bound, and measures how long an
+awaitable VoiceDialogue.wait_for_voice takes to notice readiness.
+
+Usage: python -m benchmarks.voice_status [--voices 20] [--ready-after 3]
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from unittest import mock
+
+from voice.voice_enrollment import VoiceManager
+from voice.voice_store import MemoryVoiceStore
+
+from .fakes import FakeEnrollmentService, build_dialogue, print_table
+
+
+def client(manager, voice_id, poll, ready_at, lags):
+    while True:
+        voice = manager.get_voice(voice_id)
+        if voice["status"] == "OK":
+            lags.append(time.monotonic() - ready_at)
+            return
+        time.sleep(poll)
+
+
+def run(args, **manager_options):
+    manager = VoiceManager(api_key="bench", store=MemoryVoiceStore(), **manager_options)
+    manager.status_poller.interval = args.interval
+    manager.status_poller.max_interval = args.max_interval
+    manager.status_poller.backoff = 1.5
+
+    created = time.monotonic()
+    voice_ids = [
+        manager.create_voice("cosyvoice-v2", f"user{i}", "", f"https://oss.local/{i}.wav")["voice_id"]
+        for i in range(args.voices)
+    ]
+    lags = []
+    clients = [
+        threading.Thread(target=client, args=(manager, v, args.poll, created + args.ready_after, lags))
+        for v in voice_ids
+    ]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+
+    manager.close()
+    return manager.service.requests["query_voice"], statistics.mean(lags)
+
+
+async def wait_ready(args):
+    manager = VoiceManager(api_key="bench", store=MemoryVoiceStore())
+    manager.status_poller.interval = args.interval
+    manager.status_poller.max_interval = args.max_interval
+    manager.status_poller.backoff = 1.5
+    dialogue = build_dialogue("http://127.0.0.1:9/unused", voice_manager=manager)
+
+    voice_id = manager.create_voice("cosyvoice-v2", "waiter", "", "https://oss.local/w.wav")["voice_id"]
+    start = time.monotonic()
+    voice = await dialogue.wait_for_voice(voice_id, timeout=args.ready_after * 10)
+    await dialogue.close()
+    manager.close()
+    return voice["status"], time.monotonic() - start - args.ready_after
+
+
+def main(args):
+    FakeEnrollmentService.ready_after = args.ready_after
+    with mock.patch("dashscope.audio.tts_v2.VoiceEnrollmentService", FakeEnrollmentService):
+        rows = []
+        calls, lag = run(args, status_max_staleness=0)
+        rows.append(("query on every get_voice", calls, f"{lag * 1000:.0f} ms"))
+        calls, lag = run(args, status_max_staleness=args.max_interval * 2, poll_pending_voices=True)
+        rows.append(("background poller", calls, f"{lag * 1000:.0f} ms"))
+
+        print(f"{args.voices} voices ready after {args.ready_after}s, UI polls every {args.poll}s")
+        print_table(rows, ("mode", "query_voice calls", "mean readiness lag"))
+
+        status, lag = asyncio.run(wait_ready(args))
+        print(f"\nwait_for_voice: status {status}, noticed {lag * 1000:.0f} ms after the voice was ready")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--voices', type=int, default=20)
+    parser.add_argument('--ready-after', type=float, default=3.0)
+    parser.add_argument('--poll', type=float, default=0.25)
+    parser.add_argument('--interval', type=float, default=0.5)
+    parser.add_argument('--max-interval', type=float, default=1.0)
+    main(parser.parse_args())
@@ -0,0 +1,169 @@
+"""
+Per-operation cost of the legacy voice_db.json versus the voice stores
+
+Measures get/update/create latency at 10k and 100k voices, the one-shot
+JSON migration, and lost writes when several threads create voices at the
+same time.
+
+Usage: python -m benchmarks.voice_store [--sizes 10000 100000]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from voice.voice_store import MemoryVoiceStore, SqliteVoiceStore, migrate_json_db
+
+from .fakes import print_table
+
+
+class LegacyJsonDb:
+    """The previous VoiceManager storage: load, scan and rewrite the whole file"""
+    def __init__(self, path):
+        self.path = path
+
+    def _load(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    def _save(self, voices):
+        with open(self.path, 'w') as f:
+            json.dump(voices, f, indent=2)
+
+    def get(self, voice_id):
+        return next((v for v in self._load() if v['voice_id'] == voice_id), None)
+
+    def update(self, voice_id, changes):
+        voices = self._load()
+        for voice in voices:
+            if voice['voice_id'] == voice_id:
+                voice.update(changes)
+                break
+        self._save(voices)
+
+    def put(self, voice):
+        voices = self._load()
+        voices.append(voice)
+        self._save(voices)
+
+
+def make_voice(i):
+    return {
+        "voice_id": f"cosyvoice-v2-user{i:06d}-{i * 7919 % 100000:05d}",
+        "name": f"用户音色 {i}",
+        "description": "一段用于情感陪伴的克隆声音",
+        "target_model": "cosyvoice-v2",
+        "audio_url": f"https://oss.local/voice_samples/{i}.wav",
+        "created_at": "2026-10-01 12:00:00",
+        "status": "OK"
+    }
+
+
+def timed(func, args_list):
+    latencies = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1000
+
+
+def bench_size(size, ops, legacy_ops, workdir):
+    voices = [make_voice(i) for i in range(size)]
+    json_path = os.path.join(workdir, f"voice_db_{size}.json")
+    with open(json_path, 'w') as f:
+        json.dump(voices, f, indent=2)
+
+    rng = random.Random(size)
+    ids = [rng.choice(voices)['voice_id'] for _ in range(ops)]
+
+    stores = {"legacy json": LegacyJsonDb(json_path), "memory": MemoryVoiceStore(voices)}
+
+    sqlite_path = os.path.join(workdir, f"voice_db_{size}.sqlite3")
+    sqlite = SqliteVoiceStore(sqlite_path)
+    start = time.perf_counter()
+    migrate_json_db(json_path, sqlite)
+    migration = time.perf_counter() - start
+    stores["sqlite"] = sqlite
+
+    rows = []
+    for name, store in stores.items():
+        count = legacy_ops if name == "legacy json" else ops
+        rows.append((
+            size,
+            name,
+            f"{timed(store.get, [(i,) for i in ids[:count]]):.3f} ms",
+            f"{timed(store.update, [(i, {'status': 'DEPLOYING'}) for i in ids[:count]]):.3f} ms",
+            f"{timed(store.put, [(make_voice(size + n),) for n in range(count)]):.3f} ms",
+        ))
+    sqlite.close()
+    return rows, migration
+
+
+def lost_writes(store_factory, threads=8, per_thread=25):
+    """Create voices from several threads and count the ones that vanished"""
+    store = store_factory()
+    errors = []
+
+    def writer(t):
+        for n in range(per_thread):
+            try:
+                store.put(make_voice(1000000 + t * per_thread + n))
+            except Exception as e:
+                errors.append(e)
+
+    workers = [threading.Thread(target=writer, args=(t,)) for t in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    expected = {make_voice(1000000 + i)['voice_id'] for i in range(threads * per_thread)}
+    present = {v['voice_id'] for v in (store.list() if hasattr(store, 'list') else store._load())}
+    return len(expected - present), len(errors)
+
+
+def main(args):
+    workdir = tempfile.mkdtemp(prefix="voice-store-bench-")
+    try:
+        rows = []
+        migrations = []
+        for size in args.sizes:
+            size_rows, migration = bench_size(size, args.ops, args.legacy_ops, workdir)
+            rows.extend(size_rows)
+            migrations.append((size, f"{migration:.2f} s"))
+
+        print_table(rows, ("voices", "store", "get (p50)", "update (p50)", "create (p50)"))
+        print()
+        print_table(migrations, ("voices", "JSON -> SQLite migration"))
+        print()
+
+        def legacy_factory():
+            path = os.path.join(workdir, "concurrent.json")
+            with open(path, 'w') as f:
+                json.dump([make_voice(i) for i in range(1000)], f)
+            return LegacyJsonDb(path)
+
+        def sqlite_factory():
+            store = SqliteVoiceStore(os.path.join(workdir, "concurrent.sqlite3"))
+            store.put_many(make_voice(i) for i in range(1000))
+            return store
+
+        lost = [(name,) + lost_writes(factory) for name, factory in
+                (("legacy json", legacy_factory), ("sqlite", sqlite_factory))]
+        print_table(lost, ("store", "lost creates (of 200)", "errors"))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--ops', type=int, default=500)
+    parser.add_argument('--legacy-ops', type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,153 @@
+"""
+Cost and coverage of VoiceManager.list_voices against a large voice list
+
+The account holds ``--voices`` voices that were stored locally while still
+deploying and have all become ready since. Compares the previous
+list_voices (a single page of 100, a nested-loop merge and a rewrite of the
+whole JSON database) with the paginated sync engine: a cold sync with one
+and with several page workers, a repeat within the TTL, and a forced
+resync after a few voices changed.
+
+Usage: python -m benchmarks.voice_sync [--voices 5000] [--page-latency 0.05]
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+from unittest import mock
+
+from voice.voice_enrollment import VoiceManager
+from voice.voice_store import SqliteVoiceStore
+
+from .fakes import FakeEnrollmentService, print_table
+
+
+def make_voices(count):
+    return [
+        {
+            "voice_id": f"cosyvoice-v2-user{i}-{i:08d}",
+            "name": f"user{i}",
+            "description": "",
+            "target_model": "cosyvoice-v2",
+            "audio_url": f"https://oss.local/{i}.wav",
+            "created_at": "",
+            "status": "DEPLOYING"
+        }
+        for i in range(count)
+    ]
+
+
+def make_service(voices):
+    service = FakeEnrollmentService()
+    for voice in voices:
+        service.voices[voice["voice_id"]] = {
+            "voice_id": voice["voice_id"],
+            "status": "OK",
+            "gmt_create": "2024-01-01 00:00:00",
+            "target_model": voice["target_model"]
+        }
+    return service
+
+
+class CountingStore(SqliteVoiceStore):
+    """SQLite store counting the rows written by update_many"""
+    written = 0
+
+    def update_many(self, changes):
+        updated = super().update_many(changes)
+        self.written += updated
+        return updated
+
+
+def covered(voices, service):
+    """Number of local voices whose status matches the API"""
+    return sum(1 for v in voices if v["status"] == service.voices[v["voice_id"]]["status"])
+
+
+def legacy_list_voices(service, db_path):
+    """The list_voices implementation before the sync engine"""
+    with open(db_path, 'r') as f:
+        voices = json.load(f)
+
+    api_voices = service.list_voices(page_size=100)
+    for api_voice in api_voices:
+        for voice in voices:
+            if voice['voice_id'] == api_voice.get('voice_id'):
+                voice['status'] = api_voice.get('status')
+                voice['created_at'] = api_voice.get('gmt_create')
+                break
+
+    with open(db_path, 'w') as f:
+        json.dump(voices, f, ensure_ascii=False, indent=2)
+    return voices, len(voices)
+
+
+def run_legacy(args, work_dir):
+    voices = make_voices(args.voices)
+    service = make_service(voices)
+    db_path = os.path.join(work_dir, "legacy.json")
+    with open(db_path, 'w') as f:
+        json.dump(voices, f)
+
+    start = time.perf_counter()
+    voices, written = legacy_list_voices(service, db_path)
+    elapsed = time.perf_counter() - start
+    return ("legacy (1 page, full rewrite)", elapsed, service.requests["list_voices"], written,
+            covered(voices, service))
+
+
+def run_sync(args, work_dir, workers):
+    voices = make_voices(args.voices)
+    service = make_service(voices)
+    store = CountingStore(os.path.join(work_dir, f"sync-{workers}.sqlite3"))
+    store.put_many(voices)
+
+    with mock.patch("dashscope.audio.tts_v2.VoiceEnrollmentService", lambda: service):
+        manager = VoiceManager(api_key="bench", store=store, voice_list_workers=workers)
+
+    rows = []
+
+    def measure(label, **kwargs):
+        calls = service.requests["list_voices"]
+        written = store.written
+        start = time.perf_counter()
+        listed = manager.list_voices(**kwargs)
+        elapsed = time.perf_counter() - start
+        rows.append((label, elapsed, service.requests["list_voices"] - calls, store.written - written,
+                     covered(listed, service)))
+
+    measure(f"sync, cold, {workers} worker{'s' if workers > 1 else ''}")
+    if workers > 1:
+        measure("sync, repeat within TTL")
+        for voice_id in list(service.voices)[:args.changed]:
+            service.voices[voice_id]["status"] = "UNDEPLOYED"
+        measure(f"sync, forced, {args.changed} changed", max_staleness=0)
+
+    manager.close()
+    return rows
+
+
+def main(args):
+    FakeEnrollmentService.latency = args.page_latency
+    work_dir = tempfile.mkdtemp(prefix="voice-sync-bench-")
+
+    rows = [run_legacy(args, work_dir)]
+    rows += run_sync(args, work_dir, workers=1)
+    rows += run_sync(args, work_dir, workers=args.workers)
+
+    print(f"{args.voices} voices, {args.page_latency * 1000:.0f} ms per list_voices page")
+    print_table(
+        [(label, f"{elapsed * 1000:.0f} ms", calls, written, f"{ok}/{args.voices}")
+         for label, elapsed, calls, written, ok in rows],
+        ("mode", "time", "list_voices calls", "rows written", "voices up to date")
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--voices', type=int, default=5000)
+    parser.add_argument('--page-latency', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--changed', type=int, default=50)
+    main(parser.parse_args())
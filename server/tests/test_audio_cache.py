@@ -0,0 +1,84 @@
+"""
+AudioCache tiers, eviction and invalidation of a voice
+
+Run from server/: python -m pytest tests
+"""
+import os
+import threading
+
+from voice.audio_cache import AudioCache
+
+
+def files(cache_dir):
+    return sorted(name for _, _, names in os.walk(cache_dir) for name in names)
+
+
+def test_disk_hit_promotes_and_survives_restart(tmp_path):
+    cache = AudioCache(cache_dir=str(tmp_path), max_memory_bytes=0)
+    cache.put("k1", b"audio-1", "voice")
+    assert cache.get("k1") == b"audio-1"
+    assert cache.stats()["disk_hits"] == 1
+
+    restarted = AudioCache(cache_dir=str(tmp_path))
+    assert restarted.get("k1") == b"audio-1"
+    assert restarted.get("k1") == b"audio-1"
+    assert restarted.stats()["disk_hits"] == 1 and restarted.stats()["memory_hits"] == 1
+
+
+def test_disk_eviction_removes_files(tmp_path):
+    cache = AudioCache(cache_dir=str(tmp_path), max_memory_bytes=0, max_disk_bytes=10)
+    cache.put("k1", b"12345", "voice")
+    cache.put("k2", b"12345", "voice")
+    cache.get("k1")
+    cache.put("k3", b"12345", "voice")
+    assert files(tmp_path) == ["k1.bin", "k3.bin"]
+    assert cache.get("k2") is None
+    assert cache.stats()["disk_evictions"] == 1
+
+
+def test_invalidated_voice_drops_in_flight_audio(tmp_path):
+    cache = AudioCache(cache_dir=str(tmp_path))
+    cache.put("old", b"audio", "voice")
+    cache.put("other", b"audio", "other-voice")
+
+    # Synthesis starts, then the voice is updated before it finishes
+    generation = cache.generation("voice")
+    # One entry in each tier
+    assert cache.invalidate_voice("voice") == 2
+    cache.put("late", b"stale audio", "voice", generation)
+    cache.put_many([("late-batch", b"stale audio", "voice", generation)])
+
+    for key in ("old", "late", "late-batch"):
+        assert not cache.contains(key)
+    assert cache.get("other") == b"audio"
+    assert files(tmp_path) == ["other.bin"]
+
+    # Synthesis started after the update is cached as usual
+    cache.put("new", b"audio", "voice", cache.generation("voice"))
+    assert cache.get("new") == b"audio"
+
+
+def test_file_written_during_invalidation_is_removed(tmp_path):
+    cache = AudioCache(cache_dir=str(tmp_path))
+    generation = cache.generation("voice")
+    writing, invalidated = threading.Event(), threading.Event()
+    replace = os.replace
+
+    def slow_replace(src, dst):
+        # Let the invalidation run while the file is being written
+        writing.set()
+        invalidated.wait(5)
+        replace(src, dst)
+
+    thread = threading.Thread(target=lambda: cache._write_disk([("k", b"audio", "voice", generation)]))
+    os.replace = slow_replace
+    try:
+        thread.start()
+        writing.wait(5)
+        cache.invalidate_voice("voice")
+        invalidated.set()
+        thread.join()
+    finally:
+        os.replace = replace
+    assert not cache.contains("k")
+    assert files(tmp_path) == []
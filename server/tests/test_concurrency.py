@@ -0,0 +1,136 @@
+"""
+Concurrent turns on the stage thread pools, UpstreamLimiter and SessionLocks
+
+Run from server/: python -m pytest tests
+"""
+import asyncio
+
+import pytest
+
+from voice.admission import Overloaded, SessionLocks, UpstreamLimiter
+
+from benchmarks.concurrent_sessions import measure
+from benchmarks.fakes import FakeRecognizer, FakeStorage, FakeTextToSpeech, LinkAIStub, build_dialogue
+
+
+def test_concurrent_turns_finish_in_max_latency():
+    sessions, latency = 8, 0.1
+    per_turn = 4 * latency
+
+    async def run():
+        async with LinkAIStub("我明白你的感受，我们慢慢来。", latency=latency) as stub:
+            async with build_dialogue(
+                stub.url,
+                tts=FakeTextToSpeech(base_latency=latency, per_char_latency=0),
+                storage=FakeStorage(latency=latency),
+                recognizer=FakeRecognizer(latency=latency),
+                asr_workers=sessions,
+                tts_workers=sessions,
+                storage_workers=sessions
+            ) as dialogue:
+                return await measure(dialogue, sessions)
+
+    elapsed, lag = asyncio.run(run())
+    # Blocking the event loop would take about sessions * per_turn
+    assert elapsed < per_turn * 1.5
+    assert lag < 0.05
+
+
+def test_limiter_sheds_when_queue_full():
+    async def run():
+        limiter = UpstreamLimiter("llm", max_concurrency=1, max_queue=1, max_wait=1.0)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot():
+                await release.wait()
+
+        holder = asyncio.ensure_future(hold())
+        waiter = asyncio.ensure_future(hold())
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded) as shed:
+            async with limiter.slot():
+                pass
+        release.set()
+        await asyncio.gather(holder, waiter)
+        return shed.value, limiter.stats()
+
+    error, stats = asyncio.run(run())
+    assert error.reason == "queue full"
+    assert stats["rejected_queue_full"] == 1
+    assert stats["acquired"] == 2
+    assert stats["in_flight"] == 0 and stats["queued"] == 0
+
+
+def test_limiter_sheds_after_max_wait():
+    async def run():
+        limiter = UpstreamLimiter("tts", max_concurrency=1, max_queue=4, max_wait=0.05)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot():
+                await release.wait()
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded) as shed:
+            async with limiter.slot():
+                pass
+        release.set()
+        await holder
+        # The slot is free again once the holder is done
+        async with limiter.slot():
+            pass
+        return shed.value, limiter.stats()
+
+    error, stats = asyncio.run(run())
+    assert error.retry_after == 0.05
+    assert stats["rejected_timeout"] == 1
+    assert stats["acquired"] == 2
+
+
+def test_session_locks_serialize_a_session():
+    async def run():
+        locks = SessionLocks(max_pending=None)
+        order = []
+
+        async def turn(session_id, name):
+            async with locks.hold(session_id):
+                order.append(f"{name} start")
+                await asyncio.sleep(0.02)
+                order.append(f"{name} end")
+
+        await asyncio.gather(turn("a", "a1"), turn("a", "a2"), turn("b", "b1"))
+        return order, locks
+
+    order, locks = asyncio.run(run())
+    assert order.index("a1 end") < order.index("a2 start")
+    # Another session doesn't wait for session a
+    assert order.index("b1 start") < order.index("a1 end")
+    assert locks._locks == {}
+
+
+def test_session_locks_reject_beyond_max_pending():
+    async def run():
+        locks = SessionLocks(max_pending=2)
+        release = asyncio.Event()
+
+        async def turn():
+            async with locks.hold("a"):
+                await release.wait()
+
+        pending = [asyncio.ensure_future(turn()) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded):
+            async with locks.hold("a"):
+                pass
+        # Other sessions are unaffected
+        async with locks.hold("b"):
+            pass
+        release.set()
+        await asyncio.gather(*pending)
+        return locks.stats()
+
+    stats = asyncio.run(run())
+    assert stats["rejected"] == 1
+    assert stats["contended"] == 1
@@ -0,0 +1,67 @@
+"""
+Trace IDs and turn spans of streaming turns
+
+Run from server/: python -m pytest tests
+"""
+import asyncio
+
+from voice.metrics import InMemoryExporter, Metrics, current_trace_id
+
+from benchmarks.fakes import FakeStorage, FakeTextToSpeech, LinkAIStub, build_dialogue
+
+REPLY = "听起来你最近真的很辛苦。先深呼吸一下，我们可以慢慢聊。"
+
+
+def turn_spans(memory, trace_id):
+    return [
+        record for record in memory.records("voice_stage_calls_total", trace_id=trace_id)
+        if record.labels["stage"] == "turn"
+    ]
+
+
+def test_abandoned_stream_does_not_leak_its_trace():
+    memory = InMemoryExporter()
+
+    async def run():
+        async with LinkAIStub(REPLY, latency=0.01) as stub:
+            tts = FakeTextToSpeech(base_latency=0.0, per_char_latency=0.0)
+            async with build_dialogue(stub.url, tts=tts, storage=FakeStorage(latency=0.0),
+                                      metrics=Metrics([memory])) as dialogue:
+                # Left without closing the generator, as a consumer that breaks out would
+                events = dialogue.stream_text_message("我最近压力很大", "abandoned", "voice")
+                async for _ in events:
+                    break
+                leaked = current_trace_id()
+
+                first = await dialogue.process_text_message("我最近压力很大", "session", "voice")
+                second = await dialogue.process_text_message("我最近压力很大", "session", "voice")
+                await events.aclose()
+        return leaked, first, second
+
+    leaked, first, second = asyncio.run(run())
+    assert leaked is None
+    assert first["success"] and second["success"]
+    assert first["trace_id"] != second["trace_id"]
+    for result in (first, second):
+        spans = turn_spans(memory, result["trace_id"])
+        assert [span.labels["operation"] for span in spans] == ["text"]
+
+
+def test_stream_turn_span_and_trace():
+    memory = InMemoryExporter()
+
+    async def run():
+        async with LinkAIStub(REPLY, latency=0.01) as stub:
+            tts = FakeTextToSpeech(base_latency=0.0, per_char_latency=0.0)
+            async with build_dialogue(stub.url, tts=tts, storage=FakeStorage(latency=0.0),
+                                      metrics=Metrics([memory])) as dialogue:
+                return [event async for event in dialogue.stream_text_message("你好", "session", "voice")]
+
+    events = asyncio.run(run())
+    trace_id = events[-1]["trace_id"]
+    assert events[-1]["type"] == "done"
+    spans = turn_spans(memory, trace_id)
+    assert [(span.labels["operation"], span.labels["outcome"]) for span in spans] == [("text_stream", "success")]
+    # The stages of the turn carry its trace ID
+    stages = {record.labels["stage"] for record in memory.records("voice_stage_calls_total", trace_id=trace_id)}
+    assert {"llm", "tts"} <= stages
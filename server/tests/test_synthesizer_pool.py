@@ -0,0 +1,64 @@
+"""
+SynthesizerPool reuse and its fallback when the private SDK hooks fail
+
+Run from server/: python -m pytest tests
+"""
+from unittest import mock
+
+import pytest
+from dashscope.audio import tts_v2
+
+from voice.synthesizer_pool import SynthesizerPool
+
+from benchmarks.fakes import FakeSpeechSynthesizer
+
+SETTINGS = dict(model="cosyvoice-v2", voice_id="voice", output_format="mp3", sample_rate=22050)
+
+
+class HooklessSynthesizer(FakeSpeechSynthesizer):
+    """A synthesizer of an SDK release whose private reset changed"""
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.instances.append(self)
+
+    def _SpeechSynthesizer__reset(self):
+        raise AttributeError("no reset")
+
+
+@pytest.fixture(autouse=True)
+def fake_sdk():
+    with mock.patch.object(tts_v2, "SpeechSynthesizer", FakeSpeechSynthesizer):
+        yield
+
+
+def test_synthesizer_is_reused():
+    pool = SynthesizerPool()
+    with pool.synthesizer(**SETTINGS) as first:
+        pass
+    with pool.synthesizer(**SETTINGS) as second:
+        pass
+    assert second is first
+    assert pool.stats()["created"] == 1 and pool.stats()["reused"] == 1
+
+
+def test_failed_call_closes_synthesizer():
+    pool = SynthesizerPool()
+    with pytest.raises(RuntimeError):
+        with pool.synthesizer(**SETTINGS) as synthesizer:
+            raise RuntimeError("task failed")
+    assert not synthesizer.connected
+    assert pool.stats() == dict(pool.stats(), idle=0, in_use=0, discarded_failed=1)
+
+
+def test_broken_hooks_fall_back_to_a_fresh_synthesizer():
+    pool = SynthesizerPool()
+    with mock.patch.object(tts_v2, "SpeechSynthesizer", HooklessSynthesizer):
+        with pool.synthesizer(**SETTINGS) as synthesizer:
+            pass
+    broken = HooklessSynthesizer.instances[0]
+    assert synthesizer is not broken
+    assert not broken.connected
+    stats = pool.stats()
+    assert stats["not_reusable"] == 1 and stats["in_use"] == 0
@@ -0,0 +1,75 @@
+"""
+SentenceSplitter on streamed text and the streamed Link AI turn against an SSE stub
+
+Run from server/: python -m pytest tests
+"""
+import asyncio
+
+from voice.tts_pipeline import SentenceSplitter, split_sentences
+
+from benchmarks.fakes import FakeStorage, FakeTextToSpeech, LinkAIStub, build_dialogue
+
+
+def feed_all(chunks, min_chars=4):
+    splitter = SentenceSplitter(min_chars=min_chars)
+    sentences = []
+    for chunk in chunks:
+        sentences.extend(splitter.feed(chunk))
+    return sentences + splitter.flush()
+
+
+def test_sentence_split_across_chunks():
+    chunks = ["你好", "，今天", "天气不错", "。我们", "出去走走吧！", "好吗？"]
+    assert feed_all(chunks) == ["你好，今天天气不错。", "我们出去走走吧！", "好吗？"]
+
+
+def test_sentence_waits_for_closing_quote():
+    # The terminator arrives before the quote that closes the sentence
+    assert feed_all(["他说：“真的吗？", "”然后", "走了。"]) == ["他说：“真的吗？”", "然后走了。"]
+
+
+def test_decimal_point_split_across_chunks():
+    assert feed_all(["价格是3", ".5元。", "好的"]) == ["价格是3.5元。", "好的"]
+
+
+def test_short_sentences_merged():
+    assert feed_all(["嗯。", "我明白你的感受。", "谢谢"]) == ["嗯。我明白你的感受。", "谢谢"]
+
+
+def test_chunk_boundaries_do_not_change_sentences():
+    text = "我最近压力很大……晚上睡不着！你能陪我聊聊吗？当然可以。"
+    expected = split_sentences(text)
+    for size in (1, 2, 3, 5, len(text)):
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        assert feed_all(chunks) == expected, size
+
+
+def test_stream_turn_against_sse_stub():
+    reply = "听起来你最近真的很辛苦。先深呼吸一下，我们可以慢慢聊。你愿意说说发生了什么吗？"
+
+    async def run():
+        async with LinkAIStub(reply, latency=0.01, chars_per_second=2000, chunk_chars=3) as stub:
+            tts = FakeTextToSpeech(base_latency=0.0, per_char_latency=0.0)
+            async with build_dialogue(stub.url, tts=tts, storage=FakeStorage(latency=0.0)) as dialogue:
+                events = [event async for event in dialogue.stream_text_message(
+                    "我最近压力很大", "session", "voice", stream_llm=True
+                )]
+                history = dialogue._get_session_messages("session")
+        return events, history
+
+    events, history = asyncio.run(run())
+    deltas = [event["delta"] for event in events if event["type"] == "text"]
+    segments = [event for event in events if event["type"] == "audio"]
+
+    # Every SSE chunk reaches the caller as it arrives
+    assert len(deltas) > 1
+    assert "".join(deltas) == reply
+    assert [segment["text"] for segment in segments] == split_sentences(reply)
+    assert all(segment["success"] for segment in segments)
+    assert events[-1]["type"] == "done"
+    assert events[-1]["response_text"] == reply
+    # The reply is saved once, after the stream completed
+    assert history[-2:] == [
+        {"role": "user", "content": "我最近压力很大"},
+        {"role": "assistant", "content": reply}
+    ]
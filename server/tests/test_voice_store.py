@@ -0,0 +1,58 @@
+"""
+One-time migration of the legacy JSON voice database
+
+Run from server/: python -m pytest tests
+"""
+import json
+import threading
+
+from voice.voice_store import SqliteVoiceStore, migrate_json_db
+
+VOICES = [{"voice_id": "a", "status": "OK"}, {"voice_id": "b", "status": "OK"}]
+
+
+def write_json(tmp_path, voices):
+    path = tmp_path / "voice_db.json"
+    path.write_text(json.dumps(voices))
+    return str(path)
+
+
+def test_migration_runs_once_and_leaves_the_file(tmp_path):
+    json_path = write_json(tmp_path, VOICES)
+    store = SqliteVoiceStore(str(tmp_path / "voice_db.sqlite3"))
+    assert migrate_json_db(json_path, store) == 2
+
+    store.delete("a")
+    store.update("b", {"status": "UNDEPLOYED"})
+    # A later start, e.g. after the file was checked out again
+    assert migrate_json_db(json_path, store) == 0
+    assert store.list() == [{"voice_id": "b", "status": "UNDEPLOYED"}]
+    assert json.loads(open(json_path).read()) == VOICES
+    store.close()
+
+
+def test_concurrent_workers_import_once(tmp_path):
+    json_path = write_json(tmp_path, VOICES)
+    db_path = str(tmp_path / "voice_db.sqlite3")
+    results = []
+
+    def worker():
+        store = SqliteVoiceStore(db_path)
+        results.append(migrate_json_db(json_path, store))
+        store.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [0] * 7 + [2]
+
+
+def test_populated_store_counts_as_migrated(tmp_path):
+    # A database migrated by an earlier version, which renamed the file instead
+    store = SqliteVoiceStore(str(tmp_path / "voice_db.sqlite3"))
+    store.put({"voice_id": "b", "status": "DEPLOYING"})
+    assert migrate_json_db(write_json(tmp_path, VOICES), store) == 0
+    assert store.list() == [{"voice_id": "b", "status": "DEPLOYING"}]
+    store.close()
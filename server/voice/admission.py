@@ -0,0 +1,278 @@
+import time
+import asyncio
+import threading
+import contextlib
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request is shed instead of queued
+
+    Callers should answer with HTTP 503 and a Retry-After header.
+    """
+    def __init__(self, resource: str, reason: str, retry_after: float):
+        super().__init__(f"{resource} overloaded: {reason}")
+        self.resource = resource
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def overloaded_result(error: Overloaded) -> Dict[str, Any]:
+    """
+    Result dictionary of a request that was shed
+
+    Args:
+        error: The Overloaded exception
+
+    Returns:
+        Failure dictionary with a 503 status and a retry hint in seconds
+    """
+    return {
+        "success": False,
+        "error": str(error),
+        "status": 503,
+        "retry_after": error.retry_after
+    }
+
+
+class UpstreamLimiter:
+    """
+    Bounds the concurrent calls to one upstream service
+
+    Up to max_concurrency calls run at once. Further callers wait in line,
+    but only max_queue of them and for at most max_wait seconds; anyone
+    beyond that is rejected with Overloaded right away, so a traffic spike
+    turns into fast 503s instead of a pile-up of upstream 429s.
+    """
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: Optional[int],
+        max_queue: int = 64,
+        max_wait: float = 5.0,
+        window: int = 1024
+    ):
+        """
+        Initialize the limiter
+
+        Args:
+            name: Upstream name used in errors and metrics
+            max_concurrency: Calls allowed at once, None for no limit
+            max_queue: Callers allowed to wait for a free slot
+            max_wait: Seconds a caller may wait before being rejected
+            window: Number of recent waits kept for percentiles
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop = None
+        self._in_flight = 0
+        self._queued = 0
+        self._waits: Deque[float] = deque(maxlen=window)
+        self._stats = {
+            "acquired": 0,
+            "rejected_queue_full": 0,
+            "rejected_timeout": 0,
+            "peak_in_flight": 0,
+            "peak_queued": 0
+        }
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # A semaphore belongs to one event loop; start over on a new one
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Hold one slot of the upstream for the duration of the block
+
+        Raises:
+            Overloaded: If the queue is full or the wait timed out
+        """
+        if self.max_concurrency is None:
+            yield
+            return
+
+        semaphore = self._get_semaphore()
+        if semaphore.locked():
+            if self._queued >= self.max_queue:
+                self._stats["rejected_queue_full"] += 1
+                raise Overloaded(self.name, "queue full", self.max_wait)
+
+            self._queued += 1
+            self._stats["peak_queued"] = max(self._stats["peak_queued"], self._queued)
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(semaphore.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                self._stats["rejected_timeout"] += 1
+                raise Overloaded(self.name, f"no slot within {self.max_wait:g}s", self.max_wait) from None
+            finally:
+                self._queued -= 1
+            self._waits.append(time.perf_counter() - start)
+        else:
+            await semaphore.acquire()
+            self._waits.append(0.0)
+
+        self._in_flight += 1
+        self._stats["acquired"] += 1
+        self._stats["peak_in_flight"] = max(self._stats["peak_in_flight"], self._in_flight)
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            semaphore.release()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get limiter metrics
+
+        Returns:
+            Dictionary with current in-flight calls and queue depth, their
+            peaks, acquired/rejected counts and wait times in milliseconds
+        """
+        waits = sorted(self._waits)
+
+        def percentile(q: float) -> float:
+            return waits[min(len(waits) - 1, int(q * len(waits)))] * 1000 if waits else 0.0
+
+        return dict(
+            self._stats,
+            in_flight=self._in_flight,
+            queued=self._queued,
+            wait_ms_p50=percentile(0.5),
+            wait_ms_p95=percentile(0.95),
+            wait_ms_max=waits[-1] * 1000 if waits else 0.0
+        )
+
+
+class RateLimiter:
+    """
+    Spaces out calls to a rate-limited upstream, shared by threads
+
+    A token bucket of ``burst`` calls refilled at ``rate`` calls per
+    second. When the upstream throttles anyway, pause() holds every caller
+    back for a while instead of letting each one retry into the limit.
+    """
+    def __init__(self, rate: Optional[float], burst: int = 1):
+        """
+        Initialize the limiter
+
+        Args:
+            rate: Calls per second, None for no limit
+            burst: Calls allowed back to back after an idle period
+        """
+        self.rate = rate
+        self.burst = burst
+        self._next = 0.0
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Block until the next call may start
+
+        Returns:
+            Seconds waited
+        """
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._paused_until)
+            if self.rate is not None:
+                # The bucket is full when _next lies burst intervals or more in the past
+                interval = 1.0 / self.rate
+                start = max(start, self._next - (self.burst - 1) * interval)
+                self._next = max(self._next, start) + interval
+        wait = start - now
+        if wait > 0:
+            time.sleep(wait)
+        return max(wait, 0.0)
+
+    def pause(self, seconds: float):
+        """
+        Hold back every call for a while
+
+        Args:
+            seconds: Seconds from now before the next call may start
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class _SessionLock:
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class SessionLocks:
+    """
+    One asyncio lock per session, so turns of a session run one at a time
+
+    Locks exist only while a session has requests in flight. A session
+    with max_pending requests already running or waiting rejects further
+    ones with Overloaded. The locks are per process; across worker
+    processes the session store's atomic updates still apply.
+    """
+    def __init__(self, max_pending: Optional[int] = 4):
+        """
+        Initialize the locks
+
+        Args:
+            max_pending: Requests a session may have running or waiting,
+                None for no limit
+        """
+        self.max_pending = max_pending
+        self._locks: Dict[str, _SessionLock] = {}
+        self._stats = {
+            "acquired": 0,
+            "contended": 0,
+            "rejected": 0
+        }
+
+    @contextlib.asynccontextmanager
+    async def hold(self, session_id: str) -> AsyncIterator[None]:
+        """
+        Hold the lock of a session for the duration of the block
+
+        Raises:
+            Overloaded: If the session already has max_pending requests
+        """
+        entry = self._locks.get(session_id)
+        if entry is None:
+            entry = self._locks[session_id] = _SessionLock()
+        if self.max_pending is not None and entry.users >= self.max_pending:
+            self._stats["rejected"] += 1
+            raise Overloaded(f"session {session_id}", "too many pending requests", 1.0)
+
+        entry.users += 1
+        try:
+            if entry.lock.locked():
+                self._stats["contended"] += 1
+            async with entry.lock:
+                self._stats["acquired"] += 1
+                yield
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                self._locks.pop(session_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get lock metrics
+
+        Returns:
+            Dictionary with sessions holding a lock, requests waiting for
+            one and acquired/contended/rejected counts
+        """
+        waiting = sum(entry.users - int(entry.lock.locked()) for entry in self._locks.values())
+        return dict(self._stats, active_sessions=len(self._locks), waiting=waiting)
@@ -0,0 +1,245 @@
+import json
+import time
+import threading
+import importlib.util
+from collections import deque
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, List, Optional, Type
+
+# Imported where needed so loading the package doesn't pull in the SDK
+if TYPE_CHECKING:
+    import speech_recognition as sr
+
+
+class AsrBackend:
+    """
+    Speech recognition engine behind SpeechRecognizer
+
+    Backends raise ``sr.UnknownValueError`` when no speech was recognized
+    and ``sr.RequestError`` when the engine itself failed, so that
+    SpeechRecognizer can keep building the same result dict for all of them.
+    """
+    name = ""
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """Whether the optional packages this backend needs are installed"""
+        return True
+
+    def recognize(self, recognizer: "sr.Recognizer", audio_data: "sr.AudioData", language: str) -> str:
+        """
+        Transcribe recorded audio
+
+        Args:
+            recognizer: Shared sr.Recognizer instance
+            audio_data: Audio recorded from sr.AudioFile
+            language: Language code such as "zh-CN"
+
+        Returns:
+            Recognized text
+        """
+        raise NotImplementedError
+
+
+# Backend name -> class, filled by register_backend
+_BACKENDS: Dict[str, Type[AsrBackend]] = {}
+
+
+def register_backend(name: str) -> Callable[[Type[AsrBackend]], Type[AsrBackend]]:
+    """
+    Class decorator registering an ASR backend under a config name
+
+    Args:
+        name: Name used to select the backend, e.g. in SpeechRecognizer(backend=...)
+    """
+    def decorator(cls: Type[AsrBackend]) -> Type[AsrBackend]:
+        cls.name = name
+        _BACKENDS[name] = cls
+        return cls
+    return decorator
+
+
+def create_backend(name: str, **options: Any) -> AsrBackend:
+    """
+    Instantiate a registered backend
+
+    Args:
+        name: Registered backend name
+        **options: Keyword arguments of the backend class
+
+    Returns:
+        The backend instance
+    """
+    cls = _BACKENDS.get(name)
+    if cls is None:
+        raise ValueError(f"Unknown ASR backend '{name}', expected one of {sorted(_BACKENDS)}")
+    if not cls.is_available():
+        raise ValueError(f"ASR backend '{name}' is not installed")
+    return cls(**options)
+
+
+def available_backends() -> List[str]:
+    """Names of the registered backends whose dependencies are installed"""
+    return sorted(name for name, cls in _BACKENDS.items() if cls.is_available())
+
+
+@register_backend("google")
+class GoogleBackend(AsrBackend):
+    """
+    Free Google Web Speech API (the previous hard-wired engine)
+    """
+    def __init__(self, key: Optional[str] = None):
+        self.key = key
+
+    def recognize(self, recognizer: "sr.Recognizer", audio_data: "sr.AudioData", language: str) -> str:
+        return recognizer.recognize_google(audio_data, key=self.key, language=language)
+
+
+@register_backend("vosk")
+class VoskBackend(AsrBackend):
+    """
+    Offline Kaldi recognition with Vosk; the model is loaded once and reused
+    """
+    SAMPLE_RATE = 16000
+
+    def __init__(self, model_path: str):
+        """
+        Args:
+            model_path: Directory of an unpacked Vosk model matching the language
+        """
+        from vosk import Model
+
+        self.model = Model(model_path)
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return importlib.util.find_spec("vosk") is not None
+
+    def recognize(self, recognizer: "sr.Recognizer", audio_data: "sr.AudioData", language: str) -> str:
+        import speech_recognition as sr
+        from vosk import KaldiRecognizer
+
+        # KaldiRecognizer keeps per-utterance state, so one per call
+        kaldi = KaldiRecognizer(self.model, self.SAMPLE_RATE)
+        kaldi.AcceptWaveform(audio_data.get_raw_data(convert_rate=self.SAMPLE_RATE, convert_width=2))
+        text = json.loads(kaldi.FinalResult()).get("text", "")
+        if not text:
+            raise sr.UnknownValueError()
+        # Vosk separates Chinese characters with spaces
+        return text.replace(" ", "") if language.startswith("zh") else text
+
+
+@register_backend("whisper")
+class WhisperBackend(AsrBackend):
+    """
+    Offline Whisper recognition through faster-whisper (CTranslate2)
+    """
+    SAMPLE_RATE = 16000
+
+    def __init__(self, model: str = "base", device: str = "auto", compute_type: str = "default", **transcribe_options):
+        """
+        Args:
+            model: Model size or path of a converted model
+            device: "cpu", "cuda" or "auto"
+            compute_type: CTranslate2 quantization, e.g. "int8"
+            **transcribe_options: Extra WhisperModel.transcribe arguments
+        """
+        from faster_whisper import WhisperModel
+
+        self.model = WhisperModel(model, device=device, compute_type=compute_type)
+        self.transcribe_options = transcribe_options
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return importlib.util.find_spec("faster_whisper") is not None
+
+    def recognize(self, recognizer: "sr.Recognizer", audio_data: "sr.AudioData", language: str) -> str:
+        import numpy as np
+        import speech_recognition as sr
+
+        pcm = audio_data.get_raw_data(convert_rate=self.SAMPLE_RATE, convert_width=2)
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        segments, _ = self.model.transcribe(samples, language=language.split("-")[0], **self.transcribe_options)
+        text = "".join(segment.text for segment in segments).strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+@register_backend("stub")
+class StubBackend(AsrBackend):
+    """
+    Deterministic backend for tests and benchmarks; never leaves the process
+    """
+    def __init__(self, text: str = "", latency: float = 0.0, per_second_latency: float = 0.0):
+        """
+        Args:
+            text: Transcript returned for every request ("" means no speech)
+            latency: Fixed delay per request in seconds
+            per_second_latency: Extra delay per second of audio
+        """
+        self.text = text
+        self.latency = latency
+        self.per_second_latency = per_second_latency
+
+    def recognize(self, recognizer: "sr.Recognizer", audio_data: "sr.AudioData", language: str) -> str:
+        import speech_recognition as sr
+
+        time.sleep(self.latency + self.per_second_latency * audio_duration(audio_data))
+        if not self.text:
+            raise sr.UnknownValueError()
+        return self.text
+
+
+def audio_duration(audio_data: "sr.AudioData") -> float:
+    """Length of recorded audio in seconds"""
+    return len(audio_data.frame_data) / (audio_data.sample_rate * audio_data.sample_width)
+
+
+class BackendLatency:
+    """
+    Latency counters of one ASR backend
+
+    Keeps totals plus a window of recent requests for percentiles, and the
+    real-time factor (seconds of processing per second of audio) that
+    routing short utterances is based on.
+    """
+    def __init__(self, window: int = 256):
+        self.requests = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.audio_seconds = 0.0
+        self._recent: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, elapsed: float, audio_seconds: float, error: bool = False):
+        with self._lock:
+            self.requests += 1
+            self.errors += int(error)
+            self.total_seconds += elapsed
+            self.audio_seconds += audio_seconds
+            self._recent.append(elapsed)
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Get the counters
+
+        Returns:
+            Dictionary with request/error counts, mean/p50/p95 latency in
+            milliseconds over the recent window and the real-time factor
+        """
+        with self._lock:
+            recent = sorted(self._recent)
+            requests, errors = self.requests, self.errors
+            total_seconds, audio_seconds = self.total_seconds, self.audio_seconds
+
+        def percentile(q: float) -> float:
+            return recent[min(len(recent) - 1, int(q * len(recent)))] * 1000 if recent else 0.0
+
+        return {
+            "requests": requests,
+            "errors": errors,
+            "mean_ms": total_seconds / requests * 1000 if requests else 0.0,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "real_time_factor": total_seconds / audio_seconds if audio_seconds else 0.0
+        }
@@ -0,0 +1,370 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+class AudioCache:
+    """
+    Content-addressed cache for synthesized audio
+
+    A byte-bounded in-memory LRU sits in front of a size-bounded directory
+    on disk. Entries are keyed on a hash of every parameter that affects the
+    audio and grouped per voice on disk, so all audio of a voice can be
+    dropped when the voice changes.
+    """
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_memory_bytes: int = 32 * 1024 * 1024,
+        max_disk_bytes: int = 512 * 1024 * 1024
+    ):
+        """
+        Initialize the cache
+
+        Args:
+            cache_dir: Directory for the disk tier (None disables it)
+            max_memory_bytes: Size limit of the memory tier (0 disables it)
+            max_disk_bytes: Size limit of the disk tier
+        """
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+
+        self._lock = threading.Lock()
+
+        # key -> (audio, voice key), least recently used first
+        self._memory: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._memory_bytes = 0
+
+        # key -> (path, size), least recently used first
+        self._disk: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._disk_bytes = 0
+
+        # voice key -> generation, bumped by invalidate_voice
+        self._generations: Dict[str, int] = {}
+
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+            "invalidations": 0
+        }
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._load_disk_index()
+
+    @staticmethod
+    def make_key(**params: Any) -> str:
+        """
+        Build a cache key from synthesis parameters
+
+        Args:
+            **params: Every parameter that affects the synthesized audio
+
+        Returns:
+            Hex digest identifying the audio
+        """
+        payload = json.dumps(params, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _voice_key(voice_id: str) -> str:
+        """File-system safe name of a voice"""
+        return re.sub(r'[^A-Za-z0-9_.-]', '_', voice_id)
+
+    def _voice_dir(self, voice_key: str) -> str:
+        """Disk directory holding the audio of one voice"""
+        return os.path.join(self.cache_dir, voice_key)
+
+    def _load_disk_index(self):
+        """Rebuild the disk index from files left by a previous process"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for file_name in files:
+                if not file_name.endswith(".bin"):
+                    continue
+                path = os.path.join(root, file_name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, file_name[:-len(".bin")], path, stat.st_size))
+
+        for _, key, path, size in sorted(entries):
+            self._disk[key] = (path, size)
+            self._disk_bytes += size
+
+        self._remove_files(self._evict_disk())
+
+    def generation(self, voice_id: str) -> int:
+        """
+        Current generation of a voice's cached audio
+
+        invalidate_voice starts a new generation. Take it before
+        synthesizing and hand it to put, so audio of a voice that changed
+        while it was being synthesized is not cached.
+
+        Args:
+            voice_id: Voice ID
+
+        Returns:
+            Generation number
+        """
+        with self._lock:
+            return self._generations.get(self._voice_key(voice_id), 0)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Look up cached audio
+
+        Args:
+            key: Key from make_key
+
+        Returns:
+            Audio bytes, or None on a miss
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return entry[0]
+
+            disk_entry = self._disk.get(key)
+            if disk_entry is None:
+                self._stats["misses"] += 1
+                return None
+
+        # Read without the lock, so other threads aren't held up by disk I/O
+        path, _ = disk_entry
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+            os.utime(path)
+        except OSError:
+            audio = None
+
+        stale = []
+        with self._lock:
+            # The entry may have been evicted or invalidated in the meantime
+            current = self._disk.get(key) is disk_entry
+            if audio is None:
+                if current:
+                    stale.append(self._pop_disk_entry(key))
+                self._stats["misses"] += 1
+            else:
+                self._stats["disk_hits"] += 1
+                if current:
+                    self._disk.move_to_end(key)
+                    # Promote to the memory tier
+                    self._put_memory(key, audio, os.path.basename(os.path.dirname(path)))
+        self._remove_files(stale)
+        return audio
+
+    def put(self, key: str, audio: bytes, voice_id: str, generation: Optional[int] = None):
+        """
+        Store audio in both tiers
+
+        Args:
+            key: Key from make_key
+            audio: Audio bytes
+            voice_id: Voice the audio was synthesized with
+            generation: generation() of the voice taken before synthesizing;
+                the audio is dropped if the voice was invalidated since.
+                None for the current generation
+        """
+        voice_key = self._voice_key(voice_id)
+        with self._lock:
+            current = self._generations.get(voice_key, 0)
+            if generation is not None and generation != current:
+                return
+            self._put_memory(key, audio, voice_key)
+            if not self.cache_dir or key in self._disk or len(audio) > self.max_disk_bytes:
+                return
+        self._write_disk([(key, audio, voice_key, current)])
+
+    def contains(self, key: str) -> bool:
+        """
+        Check whether audio is cached, without counting a hit or miss
+
+        Args:
+            key: Key from make_key
+
+        Returns:
+            True if either tier holds the key
+        """
+        with self._lock:
+            return key in self._memory or key in self._disk
+
+    def put_many(self, entries: Iterable[Tuple[str, bytes, str, Optional[int]]], memory: bool = True) -> int:
+        """
+        Store several entries at once
+
+        The files are written without holding the cache lock, so lookups
+        aren't stalled by a large batch, and the index is updated once.
+
+        Args:
+            entries: (key, audio, voice_id, generation) tuples, generation
+                as for put
+            memory: Also put the audio in the memory tier; pre-rendered
+                audio can go to disk only and is promoted on first use
+
+        Returns:
+            Number of entries written to disk
+        """
+        with self._lock:
+            fresh = []
+            for key, audio, voice_id, generation in entries:
+                voice_key = self._voice_key(voice_id)
+                current = self._generations.get(voice_key, 0)
+                if generation is None or generation == current:
+                    fresh.append((key, audio, voice_key, current))
+            if memory:
+                for key, audio, voice_key, _ in fresh:
+                    self._put_memory(key, audio, voice_key)
+            if not self.cache_dir:
+                return 0
+            fresh = [entry for entry in fresh if entry[0] not in self._disk and len(entry[1]) <= self.max_disk_bytes]
+        return self._write_disk(fresh)
+
+    def _write_disk(self, entries: List[Tuple[str, bytes, str, int]]) -> int:
+        """
+        Write (key, audio, voice key, generation) entries to the disk tier
+
+        Files are written and removed without the lock; it is only held to
+        update the index, where entries of a voice invalidated during the
+        write are dropped again.
+        """
+        written = []
+        for key, audio, voice_key, generation in entries:
+            voice_dir = self._voice_dir(voice_key)
+            path = os.path.join(voice_dir, f"{key}.bin")
+            try:
+                os.makedirs(voice_dir, exist_ok=True)
+                # Write to a temporary name first so readers never see partial
+                # files; the name is per thread as the lock isn't held
+                temp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(temp_path, "wb") as f:
+                    f.write(audio)
+                os.replace(temp_path, path)
+            except OSError as e:
+                logging.warning(f"Failed to write TTS cache entry {path}: {e}")
+                continue
+            written.append((key, path, len(audio), voice_key, generation))
+
+        stored = 0
+        stale = []
+        with self._lock:
+            for key, path, size, voice_key, generation in written:
+                if key in self._disk:
+                    # Written by another thread too, or by a newer generation
+                    continue
+                if generation != self._generations.get(voice_key, 0):
+                    stale.append(path)
+                    continue
+                self._disk[key] = (path, size)
+                self._disk_bytes += size
+                stored += 1
+            stale.extend(self._evict_disk())
+        self._remove_files(stale)
+        return stored
+
+    def _put_memory(self, key: str, audio: bytes, voice_key: str):
+        if len(audio) > self.max_memory_bytes:
+            return
+
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old[0])
+
+        self._memory[key] = (audio, voice_key)
+        self._memory_bytes += len(audio)
+
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (evicted, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._stats["memory_evictions"] += 1
+
+    def _evict_disk(self) -> List[str]:
+        """Drop least recently used disk entries over the size limit, returning their paths"""
+        paths = []
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            paths.append(self._pop_disk_entry(next(iter(self._disk))))
+            self._stats["disk_evictions"] += 1
+        return paths
+
+    def _pop_disk_entry(self, key: str) -> str:
+        """Remove a disk entry from the index, returning the path of its file"""
+        path, size = self._disk.pop(key)
+        self._disk_bytes -= size
+        return path
+
+    @staticmethod
+    def _remove_files(paths: List[str]):
+        """Delete files of dropped entries; call without holding the lock"""
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def invalidate_voice(self, voice_id: str) -> int:
+        """
+        Drop all cached audio of a voice
+
+        Also starts a new generation of the voice, so audio still being
+        synthesized for its previous version is not cached.
+
+        Args:
+            voice_id: Voice whose audio is no longer valid
+
+        Returns:
+            Number of entries removed
+        """
+        voice_key = self._voice_key(voice_id)
+        removed = 0
+        paths = []
+        with self._lock:
+            self._generations[voice_key] = self._generations.get(voice_key, 0) + 1
+            for key in [k for k, (_, v) in self._memory.items() if v == voice_key]:
+                audio, _ = self._memory.pop(key)
+                self._memory_bytes -= len(audio)
+                removed += 1
+
+            if self.cache_dir:
+                voice_dir = self._voice_dir(voice_key)
+                for key in [k for k, (path, _) in self._disk.items() if os.path.dirname(path) == voice_dir]:
+                    paths.append(self._pop_disk_entry(key))
+                    removed += 1
+
+            self._stats["invalidations"] += removed
+        self._remove_files(paths)
+        return removed
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            paths = [self._pop_disk_entry(key) for key in list(self._disk)]
+        self._remove_files(paths)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache counters
+
+        Returns:
+            Dictionary with hit/miss/eviction counters and tier sizes
+        """
+        with self._lock:
+            return dict(
+                self._stats,
+                memory_entries=len(self._memory),
+                memory_bytes=self._memory_bytes,
+                disk_entries=len(self._disk),
+                disk_bytes=self._disk_bytes
+            )
@@ -0,0 +1,392 @@
+import time
+import uuid
+import bisect
+import logging
+import threading
+import contextlib
+import contextvars
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+# Upper bounds of the latency histogram buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_trace_id: contextvars.ContextVar = contextvars.ContextVar("voice_trace_id", default=None)
+
+
+def current_trace_id() -> Optional[str]:
+    """Trace ID of the request being handled, None outside of one"""
+    return _trace_id.get()
+
+
+@contextlib.contextmanager
+def trace(trace_id: Optional[str] = None) -> Iterator[str]:
+    """
+    Run the block as part of a traced request
+
+    The ID is kept in a context variable, so it follows the request into
+    tasks it starts and, through VoiceDialogue, onto the stage thread pools.
+
+    Args:
+        trace_id: ID to use, e.g. the caller's request ID; None keeps the
+            current trace or starts a new one
+
+    Yields:
+        The trace ID
+    """
+    if trace_id is None:
+        trace_id = _trace_id.get()
+        if trace_id is not None:
+            yield trace_id
+            return
+        trace_id = uuid.uuid4().hex
+
+    token = _trace_id.set(trace_id)
+    try:
+        yield trace_id
+    finally:
+        _trace_id.reset(token)
+
+
+class TraceIdFilter(logging.Filter):
+    """
+    Logging filter adding the current trace ID to every record
+
+    Add it to a handler and use ``%(trace_id)s`` in its format.
+    """
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = _trace_id.get() or "-"
+        return True
+
+
+class Record(NamedTuple):
+    kind: str
+    name: str
+    labels: Dict[str, str]
+    value: float
+    trace_id: Optional[str]
+    attributes: Dict[str, Any]
+
+
+class Exporter:
+    """
+    Receives every measurement of a Metrics instance
+
+    kind is "counter" (value is the increment), "gauge" (value is the
+    change) or "histogram" (value is one observation). Called on the
+    measuring thread, so implementations must be thread-safe and quick.
+    """
+    def record(
+        self,
+        kind: str,
+        name: str,
+        labels: Labels,
+        value: float,
+        trace_id: Optional[str],
+        attributes: Optional[Dict[str, Any]]
+    ):
+        raise NotImplementedError
+
+
+class _Span:
+    """Timing of one stage call, see Metrics.timer"""
+    __slots__ = ("metrics", "stage", "labels", "outcome", "attributes", "start")
+
+    def __init__(self, metrics: "Metrics", stage: str, labels: Dict[str, str]):
+        self.metrics = metrics
+        self.stage = stage
+        self.labels = labels
+        self.outcome = "success"
+        self.attributes: Dict[str, Any] = {}
+
+    @property
+    def trace_id(self) -> Optional[str]:
+        return _trace_id.get()
+
+    def fail(self, error_type: str):
+        """Count the call as failed with this error type"""
+        self.outcome = error_type
+
+    def set(self, **attributes: Any):
+        """Attach attributes (e.g. an upstream request ID) to the measurements"""
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "_Span":
+        self.metrics.gauge("stage_in_flight", 1, stage=self.stage, **self.labels)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self.start
+        if exc_type is not None and self.outcome == "success":
+            self.outcome = exc_type.__name__
+        metrics, labels = self.metrics, self.labels
+        metrics.gauge("stage_in_flight", -1, stage=self.stage, **labels)
+        metrics.observe("stage_seconds", elapsed, _attributes=self.attributes, stage=self.stage, **labels)
+        metrics.inc("stage_calls_total", 1, _attributes=self.attributes, stage=self.stage, outcome=self.outcome, **labels)
+        return False
+
+
+class _NullSpan:
+    """Span of a disabled Metrics instance, does nothing"""
+    __slots__ = ()
+    trace_id = property(lambda self: _trace_id.get())
+
+    def fail(self, error_type: str):
+        pass
+
+    def set(self, **attributes: Any):
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Metrics:
+    """
+    Stage timers, counters, gauges and payload byte counts of the voice pipeline
+
+    Measurements are handed to the exporters as they are taken; without
+    any exporter every call returns right away, so instrumented code costs
+    next to nothing when metrics are off. Metric names get the prefix
+    ("voice_stage_seconds"); the current trace ID and any span attributes
+    are passed along to the exporters but are never labels.
+    """
+    def __init__(self, exporters: Sequence[Exporter] = (), prefix: str = "voice"):
+        """
+        Initialize the metrics
+
+        Args:
+            exporters: Exporters receiving the measurements, none to disable
+            prefix: Prefix of every metric name
+        """
+        self.prefix = prefix
+        self._exporters: List[Exporter] = list(exporters)
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any exporter is attached"""
+        return bool(self._exporters)
+
+    def add_exporter(self, exporter: Exporter):
+        """Attach another exporter"""
+        self._exporters.append(exporter)
+
+    def _emit(self, kind: str, name: str, value: float, attributes: Optional[Dict[str, Any]], labels: Dict[str, Any]):
+        key = tuple(sorted((label, str(label_value)) for label, label_value in labels.items()))
+        trace_id = _trace_id.get()
+        for exporter in self._exporters:
+            exporter.record(kind, f"{self.prefix}_{name}", key, value, trace_id, attributes)
+
+    def inc(self, name: str, value: float = 1, _attributes: Optional[Dict[str, Any]] = None, **labels: Any):
+        """Add to a counter"""
+        if self._exporters:
+            self._emit("counter", name, value, _attributes, labels)
+
+    def gauge(self, name: str, delta: float, _attributes: Optional[Dict[str, Any]] = None, **labels: Any):
+        """Move a gauge up or down"""
+        if self._exporters:
+            self._emit("gauge", name, delta, _attributes, labels)
+
+    def observe(self, name: str, value: float, _attributes: Optional[Dict[str, Any]] = None, **labels: Any):
+        """Record one observation of a histogram"""
+        if self._exporters:
+            self._emit("histogram", name, value, _attributes, labels)
+
+    def add_bytes(self, stage: str, direction: str, size: int):
+        """
+        Count payload bytes of a stage
+
+        Args:
+            stage: Stage name ("asr", "llm", "tts", "storage", "client")
+            direction: "sent" or "received", seen from this server
+            size: Number of bytes
+        """
+        if self._exporters:
+            self._emit("counter", "payload_bytes_total", size, None, {"stage": stage, "direction": direction})
+
+    def timer(self, stage: str, **labels: Any):
+        """
+        Time a stage call
+
+        Use as ``with metrics.timer("tts", operation="synthesize") as span``.
+        Records stage_seconds and stage_calls_total with the outcome
+        ("success", span.fail()'s error type or the exception's class
+        name) and keeps stage_in_flight up to date.
+
+        Args:
+            stage: Stage name
+            **labels: Further labels, e.g. the operation
+
+        Returns:
+            Context manager yielding the span
+        """
+        if not self._exporters:
+            return _NULL_SPAN
+        return _Span(self, stage, labels)
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class TextExporter(Exporter):
+    """
+    Aggregates measurements for the Prometheus text exposition format
+
+    render() returns the current values; serve() exposes them over HTTP
+    for a scraper.
+    """
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Initialize the exporter
+
+        Args:
+            buckets: Upper bounds of the histogram buckets
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # name -> labels -> value, or [bucket counts..., sum, count] for histograms
+        self._values: Dict[str, Dict[Labels, Any]] = {}
+        self._kinds: Dict[str, str] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def record(self, kind, name, labels, value, trace_id, attributes):
+        with self._lock:
+            series = self._values.get(name)
+            if series is None:
+                series = self._values[name] = {}
+                self._kinds[name] = kind
+            if kind == "histogram":
+                state = series.get(labels)
+                if state is None:
+                    state = series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+                state[bisect.bisect_left(self.buckets, value)] += 1
+                state[-2] += value
+                state[-1] += 1
+            else:
+                series[labels] = series.get(labels, 0) + value
+
+    def render(self) -> str:
+        """
+        Current values in the Prometheus text exposition format
+
+        Returns:
+            Exposition text, one line per sample
+        """
+        lines = []
+        with self._lock:
+            for name in sorted(self._values):
+                kind = self._kinds[name]
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(self._values[name].items()):
+                    if kind != "histogram":
+                        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(self.buckets + (float("inf"),), value):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f"{name}_bucket{_format_labels(labels, (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {value[-2]:g}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {value[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        """
+        Serve render() at /metrics from a background thread
+
+        Args:
+            port: Port to listen on, 0 for any free port
+            host: Address to bind
+
+        Returns:
+            The running server; call shutdown() to stop it
+        """
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server
+
+
+class InMemoryExporter(Exporter):
+    """
+    Keeps every measurement, with its trace ID and attributes, for tests
+    """
+    def __init__(self, max_records: int = 100000):
+        """
+        Initialize the exporter
+
+        Args:
+            max_records: Most recent records kept
+        """
+        self._lock = threading.Lock()
+        self._records: Deque[Record] = deque(maxlen=max_records)
+
+    def record(self, kind, name, labels, value, trace_id, attributes):
+        with self._lock:
+            self._records.append(Record(kind, name, dict(labels), value, trace_id, dict(attributes or {})))
+
+    def records(self, name: Optional[str] = None, trace_id: Optional[str] = None, **labels: Any) -> List[Record]:
+        """
+        Get the kept records
+
+        Args:
+            name: Only records of this metric
+            trace_id: Only records of this trace
+            **labels: Only records with these label values
+
+        Returns:
+            Matching records, oldest first
+        """
+        wanted = {label: str(value) for label, value in labels.items()}
+        with self._lock:
+            records = list(self._records)
+        return [
+            record for record in records
+            if (name is None or record.name == name)
+            and (trace_id is None or record.trace_id == trace_id)
+            and all(record.labels.get(label) == value for label, value in wanted.items())
+        ]
+
+    def value(self, name: str, **labels: Any) -> float:
+        """Sum of a counter or gauge over the records matching the labels"""
+        return sum(record.value for record in self.records(name, **labels))
+
+    def observations(self, name: str, **labels: Any) -> List[float]:
+        """Observed values of a histogram matching the labels"""
+        return [record.value for record in self.records(name, **labels)]
+
+    def clear(self):
+        """Forget all records"""
+        with self._lock:
+            self._records.clear()
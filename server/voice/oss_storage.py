@@ -1,12 +1,25 @@
 import os
 import time
+import asyncio
+import hashlib
 import logging
-import oss2
-from typing import Dict, Any, Optional
+import functools
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+# Most keys OSS accepts in one DeleteMultipleObjects request
+MAX_BATCH_DELETE = 1000
 
 class OssStorage:
     """
     Handles file storage operations with Aliyun OSS
+
+    Every blocking method has an awaitable *_async counterpart that runs it
+    on the storage's own thread pool, sized like the pooled HTTP session
+    shared by all requests.
     """
     def __init__(
         self,
@@ -14,7 +27,19 @@ class OssStorage:
         access_key_secret: str,
         bucket_name: str = "voice-clone-bucket",
         endpoint: str = "https://oss-cn-hangzhou.aliyuncs.com",
-        region: str = "cn-hangzhou"
+        region: str = "cn-hangzhou",
+        url_expires: int = 600,
+        url_refresh_margin: int = 60,
+        known_objects_limit: int = 10000,
+        multipart_threshold: int = 10 * 1024 * 1024,
+        multipart_part_size: int = 4 * 1024 * 1024,
+        multipart_threads: int = 4,
+        upload_checkpoint_dir: Optional[str] = None,
+        upload_retries: int = 2,
+        pool_size: int = 16,
+        check_bucket: bool = True,
+        bucket_check_wait: float = 10.0,
+        bucket_check_retry: float = 30.0
     ):
         """
         Initialize OSS storage
@@ -25,10 +50,29 @@ class OssStorage:
             bucket_name: OSS bucket name
             endpoint: OSS endpoint
             region: OSS region
+            url_expires: Lifetime of signed URLs in seconds
+            url_refresh_margin: A cached signed URL is re-signed once it has
+                less than this many seconds left
+            known_objects_limit: Number of objects whose existence and
+                signed URL are remembered
+            multipart_threshold: Files at least this large are uploaded in
+                parts by upload_file
+            multipart_part_size: Size of each part (at least 100 KiB)
+            multipart_threads: Parts uploaded at the same time
+            upload_checkpoint_dir: Directory for the checkpoints of
+                multipart uploads (default: ~/.py-oss-upload)
+            upload_retries: Times an interrupted multipart upload is resumed
+                before giving up
+            pool_size: Pooled HTTP connections, and threads running the
+                *_async methods
+            check_bucket: Check that the bucket exists (creating it if not)
+                on a background thread
+            bucket_check_wait: Seconds an upload waits for a running bucket
+                check to finish
+            bucket_check_retry: Seconds after a failed bucket check before
+                the next upload checks again
         """
-        # Set up logging
-        logging.basicConfig(level=logging.INFO, 
-                            format='%(asctime)s - %(levelname)s - %(message)s')
+        import oss2
         
         # Create auth object
         self.auth = oss2.Auth(access_key_id, access_key_secret)
@@ -37,13 +81,114 @@ class OssStorage:
         self.bucket_name = bucket_name
         self.endpoint = endpoint
         self.region = region
-        self.bucket = oss2.Bucket(self.auth, endpoint, bucket_name, region=region)
+        self.pool_size = pool_size
+        self.session = oss2.Session(pool_size=pool_size)
+        self.bucket = oss2.Bucket(self.auth, endpoint, bucket_name, session=self.session, region=region)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        
+        # Signed URLs (object name -> (url, expiry time)) and content-addressed
+        # objects known to exist, least recently used first
+        self.url_expires = url_expires
+        self.url_refresh_margin = url_refresh_margin
+        self.known_objects_limit = known_objects_limit
+        self._signed_urls: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._known_objects: "OrderedDict[str, None]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
+        # Large files go up in parallel parts; finished parts are recorded in
+        # a checkpoint so a failed upload resumes instead of starting over
+        self.multipart_threshold = multipart_threshold
+        self.multipart_part_size = multipart_part_size
+        self.multipart_threads = multipart_threads
+        self.upload_retries = upload_retries
+        self._checkpoints = oss2.ResumableStore(root=upload_checkpoint_dir) if upload_checkpoint_dir else None
+        
+        # Check the bucket in the background, so a slow or unreachable OSS
+        # doesn't hold up startup; the result is kept once it succeeded
+        self.check_bucket = check_bucket
+        self.bucket_check_wait = bucket_check_wait
+        self.bucket_check_retry = bucket_check_retry
+        self._bucket_status: Dict[str, Any] = {"checked": False, "exists": False, "error": None, "checked_at": None}
+        self._bucket_check: Optional[threading.Thread] = None
+        self._bucket_lock = threading.Lock()
+        if check_bucket:
+            self.start_bucket_check()
+    
+    def start_bucket_check(self) -> threading.Thread:
+        """
+        Check the bucket on a background thread, unless a check is running
+        
+        Returns:
+            The thread running the check
+        """
+        with self._bucket_lock:
+            if self._bucket_check is None or not self._bucket_check.is_alive():
+                self._bucket_check = threading.Thread(
+                    target=self._check_bucket,
+                    name="oss-bucket-check",
+                    daemon=True
+                )
+                self._bucket_check.start()
+            return self._bucket_check
+    
+    def _check_bucket(self):
+        try:
+            self._ensure_bucket_exists()
+            status = {"exists": True, "error": None}
+        except Exception as e:
+            logging.warning(f"Bucket check of {self.bucket_name} failed: {e}")
+            status = {"exists": False, "error": str(e)}
+        
+        with self._bucket_lock:
+            self._bucket_status = dict(status, checked=True, checked_at=time.time())
+    
+    def bucket_status(self) -> Dict[str, Any]:
+        """
+        Get the cached result of the bucket check, without any request
+        
+        Returns:
+            Dictionary with 'checked', 'exists', 'error', 'checked_at' (Unix
+            time of the last check) and 'checking' (a check is running)
+        """
+        with self._bucket_lock:
+            checking = self._bucket_check is not None and self._bucket_check.is_alive()
+            return dict(self._bucket_status, checking=checking)
+    
+    def wait_for_bucket(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Wait for the bucket check to finish
         
-        # Ensure bucket exists
-        self._ensure_bucket_exists()
+        A new check is started if none has run yet, or if the last one
+        failed more than bucket_check_retry seconds ago.
+        
+        Args:
+            timeout: Seconds to wait, None to wait until the check is done
+            
+        Returns:
+            bucket_status() once the check finished or the timeout expired
+        """
+        with self._bucket_lock:
+            status = self._bucket_status
+            thread = self._bucket_check
+        if status["exists"]:
+            return self.bucket_status()
+        
+        stale = status["checked"] and time.time() - status["checked_at"] >= self.bucket_check_retry
+        if thread is None or (not thread.is_alive() and stale):
+            thread = self.start_bucket_check()
+        thread.join(timeout)
+        return self.bucket_status()
+    
+    def _await_bucket(self):
+        """Let a write wait briefly for a running check, which may create the bucket"""
+        if self.check_bucket:
+            self.wait_for_bucket(self.bucket_check_wait)
     
     def _ensure_bucket_exists(self):
         """Ensure bucket exists, create if it doesn't"""
+        import oss2
+        
         try:
             # Check if bucket exists
             self.bucket.get_bucket_info()
@@ -57,10 +202,90 @@ class OssStorage:
                 logging.error(f"Failed to create bucket: {e}")
                 raise
     
+    def sign_url(self, object_name: str) -> str:
+        """
+        Get a signed GET URL for an object, reusing a cached one while it
+        is still valid for at least url_refresh_margin seconds
+        
+        Args:
+            object_name: Name of object in OSS
+            
+        Returns:
+            Signed URL
+        """
+        now = time.time()
+        with self._cache_lock:
+            cached = self._signed_urls.get(object_name)
+            if cached is not None and cached[1] - now > self.url_refresh_margin:
+                self._signed_urls.move_to_end(object_name)
+                return cached[0]
+        
+        url = self.bucket.sign_url('GET', object_name, self.url_expires, slash_safe=True)
+        
+        with self._cache_lock:
+            self._signed_urls[object_name] = (url, now + self.url_expires)
+            self._signed_urls.move_to_end(object_name)
+            if len(self._signed_urls) > self.known_objects_limit:
+                self._signed_urls.popitem(last=False)
+        
+        return url
+    
+    def _remember_object(self, object_name: str):
+        """Record that a content-addressed object exists in the bucket"""
+        with self._cache_lock:
+            self._known_objects[object_name] = None
+            self._known_objects.move_to_end(object_name)
+            if len(self._known_objects) > self.known_objects_limit:
+                self._known_objects.popitem(last=False)
+    
+    def _is_known_object(self, object_name: str) -> bool:
+        with self._cache_lock:
+            if object_name in self._known_objects:
+                self._known_objects.move_to_end(object_name)
+                return True
+            return False
+    
+    def _upload_multipart(self, object_name: str, local_file_path: str):
+        """
+        Upload a file in parallel parts, resuming after transient failures
+        
+        Each retry picks up the checkpoint of the previous attempt, so only
+        the parts that didn't finish are sent again.
+        
+        Args:
+            object_name: Name to use for object in OSS
+            local_file_path: Path to local file
+            
+        Returns:
+            The oss2 result of the completed upload
+        """
+        import oss2
+        
+        for attempt in range(self.upload_retries + 1):
+            try:
+                return oss2.resumable_upload(
+                    self.bucket,
+                    object_name,
+                    local_file_path,
+                    store=self._checkpoints,
+                    multipart_threshold=self.multipart_threshold,
+                    part_size=self.multipart_part_size,
+                    num_threads=self.multipart_threads
+                )
+            except oss2.exceptions.OssError as e:
+                # Client errors (bad credentials, missing bucket) won't go away
+                retryable = isinstance(e, oss2.exceptions.RequestError) or e.status >= 500
+                if not retryable or attempt == self.upload_retries:
+                    raise
+                logging.warning(f"Upload of {object_name} interrupted, resuming: {e}")
+    
     def upload_file(self, local_file_path: str, object_name: Optional[str] = None) -> Dict[str, Any]:
         """
         Upload file to OSS
         
+        Files of at least multipart_threshold bytes are uploaded as a
+        resumable multipart upload, smaller ones with a single PUT.
+        
         Args:
             local_file_path: Path to local file
             object_name: Name to use for object in OSS (default: filename)
@@ -68,6 +293,8 @@ class OssStorage:
         Returns:
             Dictionary with URL and status
         """
+        import oss2
+        
         try:
             # Generate object name if not provided
             if not object_name:
@@ -76,11 +303,16 @@ class OssStorage:
                 timestamp = int(time.time())
                 object_name = f"{timestamp}_{base_name}"
             
+            self._await_bucket()
+            
             # Upload file
-            result = self.bucket.put_object_from_file(object_name, local_file_path)
+            if os.path.getsize(local_file_path) >= self.multipart_threshold:
+                result = self._upload_multipart(object_name, local_file_path)
+            else:
+                result = self.bucket.put_object_from_file(object_name, local_file_path)
             
-            # Generate a URL with temporary access (10 minutes)
-            url = self.bucket.sign_url('GET', object_name, 600, slash_safe=True)
+            # Generate a URL with temporary access
+            url = self.sign_url(object_name)
             
             logging.info(f"File uploaded successfully to {object_name}")
             
@@ -110,12 +342,16 @@ class OssStorage:
         Returns:
             Dictionary with URL and status
         """
+        import oss2
+        
         try:
+            self._await_bucket()
+            
             # Upload bytes
             result = self.bucket.put_object(object_name, data)
             
-            # Generate a URL with temporary access (10 minutes)
-            url = self.bucket.sign_url('GET', object_name, 600, slash_safe=True)
+            # Generate a URL with temporary access
+            url = self.sign_url(object_name)
             
             logging.info(f"Data uploaded successfully to {object_name}")
             
@@ -134,6 +370,60 @@ class OssStorage:
                 "error": str(e)
             }
     
+    def upload_bytes_dedup(
+        self,
+        data: bytes,
+        prefix: str,
+        extension: str,
+        check_exists: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Upload bytes under a content-addressed name, skipping the upload if
+        an identical object already exists
+        
+        The object is named {prefix}/{sha256 of data}.{extension}, so equal
+        bytes always map to the same object and different bytes never
+        overwrite each other.
+        
+        Args:
+            data: Bytes to upload
+            prefix: Object name prefix, e.g. "responses/<session_id>"
+            extension: File extension without the dot
+            check_exists: Ask OSS whether the object exists before uploading;
+                callers that know the bytes are new can skip the round trip
+            
+        Returns:
+            Dictionary with URL and status; 'uploaded' is False when an
+            existing object was reused
+        """
+        import oss2
+        
+        digest = hashlib.sha256(data).hexdigest()
+        object_name = f"{prefix.rstrip('/')}/{digest}.{extension}"
+        
+        try:
+            # Only ask OSS when this process hasn't seen the object yet
+            if self._is_known_object(object_name) or (
+                check_exists and self.bucket.object_exists(object_name)
+            ):
+                self._remember_object(object_name)
+                return {
+                    "url": self.sign_url(object_name),
+                    "object_name": object_name,
+                    "status_code": 200,
+                    "uploaded": False,
+                    "success": True
+                }
+        except oss2.exceptions.OssError as e:
+            # Fall back to a plain upload if the existence check fails
+            logging.warning(f"Failed to check object {object_name}: {e}")
+        
+        result = self.upload_bytes(data, object_name)
+        if result["success"]:
+            self._remember_object(object_name)
+        result["uploaded"] = result["success"]
+        return result
+    
     def download_file(self, object_name: str, local_file_path: str) -> Dict[str, Any]:
         """
         Download file from OSS
@@ -145,6 +435,8 @@ class OssStorage:
         Returns:
             Dictionary with status
         """
+        import oss2
+        
         try:
             # Create directory if it doesn't exist
             os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
@@ -176,10 +468,16 @@ class OssStorage:
         Returns:
             Dictionary with status
         """
+        import oss2
+        
         try:
             # Delete object
             self.bucket.delete_object(object_name)
             
+            with self._cache_lock:
+                self._known_objects.pop(object_name, None)
+                self._signed_urls.pop(object_name, None)
+            
             logging.info(f"Object {object_name} deleted successfully")
             
             return {
@@ -190,4 +488,222 @@ class OssStorage:
             return {
                 "success": False,
                 "error": str(e)
-            } 
\ No newline at end of file
+            } 
+    
+    def list_objects(self, prefix: str) -> Dict[str, Any]:
+        """
+        List the objects whose names start with a prefix
+        
+        Args:
+            prefix: Object name prefix, e.g. "responses/<session_id>/"
+            
+        Returns:
+            Dictionary with the matching 'object_names', the number of
+            list 'requests' made and status
+        """
+        import oss2
+        
+        object_names = []
+        requests = 0
+        token = ""
+        try:
+            while True:
+                result = self.bucket.list_objects_v2(
+                    prefix=prefix,
+                    continuation_token=token,
+                    max_keys=MAX_BATCH_DELETE
+                )
+                requests += 1
+                object_names.extend(info.key for info in result.object_list)
+                if not result.is_truncated:
+                    break
+                token = result.next_continuation_token
+            
+            return {
+                "object_names": object_names,
+                "requests": requests,
+                "success": True
+            }
+        except oss2.exceptions.OssError as e:
+            logging.error(f"Failed to list objects under {prefix}: {e}")
+            return {
+                "object_names": object_names,
+                "requests": requests,
+                "success": False,
+                "error": str(e)
+            }
+    
+    def delete_objects(self, object_names: Sequence[str]) -> Dict[str, Any]:
+        """
+        Delete objects with as few requests as possible
+        
+        Names are sent in batches of MAX_BATCH_DELETE per request.
+        
+        Args:
+            object_names: Names of objects in OSS
+            
+        Returns:
+            Dictionary with the number of objects 'deleted', the number of
+            delete 'requests' made and status
+        """
+        import oss2
+        
+        deleted = 0
+        requests = 0
+        try:
+            for start in range(0, len(object_names), MAX_BATCH_DELETE):
+                batch = list(object_names[start:start + MAX_BATCH_DELETE])
+                result = self.bucket.batch_delete_objects(batch)
+                requests += 1
+                deleted += len(result.deleted_keys)
+                
+                with self._cache_lock:
+                    for object_name in batch:
+                        self._known_objects.pop(object_name, None)
+                        self._signed_urls.pop(object_name, None)
+            
+            logging.info(f"Deleted {deleted} objects in {requests} requests")
+            
+            return {
+                "deleted": deleted,
+                "requests": requests,
+                "success": True
+            }
+        except oss2.exceptions.OssError as e:
+            logging.error(f"Failed to delete objects: {e}")
+            return {
+                "deleted": deleted,
+                "requests": requests,
+                "success": False,
+                "error": str(e)
+            }
+    
+    def delete_prefix(self, prefix: str) -> Dict[str, Any]:
+        """
+        Delete every object whose name starts with a prefix
+        
+        Args:
+            prefix: Object name prefix, e.g. "responses/<session_id>/"; must
+                not be empty
+            
+        Returns:
+            Dictionary with the number of objects 'deleted', the number of
+            list and delete 'requests' made and status
+        """
+        if not prefix:
+            raise ValueError("Refusing to delete the whole bucket")
+        
+        listed = self.list_objects(prefix)
+        if not listed["success"]:
+            return {
+                "deleted": 0,
+                "requests": listed["requests"],
+                "success": False,
+                "error": listed["error"]
+            }
+        
+        result = self.delete_objects(listed["object_names"])
+        result["requests"] += listed["requests"]
+        return result
+    
+    def upload_many(
+        self,
+        items: Sequence[Tuple[str, bytes]],
+        max_concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Upload several objects in parallel
+        
+        Args:
+            items: (object name, bytes) pairs
+            max_concurrency: Uploads in flight at once (default: pool_size)
+            
+        Returns:
+            One upload_bytes result per item, in order
+        """
+        if not items:
+            return []
+        workers = min(max_concurrency or self.pool_size, len(items))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="oss-upload") as executor:
+            return list(executor.map(lambda item: self.upload_bytes(item[1], item[0]), items))
+    
+    async def _run_async(self, func, *args, **kwargs):
+        """Run a blocking method on the storage thread pool"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="oss")
+            executor = self._executor
+        
+        # Keep the caller's trace ID in the log records of the worker thread
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(context.run, func, *args, **kwargs))
+    
+    async def upload_file_async(self, local_file_path: str, object_name: Optional[str] = None) -> Dict[str, Any]:
+        """Awaitable upload_file"""
+        return await self._run_async(self.upload_file, local_file_path, object_name)
+    
+    async def upload_bytes_async(self, data: bytes, object_name: str) -> Dict[str, Any]:
+        """Awaitable upload_bytes"""
+        return await self._run_async(self.upload_bytes, data, object_name)
+    
+    async def upload_bytes_dedup_async(
+        self,
+        data: bytes,
+        prefix: str,
+        extension: str,
+        check_exists: bool = True
+    ) -> Dict[str, Any]:
+        """Awaitable upload_bytes_dedup"""
+        return await self._run_async(self.upload_bytes_dedup, data, prefix, extension, check_exists)
+    
+    async def download_file_async(self, object_name: str, local_file_path: str) -> Dict[str, Any]:
+        """Awaitable download_file"""
+        return await self._run_async(self.download_file, object_name, local_file_path)
+    
+    async def delete_object_async(self, object_name: str) -> Dict[str, Any]:
+        """Awaitable delete_object"""
+        return await self._run_async(self.delete_object, object_name)
+    
+    async def list_objects_async(self, prefix: str) -> Dict[str, Any]:
+        """Awaitable list_objects"""
+        return await self._run_async(self.list_objects, prefix)
+    
+    async def delete_objects_async(self, object_names: Sequence[str]) -> Dict[str, Any]:
+        """Awaitable delete_objects"""
+        return await self._run_async(self.delete_objects, object_names)
+    
+    async def delete_prefix_async(self, prefix: str) -> Dict[str, Any]:
+        """Awaitable delete_prefix"""
+        return await self._run_async(self.delete_prefix, prefix)
+    
+    async def upload_many_async(
+        self,
+        items: Sequence[Tuple[str, bytes]],
+        max_concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Upload several objects in parallel without blocking the event loop
+        
+        Args:
+            items: (object name, bytes) pairs
+            max_concurrency: Uploads in flight at once (default: pool_size)
+            
+        Returns:
+            One upload_bytes result per item, in order
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.pool_size)
+        
+        async def upload(object_name: str, data: bytes) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.upload_bytes_async(data, object_name)
+        
+        return await asyncio.gather(*(upload(object_name, data) for object_name, data in items))
+    
+    def close(self):
+        """Stop the thread pool of the *_async methods and close pooled connections"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+        self.session.session.close()
@@ -0,0 +1,158 @@
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+# CJK ideographs, kana and full-width punctuation, roughly one token each
+_CJK = re.compile(r'[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+
+# Per-message overhead of the chat format (role, separators), in tokens
+_MESSAGE_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate that needs no tokenizer
+
+    Counts one token per CJK character and one per four other characters,
+    which is close enough for budgeting Chinese/English chat history.
+
+    Args:
+        text: Message text
+
+    Returns:
+        Estimated token count
+    """
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def extractive_summary(summary: str, dropped: List[Dict[str, str]], max_chars: int) -> str:
+    """
+    Default summarizer: append the dropped turns, shortened, to the summary
+
+    Each dropped message is cut to its first sentence and the oldest part
+    of the summary is discarded once it exceeds max_chars.
+
+    Args:
+        summary: Summary of the turns dropped earlier ("" if none)
+        dropped: Messages leaving the history window, oldest first
+        max_chars: Size limit of the summary
+
+    Returns:
+        The new summary
+    """
+    lines = [summary] if summary else []
+    for message in dropped:
+        first_sentence = re.split(r'(?<=[。！？!?.])', message["content"].strip(), maxsplit=1)[0]
+        lines.append(f"{message['role']}: {first_sentence[:120]}")
+    text = "\n".join(lines)
+    return text[-max_chars:] if len(text) > max_chars else text
+
+
+class HistoryPolicy:
+    """
+    Decides which part of a session's history is kept and sent to Link AI
+
+    The window ends at the latest message and reaches back as far as the
+    turn limit and the character/token budgets allow, always starting at a
+    user message. Messages that leave the window are discarded, or folded
+    into a running summary that is sent as a system message in front of
+    the window.
+    """
+    def __init__(
+        self,
+        max_turns: Optional[int] = 20,
+        max_chars: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        summarize: bool = False,
+        summary_max_chars: int = 1000,
+        summarizer: Optional[Callable[[str, List[Dict[str, str]], int], str]] = None
+    ):
+        """
+        Initialize the policy
+
+        Args:
+            max_turns: Most user turns (with their replies) kept, None for no limit
+            max_chars: Character budget of the kept messages, None for no limit
+            max_tokens: Estimated token budget of the kept messages, None for no limit
+            summarize: Fold dropped messages into a summary instead of
+                discarding them
+            summary_max_chars: Size limit of the summary
+            summarizer: Function (summary, dropped messages, max_chars) ->
+                new summary; defaults to extractive_summary
+        """
+        self.max_turns = max_turns
+        self.max_chars = max_chars
+        self.max_tokens = max_tokens
+        self.summarize = summarize
+        self.summary_max_chars = summary_max_chars
+        self.summarizer = summarizer or extractive_summary
+
+    def window_start(self, messages: List[Dict[str, str]]) -> int:
+        """
+        Index of the first message inside the window
+
+        Args:
+            messages: Session history, oldest first
+
+        Returns:
+            Index into messages; the latest message is always kept
+        """
+        turns = chars = tokens = 0
+        start = len(messages)
+
+        for index in range(len(messages) - 1, -1, -1):
+            message = messages[index]
+            content = message["content"]
+            turns += message["role"] == "user"
+            chars += len(content)
+            tokens += estimate_tokens(content) + _MESSAGE_TOKENS
+
+            over_budget = (
+                (self.max_turns is not None and turns > self.max_turns)
+                or (self.max_chars is not None and chars > self.max_chars)
+                or (self.max_tokens is not None and tokens > self.max_tokens)
+            )
+            if over_budget and start < len(messages):
+                break
+            start = index
+
+        # Don't open the window with a reply whose question was dropped
+        while start < len(messages) - 1 and messages[start]["role"] != "user":
+            start += 1
+        return start
+
+    def compact(self, messages: List[Dict[str, str]], summary: str) -> Tuple[List[Dict[str, str]], str]:
+        """
+        Drop the messages outside the window
+
+        Args:
+            messages: Session history, oldest first
+            summary: Current summary of earlier turns
+
+        Returns:
+            (kept messages, new summary)
+        """
+        start = self.window_start(messages)
+        if start == 0:
+            return messages, summary
+
+        dropped, kept = messages[:start], messages[start:]
+        if self.summarize:
+            summary = self.summarizer(summary, dropped, self.summary_max_chars)
+        return kept, summary
+
+    def payload(self, messages: List[Dict[str, str]], summary: str) -> List[Dict[str, str]]:
+        """
+        Build the messages to send to Link AI
+
+        Args:
+            messages: Session history, oldest first
+            summary: Summary of earlier turns
+
+        Returns:
+            Chat messages, with the summary as a leading system message
+        """
+        window = messages[self.window_start(messages):]
+        if not summary:
+            return window
+        return [{"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}] + window
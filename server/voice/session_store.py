@@ -0,0 +1,296 @@
+import os
+import json
+import time
+import sqlite3
+import contextlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def new_session() -> Dict[str, Any]:
+    """Record of a session that has no history yet"""
+    return {"messages": [], "summary": ""}
+
+
+def _copy(session: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a record that callers can modify without touching the store"""
+    return dict(session, messages=[dict(message) for message in session["messages"]])
+
+
+class SessionStore:
+    """
+    Storage interface for dialogue sessions, keyed by session_id
+
+    A session record is a dict with the message history ("messages") and
+    the summary of turns that left the history window ("summary").
+    """
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get a session, or None if it doesn't exist or has expired"""
+        raise NotImplementedError
+
+    def put(self, session_id: str, session: Dict[str, Any]):
+        """Insert or replace a session"""
+        raise NotImplementedError
+
+    def update(self, session_id: str, func: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Atomically read, modify and write a session
+
+        Args:
+            session_id: Session ID
+            func: Takes the current record (a new one if the session doesn't
+                exist) and returns the record to store
+
+        Returns:
+            The stored record
+        """
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> bool:
+        """Delete a session, returning whether it existed"""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        """Counters such as live sessions and evictions"""
+        return {"live_sessions": len(self)}
+
+    def close(self):
+        """Release any resources held by the store"""
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Process-local store with LRU eviction, idle expiry and a memory cap
+
+    Sessions idle for longer than the TTL expire, and the least recently
+    used sessions are evicted once either the session count or the
+    (approximate) size of all stored history exceeds its limit.
+    """
+    def __init__(
+        self,
+        max_sessions: int = 10000,
+        ttl: Optional[float] = 3600.0,
+        max_bytes: int = 64 * 1024 * 1024
+    ):
+        """
+        Initialize the store
+
+        Args:
+            max_sessions: Most sessions kept
+            ttl: Seconds a session may stay idle, None to never expire
+            max_bytes: Size limit of all stored history
+        """
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        # session_id -> (record, size, last access), least recently used first
+        self._sessions: "OrderedDict[str, Tuple[Dict[str, Any], int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "expired": 0,
+            "evicted_lru": 0,
+            "evicted_memory": 0
+        }
+
+    @staticmethod
+    def _size(session: Dict[str, Any]) -> int:
+        """Approximate memory held by a record"""
+        return len(session["summary"]) + sum(len(m["content"]) + 64 for m in session["messages"])
+
+    def _get_live(self, session_id: str, now: float) -> Optional[Dict[str, Any]]:
+        """Look up a session, dropping it if it has expired; call with the lock held"""
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        session, _, accessed = entry
+        if self.ttl is not None and now - accessed > self.ttl:
+            self._remove(session_id)
+            self._stats["expired"] += 1
+            return None
+        return session
+
+    def _remove(self, session_id: str):
+        _, size, _ = self._sessions.pop(session_id)
+        self._bytes -= size
+
+    def _store(self, session_id: str, session: Dict[str, Any], now: float):
+        """Write a record and evict what no longer fits; call with the lock held"""
+        if session_id in self._sessions:
+            self._remove(session_id)
+        size = self._size(session)
+        self._sessions[session_id] = (session, size, now)
+        self._bytes += size
+
+        # Expired sessions sit at the old end, so sweep from there first
+        while self._sessions and self.ttl is not None:
+            oldest_id, (_, _, accessed) = next(iter(self._sessions.items()))
+            if now - accessed <= self.ttl:
+                break
+            self._remove(oldest_id)
+            self._stats["expired"] += 1
+
+        while len(self._sessions) > self.max_sessions:
+            self._remove(next(iter(self._sessions)))
+            self._stats["evicted_lru"] += 1
+
+        while self._bytes > self.max_bytes and len(self._sessions) > 1:
+            self._remove(next(iter(self._sessions)))
+            self._stats["evicted_memory"] += 1
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            session = self._get_live(session_id, now)
+            if session is None:
+                return None
+            self._sessions[session_id] = self._sessions[session_id][:2] + (now,)
+            self._sessions.move_to_end(session_id)
+            return _copy(session)
+
+    def put(self, session_id: str, session: Dict[str, Any]):
+        with self._lock:
+            self._store(session_id, _copy(session), time.monotonic())
+
+    def update(self, session_id: str, func: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            session = self._get_live(session_id, now)
+            session = func(_copy(session) if session is not None else new_session())
+            self._store(session_id, session, now)
+            return _copy(session)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            if session_id not in self._sessions:
+                return False
+            self._remove(session_id)
+            return True
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, live_sessions=len(self._sessions), bytes=self._bytes)
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    Persistent store backed by SQLite, shared by all worker processes
+
+    Sessions survive restarts and every uvicorn worker on the host sees
+    the same history. Updates run in BEGIN IMMEDIATE transactions so two
+    workers can't interleave a read-modify-write. Sessions idle for longer
+    than the TTL are treated as missing and purged periodically.
+    """
+    def __init__(self, db_path: str, ttl: Optional[float] = 3600.0, purge_every: int = 1000):
+        """
+        Open (and create if needed) the database
+
+        Args:
+            db_path: Path to the SQLite database file
+            ttl: Seconds a session may stay idle, None to never expire
+            purge_every: Writes between two purges of expired sessions
+        """
+        self.db_path = db_path
+        self.ttl = ttl
+        self.purge_every = purge_every
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._expired = 0
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL"
+            ")"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+
+    def _cutoff(self) -> float:
+        # Wall-clock time, since the database is shared between processes
+        return time.time() - self.ttl if self.ttl is not None else float("-inf")
+
+    def _read(self, session_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT data FROM sessions WHERE session_id = ? AND updated_at >= ?",
+            (session_id, self._cutoff())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, session_id: str, session: Dict[str, Any]):
+        self._conn.execute(
+            "INSERT INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            (session_id, json.dumps(session, ensure_ascii=False), time.time())
+        )
+        self._writes += 1
+
+    def _maybe_purge(self):
+        """Delete expired sessions every purge_every writes; call with the lock held"""
+        if self.ttl is None or self._writes < self.purge_every:
+            return
+        self._writes = 0
+        with self._transaction():
+            cursor = self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (self._cutoff(),))
+        self._expired += cursor.rowcount
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._read(session_id)
+
+    def put(self, session_id: str, session: Dict[str, Any]):
+        with self._lock:
+            with self._transaction():
+                self._write(session_id, session)
+            self._maybe_purge()
+
+    def update(self, session_id: str, func: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        with self._lock:
+            with self._transaction():
+                session = func(self._read(session_id) or new_session())
+                self._write(session_id, session)
+            self._maybe_purge()
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            with self._transaction():
+                cursor = self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        return cursor.rowcount > 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM sessions WHERE updated_at >= ?", (self._cutoff(),)
+            ).fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {"live_sessions": len(self), "expired": self._expired}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Run the enclosed statements atomically, see SqliteVoiceStore._transaction"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
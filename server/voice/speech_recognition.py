@@ -1,21 +1,86 @@
-import os
-import speech_recognition as sr
-from typing import Dict, Any, Optional
-import tempfile
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Any, BinaryIO, List, Optional, Union
+
+from .asr_backends import AsrBackend, BackendLatency, audio_duration, create_backend
+from .vad import VoiceActivityDetector
+
+# Imported where needed so loading the package doesn't pull in the SDK
+if TYPE_CHECKING:
+    import speech_recognition as sr
+
+# Error of a result whose audio contained no recognizable speech
+NO_SPEECH_ERROR = "Speech could not be understood"
 
 class SpeechRecognizer:
     """
     Handles speech recognition to convert audio to text
     """
-    def __init__(self, language: str = "zh-CN"):
+    def __init__(
+        self,
+        language: str = "zh-CN",
+        backend: Union[str, AsrBackend] = "google",
+        backend_options: Optional[Dict[str, Any]] = None,
+        short_backend: Union[str, AsrBackend, None] = None,
+        short_backend_options: Optional[Dict[str, Any]] = None,
+        short_utterance_seconds: float = 3.0,
+        chunk_seconds: float = 15.0,
+        chunk_workers: int = 4,
+        vad: Optional[VoiceActivityDetector] = None
+    ):
         """
         Initialize the speech recognizer
         
         Args:
             language: Language code for recognition
+            backend: Registered ASR backend name (see asr_backends) or instance
+            backend_options: Keyword arguments of the backend
+            short_backend: Optional backend for utterances no longer than
+                short_utterance_seconds, e.g. a local engine
+            short_backend_options: Keyword arguments of the short backend
+            short_utterance_seconds: Duration limit of a short utterance
+            chunk_seconds: Longest chunk recognize_chunked sends at once
+            chunk_workers: Chunks recognize_chunked recognizes concurrently
+            vad: Detector that finds the pauses to split chunks at, so the
+                caller's speech threshold applies (default settings if None)
         """
+        import speech_recognition as sr
+        
         self.recognizer = sr.Recognizer()
         self.language = language
+        self.backend = self._make_backend(backend, backend_options)
+        self.short_backend = self._make_backend(short_backend, short_backend_options) if short_backend else None
+        self.short_utterance_seconds = short_utterance_seconds
+        
+        # Backend name -> latency counters
+        self.latency: Dict[str, BackendLatency] = {}
+        
+        self.chunk_seconds = chunk_seconds
+        self.chunk_workers = chunk_workers
+        self.splitter = vad or VoiceActivityDetector()
+        self._chunk_executor = ThreadPoolExecutor(max_workers=chunk_workers, thread_name_prefix="asr-chunk")
+    
+    def close(self):
+        """
+        Shut down the thread pool of recognize_chunked
+        """
+        self._chunk_executor.shutdown(wait=False)
+    
+    @staticmethod
+    def _make_backend(backend: Union[str, AsrBackend], options: Optional[Dict[str, Any]]) -> AsrBackend:
+        if isinstance(backend, AsrBackend):
+            return backend
+        return create_backend(backend, **(options or {}))
+    
+    def backend_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get latency counters per backend
+        
+        Returns:
+            Dictionary mapping backend names to BackendLatency snapshots
+        """
+        return {name: latency.snapshot() for name, latency in self.latency.items()}
     
     def recognize_from_file(self, audio_file_path: str) -> Dict[str, Any]:
         """
@@ -27,14 +92,103 @@ class SpeechRecognizer:
         Returns:
             Dictionary with recognition results
         """
+        return self._recognize(audio_file_path)
+    
+    def recognize_from_bytes(
+        self,
+        audio_bytes: Union[bytes, bytearray, memoryview, BinaryIO],
+        file_format: str = "wav"
+    ) -> Dict[str, Any]:
+        """
+        Recognize speech from audio bytes without touching the disk
+        
+        Args:
+            audio_bytes: Audio data as bytes, a buffer, or a readable
+                binary file-like object
+            file_format: Format of the audio (wav, aiff or flac)
+            
+        Returns:
+            Dictionary with recognition results
+        """
+        if isinstance(audio_bytes, (bytes, bytearray, memoryview)):
+            audio_bytes = io.BytesIO(audio_bytes)
+        return self._recognize(audio_bytes)
+    
+    def split_chunks(self, audio_bytes: bytes) -> List[bytes]:
+        """
+        Split WAV audio at pauses into chunks of at most chunk_seconds
+        
+        Args:
+            audio_bytes: WAV audio data
+            
+        Returns:
+            WAV chunks in order (the input itself if it is short enough)
+        """
+        return self.splitter.split(audio_bytes, max_chunk_seconds=self.chunk_seconds)
+    
+    def join_transcripts(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Stitch per-chunk recognition results back into one result
+        
+        Chunks without speech are skipped. The result fails if every chunk
+        failed, or if the recognition service failed on any chunk.
+        
+        Args:
+            results: Results of the chunks, in order
+            
+        Returns:
+            Dictionary with recognition results, shaped like recognize_from_bytes
+        """
+        texts = [result["text"] for result in results if result["success"] and result["text"]]
+        service_errors = [
+            result for result in results
+            if not result["success"] and result.get("error") != NO_SPEECH_ERROR
+        ]
+        
+        if service_errors:
+            return service_errors[0]
+        if not texts:
+            return {
+                "text": "",
+                "success": False,
+                "error": NO_SPEECH_ERROR
+            }
+        
+        # Chinese is written without spaces between words
+        separator = "" if self.language.startswith(("zh", "ja")) else " "
+        return {
+            "text": separator.join(texts),
+            "success": True
+        }
+    
+    def recognize_chunked(self, audio_bytes: bytes) -> Dict[str, Any]:
+        """
+        Recognize long audio as chunks split at pauses, several at a time
+        
+        Args:
+            audio_bytes: WAV audio data
+            
+        Returns:
+            Dictionary with recognition results, shaped like recognize_from_bytes
+        """
+        chunks = self.split_chunks(audio_bytes)
+        if len(chunks) == 1:
+            return self.recognize_from_bytes(chunks[0])
+        
+        results = list(self._chunk_executor.map(self.recognize_from_bytes, chunks))
+        return self.join_transcripts(results)
+    
+    def _recognize(self, source_audio: Union[str, BinaryIO]) -> Dict[str, Any]:
+        """
+        Recognize speech from a path or file-like object accepted by sr.AudioFile
+        """
+        import speech_recognition as sr
+        
         try:
-            with sr.AudioFile(audio_file_path) as source:
+            with sr.AudioFile(source_audio) as source:
                 audio_data = self.recognizer.record(source)
-                
-            text = self.recognizer.recognize_google(
-                audio_data,
-                language=self.language
-            )
+            
+            text = self._run_backend(audio_data)
             
             return {
                 "text": text,
@@ -44,7 +198,7 @@ class SpeechRecognizer:
             return {
                 "text": "",
                 "success": False,
-                "error": "Speech could not be understood"
+                "error": NO_SPEECH_ERROR
             }
         except sr.RequestError as e:
             return {
@@ -59,27 +213,28 @@ class SpeechRecognizer:
                 "error": f"Error recognizing speech: {e}"
             }
     
-    def recognize_from_bytes(self, audio_bytes: bytes, file_format: str = "wav") -> Dict[str, Any]:
-        """
-        Recognize speech from audio bytes
+    def _run_backend(self, audio_data: "sr.AudioData") -> str:
+        """Transcribe with the backend chosen for this utterance, recording its latency"""
+        import speech_recognition as sr
         
-        Args:
-            audio_bytes: Audio data as bytes
-            file_format: Format of the audio (wav, mp3, etc.)
-            
-        Returns:
-            Dictionary with recognition results
-        """
-        # Create a temporary file to save the audio bytes
-        with tempfile.NamedTemporaryFile(suffix=f".{file_format}", delete=False) as temp_file:
-            temp_file_path = temp_file.name
-            temp_file.write(audio_bytes)
+        duration = audio_duration(audio_data)
+        backend = self.backend
+        if self.short_backend is not None and duration <= self.short_utterance_seconds:
+            backend = self.short_backend
         
+        latency = self.latency.get(backend.name)
+        if latency is None:
+            latency = self.latency.setdefault(backend.name, BackendLatency())
+        
+        start = time.perf_counter()
+        failed = True
         try:
-            # Recognize from the temporary file
-            result = self.recognize_from_file(temp_file_path)
-            return result
+            text = backend.recognize(self.recognizer, audio_data, self.language)
+            failed = False
+            return text
+        except sr.UnknownValueError:
+            # No speech is a valid answer, not an engine failure
+            failed = False
+            raise
         finally:
-            # Clean up the temporary file
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path) 
\ No newline at end of file
+            latency.record(time.perf_counter() - start, duration, error=failed)
@@ -1,19 +1,88 @@
 import os
-from dashscope.audio.tts_v2 import SpeechSynthesizer
-from typing import Optional, Dict, Any
+import time
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Callable, Dict, Any, Iterable, Iterator, List, Sequence, Set, Tuple
+
+from .admission import RateLimiter
+from .audio_cache import AudioCache
+from .synthesizer_pool import SynthesizerPool, audio_format
+
+# Defaults of TextToSpeech.synthesize, applied to synthesize_batch jobs
+SYNTHESIS_DEFAULTS = {
+    "model": "cosyvoice-v2",
+    "output_format": "mp3",
+    "sample_rate": 24000,
+    "speech_speed": 1.0,
+    "volume": 100
+}
+
+# DashScope error codes worth retrying
+TRANSIENT_ERROR_CODES = ("Throttling", "ServiceUnavailable", "InternalError", "RequestTimeOut")
+
+
+def _is_throttled(error: Exception) -> bool:
+    """Whether DashScope rejected a call for exceeding a rate limit"""
+    return getattr(error, "http_code", None) == 429 or str(getattr(error, "name", "") or "").startswith("Throttling")
+
+
+def _is_transient(error: Exception) -> bool:
+    """Whether a failed synthesis may succeed when retried"""
+    from websocket import WebSocketException
+    
+    if isinstance(error, (TimeoutError, ConnectionError, WebSocketException)):
+        return True
+    if getattr(error, "http_code", None) in (429, 500, 502, 503, 504):
+        return True
+    return str(getattr(error, "name", "") or "").startswith(TRANSIENT_ERROR_CODES)
+
+
+def _forward_audio(synthesizer: Any, on_audio: Callable[[bytes], None]):
+    """
+    Hand every audio frame a synthesizer receives to on_audio
+
+    The callback is set after the synthesizer was created or prepared
+    without one, so call() still blocks and returns the whole audio; the
+    SDK passes each frame to the callback's on_data as it arrives.
+    """
+    from dashscope.audio.tts_v2 import ResultCallback
+    
+    class Forward(ResultCallback):
+        def on_data(self, data: bytes) -> None:
+            on_audio(bytes(data))
+    
+    synthesizer.callback = Forward()
+
 
 class TextToSpeech:
     """
     Handles text-to-speech synthesis using DashScope API
     """
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        cache: Optional[AudioCache] = None,
+        pool_size: int = 16,
+        pool_idle_timeout: float = 30.0
+    ):
         """
         Initialize the TTS module
         
         Args:
             api_key: DashScope API key
+            cache: Cache for synthesized audio (None disables caching)
+            pool_size: Idle synthesizers (websocket connections) kept open
+                for reuse; 0 connects anew for every utterance
+            pool_idle_timeout: Seconds an idle synthesizer stays reusable
         """
         os.environ['DASHSCOPE_API_KEY'] = api_key
+        self.cache = cache
+        self.pool = SynthesizerPool(
+            max_size=pool_size,
+            max_idle_per_key=pool_size,
+            idle_timeout=pool_idle_timeout
+        ) if pool_size > 0 else None
     
     def synthesize(
         self,
@@ -24,6 +93,8 @@ class TextToSpeech:
         sample_rate: int = 24000,
         speech_speed: float = 1.0,
         volume: int = 100,
+        bit_rate: Optional[int] = None,
+        on_audio: Optional[Callable[[bytes], None]] = None
     ) -> Dict[str, Any]:
         """
         Synthesize speech from text
@@ -32,47 +103,318 @@ class TextToSpeech:
             text: Text to synthesize
             voice_id: Voice ID to use
             model: Model to use (cosyvoice-v1 or cosyvoice-v2)
-            output_format: Output format (mp3, wav, etc.)
+            output_format: Output format (mp3, wav, pcm or opus)
             sample_rate: Sample rate in Hz
             speech_speed: Speech speed factor (0.5 to 2.0)
             volume: Volume (0 to 100)
+            bit_rate: Bit rate in kbps for formats that offer a choice
+                (opus: 16, 32 or 64), None for DashScope's default
+            on_audio: Called with every chunk of audio as DashScope streams
+                it (once with the whole audio on a cache hit), from the
+                synthesizing thread
             
         Returns:
-            Dictionary with 'audio' (binary) and 'request_id' keys
+            Dictionary with 'audio' (binary), 'request_id' and 'cached' keys;
+            'request_id' is None when the audio came from the cache
         """
-        try:
-            # Create synthesizer
-            synthesizer = SpeechSynthesizer(
+        cache_key = None
+        if self.cache is not None:
+            params = {}
+            if bit_rate is not None:
+                # Only keyed when set, so audio cached before keeps its key
+                params["bit_rate"] = bit_rate
+            cache_key = AudioCache.make_key(
+                text=text,
+                voice_id=voice_id,
                 model=model,
-                voice=voice_id,
-                format=output_format,
-                sample_rate=sample_rate
+                output_format=output_format,
+                sample_rate=sample_rate,
+                speech_speed=speech_speed,
+                volume=volume,
+                **params
             )
-            
-            # Set parameters
-            synthesizer.set_tts_params(
-                speed=speech_speed,
-                volume=volume
+            # Taken first, so audio of a voice changed meanwhile isn't cached
+            generation = self.cache.generation(voice_id)
+            audio = self.cache.get(cache_key)
+            if audio is not None:
+                if on_audio is not None:
+                    on_audio(audio)
+                return {
+                    "audio": audio,
+                    "request_id": None,
+                    "cached": True,
+                    "success": True
+                }
+        
+        try:
+            audio, request_id = self._call_synthesizer(
+                text=text,
+                voice_id=voice_id,
+                model=model,
+                output_format=output_format,
+                sample_rate=sample_rate,
+                speech_speed=speech_speed,
+                volume=volume,
+                bit_rate=bit_rate,
+                on_audio=on_audio
             )
             
-            # Call the API to synthesize speech
-            audio = synthesizer.call(text)
+            if cache_key is not None and audio:
+                self.cache.put(cache_key, audio, voice_id, generation)
             
             return {
                 "audio": audio,
-                "request_id": synthesizer.get_last_request_id(),
+                "request_id": request_id,
+                "cached": False,
                 "success": True
             }
         except Exception as e:
             error_message = str(e)
-            print(f"Error synthesizing speech: {error_message}")
+            logging.error(f"Error synthesizing speech: {error_message}")
             return {
                 "audio": None,
                 "request_id": None,
                 "success": False,
-                "error": error_message
+                "error": error_message,
+                "error_type": type(e).__name__
             }
     
+    def _call_synthesizer(
+        self,
+        text: str,
+        voice_id: str,
+        model: str,
+        output_format: str,
+        sample_rate: int,
+        speech_speed: float,
+        volume: int,
+        bit_rate: Optional[int] = None,
+        on_audio: Optional[Callable[[bytes], None]] = None
+    ) -> Tuple[bytes, Optional[str]]:
+        """Synthesize on a pooled or one-off synthesizer, raising on failure"""
+        if self.pool is not None:
+            with self.pool.synthesizer(
+                model=model,
+                voice_id=voice_id,
+                output_format=output_format,
+                sample_rate=sample_rate,
+                speech_speed=speech_speed,
+                volume=volume,
+                bit_rate=bit_rate
+            ) as synthesizer:
+                if on_audio is not None:
+                    _forward_audio(synthesizer, on_audio)
+                audio = synthesizer.call(text)
+            return audio, synthesizer.get_last_request_id()
+        
+        # dashscope takes a while to import, so load it on first synthesis
+        from dashscope.audio.tts_v2 import SpeechSynthesizer
+        
+        # A one-off synthesizer connects for this call and closes afterwards
+        synthesizer = SpeechSynthesizer(
+            model=model,
+            voice=voice_id,
+            format=audio_format(output_format, sample_rate, bit_rate),
+            volume=volume,
+            speech_rate=speech_speed
+        )
+        if on_audio is not None:
+            _forward_audio(synthesizer, on_audio)
+        audio = synthesizer.call(text)
+        return audio, synthesizer.get_last_request_id()
+    
+    def synthesize_batch(
+        self,
+        jobs: Iterable[Sequence[Any]],
+        max_concurrency: int = 4,
+        rate_limit: Optional[float] = None,
+        max_retries: int = 3,
+        retry_base_delay: float = 0.5,
+        retry_max_delay: float = 8.0,
+        flush_size: int = 32,
+        storage: Optional[Any] = None,
+        object_prefix: str = "tts",
+        return_audio: bool = False
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Synthesize many jobs, yielding the results as they complete
+        
+        Meant for pre-rendering a library of phrases into a voice. Jobs run
+        on max_concurrency threads, at most rate_limit of them start per
+        second, and transient failures (timeouts, dropped connections,
+        throttling, 5xx) are retried with exponential backoff and full
+        jitter; a throttled job also holds back the other threads. Jobs
+        already in the cache are not synthesized again.
+        
+        New audio is written to the cache's disk tier in bulk, every
+        flush_size results. With storage set it is also uploaded in bulk to
+        {object_prefix}/{cache key}.{format}, skipping objects a previous run
+        already uploaded; results are then yielded once their upload is
+        done. Breaking off the iteration cancels the jobs
+        that haven't started.
+        
+        Args:
+            jobs: (text, voice_id) or (text, voice_id, params) sequences,
+                where params holds keyword arguments of synthesize
+            max_concurrency: Jobs synthesized at once
+            rate_limit: Jobs started per second, None for no limit
+            max_retries: Retries of a job after a transient failure
+            retry_base_delay: Upper bound of the first retry delay in seconds
+            retry_max_delay: Upper bound of any retry delay in seconds
+            flush_size: Results written to the cache and storage at once
+            storage: OssStorage to upload the audio to
+            object_prefix: Object name prefix in the storage
+            return_audio: Include the audio bytes in the results
+            
+        Yields:
+            One dictionary per job with 'index' (position in jobs), 'text',
+            'voice_id', 'success', 'cached', 'attempts', 'latency' (seconds
+            spent on the job, including rate limit waits and retries) and
+            'error' on failure, plus 'audio' if
+            return_audio is set and 'object_name', 'url' and 'stored' when
+            uploading
+        """
+        limiter = RateLimiter(rate_limit)
+        retry = (max_retries, retry_base_delay, retry_max_delay)
+        pending: List[Tuple[Dict[str, Any], bytes, Dict[str, Any]]] = []
+        
+        # One listing tells which objects a previous run already uploaded
+        existing: Set[str] = set()
+        if storage is not None:
+            listed = storage.list_objects(f"{object_prefix.rstrip('/')}/")
+            existing = set(listed["object_names"]) if listed["success"] else set()
+        
+        def flush() -> List[Dict[str, Any]]:
+            if not pending:
+                return []
+            if self.cache is not None:
+                # Pre-rendered audio goes to disk only; hits promote it to memory
+                self.cache.put_many(
+                    [(job["key"], audio, job["voice_id"], job["generation"])
+                     for job, audio, result in pending if not result["cached"]],
+                    memory=False
+                )
+            if storage is not None:
+                new = [(audio, result) for _, audio, result in pending if result["object_name"] not in existing]
+                uploads = storage.upload_many(
+                    [(result["object_name"], audio) for audio, result in new],
+                    max_concurrency=max_concurrency
+                )
+                for (_, result), upload in zip(new, uploads):
+                    result["stored"] = upload["success"]
+                    result["url"] = upload.get("url")
+                    if not upload["success"]:
+                        result["error"] = upload.get("error")
+                for _, _, result in pending:
+                    if result["object_name"] in existing:
+                        result["stored"] = True
+                        result["url"] = storage.sign_url(result["object_name"])
+            results = [result for _, _, result in pending]
+            pending.clear()
+            return results
+        
+        def finish(job: Dict[str, Any], result: Dict[str, Any], audio: Optional[bytes]) -> List[Dict[str, Any]]:
+            """Queue a result for the bulk write, returning the results ready to yield"""
+            result.update(index=job["index"], text=job["text"], voice_id=job["voice_id"])
+            if return_audio:
+                result["audio"] = audio
+            if storage is not None and result["success"]:
+                result["object_name"] = f"{object_prefix.rstrip('/')}/{job['key']}.{job['params']['output_format']}"
+            
+            if not result["success"] or (result["cached"] and storage is None):
+                return [result]
+            pending.append((job, audio, result))
+            ready = [] if storage is not None else [result]
+            if len(pending) >= flush_size:
+                flushed = flush()
+                ready = flushed if storage is not None else ready
+            return ready
+        
+        executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="tts-batch")
+        try:
+            futures = {}
+            need_audio = return_audio or storage is not None
+            for index, job in enumerate(jobs):
+                job = self._batch_job(index, job)
+                job["generation"] = self.cache.generation(job["voice_id"]) if self.cache is not None else None
+                if self.cache is not None and self.cache.contains(job["key"]):
+                    audio = self.cache.get(job["key"]) if need_audio else None
+                    # The entry may have been evicted since the check
+                    if audio is not None or not need_audio:
+                        result = {"success": True, "cached": True, "attempts": 0, "latency": 0.0}
+                        yield from finish(job, result, audio)
+                        continue
+                futures[executor.submit(self._run_batch_job, job, limiter, retry)] = job
+            
+            for future in as_completed(futures):
+                result, audio = future.result()
+                yield from finish(futures[future], result, audio)
+            flushed = flush()
+            if storage is not None:
+                yield from flushed
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            # Keep whatever was already paid for, even if the caller stopped early
+            flush()
+    
+    @staticmethod
+    def _batch_job(index: int, job: Sequence[Any]) -> Dict[str, Any]:
+        """Normalize a job of synthesize_batch"""
+        text, voice_id = job[0], job[1]
+        params = dict(SYNTHESIS_DEFAULTS, **(job[2] if len(job) > 2 else {}))
+        return {
+            "index": index,
+            "text": text,
+            "voice_id": voice_id,
+            "params": params,
+            "key": AudioCache.make_key(text=text, voice_id=voice_id, **params)
+        }
+    
+    def _run_batch_job(
+        self,
+        job: Dict[str, Any],
+        limiter: RateLimiter,
+        retry: Tuple[int, float, float]
+    ) -> Tuple[Dict[str, Any], Optional[bytes]]:
+        """Synthesize one job of synthesize_batch, retrying transient failures"""
+        max_retries, base_delay, max_delay = retry
+        started = time.perf_counter()
+        attempts = 0
+        while True:
+            attempts += 1
+            limiter.acquire()
+            try:
+                audio, request_id = self._call_synthesizer(job["text"], job["voice_id"], **job["params"])
+                result = {"success": True, "cached": False, "request_id": request_id}
+                break
+            except Exception as e:
+                if attempts > max_retries or not _is_transient(e):
+                    result, audio = {"success": False, "cached": False, "error": str(e)}, None
+                    break
+                # Full jitter keeps retrying threads from hitting the upstream in lockstep
+                delay = random.uniform(0, min(max_delay, base_delay * 2 ** (attempts - 1)))
+                if _is_throttled(e):
+                    limiter.pause(delay)
+                time.sleep(delay)
+        
+        result.update(attempts=attempts, latency=time.perf_counter() - started)
+        return result, audio
+    
+    def invalidate_voice(self, voice_id: str):
+        """
+        Drop cached audio of a voice that was updated or deleted
+        
+        Args:
+            voice_id: Voice ID
+        """
+        if self.cache is not None:
+            self.cache.invalidate_voice(voice_id)
+    
+    def close(self):
+        """Close the pooled synthesizers"""
+        if self.pool is not None:
+            self.pool.close()
+    
     def save_audio(self, audio_data: bytes, file_path: str) -> bool:
         """
         Save audio data to file
@@ -90,5 +432,5 @@ class TextToSpeech:
                 f.write(audio_data)
             return True
         except Exception as e:
-            print(f"Error saving audio file: {e}")
+            logging.error(f"Error saving audio file: {e}")
             return False 
\ No newline at end of file
@@ -0,0 +1,284 @@
+import time
+import logging
+import threading
+import contextlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+PoolKey = Tuple[str, str, str, int, Optional[int]]
+
+
+def audio_format(output_format: str, sample_rate: int, bit_rate: Optional[int] = None):
+    """
+    Look up the DashScope AudioFormat of a format and sample rate
+
+    Args:
+        output_format: Output format (mp3, wav, pcm or opus)
+        sample_rate: Sample rate in Hz
+        bit_rate: Bit rate in kbps (opus only offers a choice), None for
+            the first one DashScope lists
+
+    Returns:
+        The first matching ``dashscope.audio.tts_v2.AudioFormat``
+
+    Raises:
+        ValueError: If DashScope has no such format
+    """
+    from dashscope.audio.tts_v2 import AudioFormat
+
+    for member in AudioFormat:
+        if member.format == output_format and member.sample_rate == sample_rate:
+            if bit_rate is None or member.bit_rate == bit_rate:
+                return member
+    rate = f" and {bit_rate} kbps" if bit_rate is not None else ""
+    raise ValueError(f"Unsupported audio format: {output_format} at {sample_rate} Hz{rate}")
+
+
+class _Idle:
+    def __init__(self, key: PoolKey, synthesizer: Any):
+        self.key = key
+        self.synthesizer = synthesizer
+        self.since = time.monotonic()
+
+
+class SynthesizerPool:
+    """
+    Warm DashScope SpeechSynthesizers, reused across utterances
+
+    Every tts_v2 synthesizer holds its own websocket. A new one connects
+    (and handshakes) on its first call and, by default, closes the socket
+    when the task finishes. The pool keeps synthesizers open after use,
+    keyed by (model, voice, format, sample_rate, bit_rate), so the next utterance
+    with the same settings starts its task on a live connection.
+
+    On checkout a synthesizer is only reused if its socket is still
+    connected and it has been idle for less than idle_timeout (DashScope
+    drops idle connections after about a minute); others are closed and
+    replaced by a new one. At most max_idle_per_key synthesizers per key
+    and max_size in total are kept idle, the least recently used are
+    closed first. A synthesizer whose call failed is never returned.
+
+    Reuse relies on private SpeechSynthesizer methods (the SDK's own object
+    pool uses them too). Should they stop working after an SDK upgrade, the
+    pool falls back to a fresh synthesizer per call instead of failing.
+    """
+    def __init__(
+        self,
+        max_size: int = 16,
+        max_idle_per_key: int = 8,
+        idle_timeout: float = 30.0
+    ):
+        """
+        Initialize the pool
+
+        Args:
+            max_size: Idle synthesizers kept open over all keys
+            max_idle_per_key: Idle synthesizers kept open per key
+            idle_timeout: Seconds a synthesizer may sit idle and still be
+                reused
+        """
+        self.max_size = max_size
+        self.max_idle_per_key = max_idle_per_key
+        self.idle_timeout = idle_timeout
+
+        # id(synthesizer) -> idle entry, least recently returned first
+        self._idle: "OrderedDict[int, _Idle]" = OrderedDict()
+        self._in_use = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "created": 0,
+            "reused": 0,
+            "discarded_unhealthy": 0,
+            "discarded_idle": 0,
+            "discarded_failed": 0,
+            "evicted": 0,
+            "not_reusable": 0
+        }
+
+    @staticmethod
+    def _private(synthesizer: Any, name: str, *args: Any, **kwargs: Any) -> Any:
+        """
+        Call a private SpeechSynthesizer method
+
+        Every use of the SDK's name-mangled internals goes through here;
+        callers treat any exception as "this synthesizer can't be reused".
+        """
+        return getattr(synthesizer, f"_SpeechSynthesizer__{name}")(*args, **kwargs)
+
+    def _is_connected(self, synthesizer: Any) -> bool:
+        try:
+            return bool(self._private(synthesizer, "is_connected"))
+        except Exception:
+            return False
+
+    def _prepare(
+        self,
+        synthesizer: Any,
+        key: PoolKey,
+        format: Any,
+        speech_speed: float,
+        volume: int
+    ) -> Any:
+        """
+        Reset a synthesizer for a new task and keep its socket open afterwards
+
+        Returns:
+            The synthesizer, or a fresh one that closes its socket after the
+            task if the private SDK methods failed; the old one is closed
+        """
+        model, voice_id = key[0], key[1]
+        try:
+            self._private(synthesizer, "reset")
+            self._private(
+                synthesizer,
+                "update_params",
+                model=model,
+                voice=voice_id,
+                format=format,
+                volume=volume,
+                speech_rate=speech_speed,
+                close_ws_after_use=False
+            )
+            return synthesizer
+        except Exception as e:
+            logging.warning(f"Cannot reuse DashScope synthesizer, creating a new one per call: {e}")
+            self._close_all([synthesizer])
+            with self._lock:
+                self._stats["not_reusable"] += 1
+
+        from dashscope.audio.tts_v2 import SpeechSynthesizer
+
+        return SpeechSynthesizer(model=model, voice=voice_id, format=format, volume=volume, speech_rate=speech_speed)
+
+    def _take_idle(self, key: PoolKey) -> Tuple[Any, List[Any]]:
+        """
+        Take the most recently returned healthy synthesizer of a key
+
+        Returns:
+            The synthesizer (None if there is none) and the synthesizers to
+            close because they expired or lost their connection
+        """
+        stale = []
+        now = time.monotonic()
+        with self._lock:
+            # Entries are ordered by return time, so expired ones come first
+            while self._idle:
+                entry = next(iter(self._idle.values()))
+                if now - entry.since < self.idle_timeout:
+                    break
+                self._idle.popitem(last=False)
+                self._stats["discarded_idle"] += 1
+                stale.append(entry.synthesizer)
+
+            for entry_id in reversed(list(self._idle)):
+                entry = self._idle[entry_id]
+                if entry.key != key:
+                    continue
+                del self._idle[entry_id]
+                if self._is_connected(entry.synthesizer):
+                    self._stats["reused"] += 1
+                    return entry.synthesizer, stale
+                self._stats["discarded_unhealthy"] += 1
+                stale.append(entry.synthesizer)
+        return None, stale
+
+    def _return(self, key: PoolKey, synthesizer: Any) -> List[Any]:
+        """Put a synthesizer back, returning the ones to close to stay within bounds"""
+        closed = []
+        with self._lock:
+            if not self._is_connected(synthesizer):
+                self._stats["discarded_unhealthy"] += 1
+                return [synthesizer]
+
+            self._idle[id(synthesizer)] = _Idle(key, synthesizer)
+            same_key = [entry_id for entry_id, entry in self._idle.items() if entry.key == key]
+            for entry_id in same_key[:max(0, len(same_key) - self.max_idle_per_key)]:
+                closed.append(self._idle.pop(entry_id).synthesizer)
+                self._stats["evicted"] += 1
+            while len(self._idle) > self.max_size:
+                closed.append(self._idle.popitem(last=False)[1].synthesizer)
+                self._stats["evicted"] += 1
+        return closed
+
+    @staticmethod
+    def _close_all(synthesizers: List[Any]):
+        for synthesizer in synthesizers:
+            try:
+                synthesizer.close()
+            except Exception as e:
+                logging.debug(f"Error closing synthesizer: {e}")
+
+    @contextlib.contextmanager
+    def synthesizer(
+        self,
+        model: str,
+        voice_id: str,
+        output_format: str,
+        sample_rate: int,
+        speech_speed: float = 1.0,
+        volume: int = 50,
+        bit_rate: Optional[int] = None
+    ) -> Iterator[Any]:
+        """
+        Check out a synthesizer for the duration of the block
+
+        It is returned to the pool when the block exits normally and
+        closed when the block, or preparing it, raises.
+
+        Args:
+            model: Model to use
+            voice_id: Voice ID to use
+            output_format: Output format (mp3, wav, pcm or opus)
+            sample_rate: Sample rate in Hz
+            speech_speed: Speech speed factor (0.5 to 2.0)
+            volume: Volume (0 to 100)
+            bit_rate: Bit rate in kbps, see audio_format
+
+        Raises:
+            ValueError: If DashScope has no such format
+        """
+        from dashscope.audio.tts_v2 import SpeechSynthesizer
+
+        key = (model, voice_id, output_format, sample_rate, bit_rate)
+        format = audio_format(output_format, sample_rate, bit_rate)
+        synthesizer, stale = self._take_idle(key)
+        self._close_all(stale)
+
+        with self._lock:
+            self._in_use += 1
+        try:
+            if synthesizer is None:
+                synthesizer = SpeechSynthesizer(model=model, voice=voice_id, format=format)
+                with self._lock:
+                    self._stats["created"] += 1
+            synthesizer = self._prepare(synthesizer, key, format, speech_speed, volume)
+            yield synthesizer
+        except BaseException:
+            with self._lock:
+                self._stats["discarded_failed"] += 1
+            if synthesizer is not None:
+                self._close_all([synthesizer])
+            raise
+        else:
+            self._close_all(self._return(key, synthesizer))
+        finally:
+            with self._lock:
+                self._in_use -= 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get pool metrics
+
+        Returns:
+            Dictionary with idle and in-use synthesizers and the created,
+            reused, discarded, evicted and not reusable counts
+        """
+        with self._lock:
+            return dict(self._stats, idle=len(self._idle), in_use=self._in_use)
+
+    def close(self):
+        """Close all idle synthesizers"""
+        with self._lock:
+            idle = [entry.synthesizer for entry in self._idle.values()]
+            self._idle.clear()
+        self._close_all(idle)
@@ -0,0 +1,236 @@
+import io
+import time
+import wave
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# NumPy dtype of each PCM sample width; 8-bit WAV is unsigned
+_SAMPLE_DTYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+# Reply audio profiles a client can ask for. DashScope synthesizes each of
+# them directly, so replies never have to be transcoded on this server.
+# bit_rate is in kbps and None where DashScope has a single choice.
+AUDIO_PROFILES = {
+    # Speech-grade Ogg Opus, about 2 KB per second of audio
+    "opus-16k": {
+        "output_format": "opus",
+        "sample_rate": 16000,
+        "bit_rate": 16,
+        "extension": "opus",
+        "content_type": "audio/ogg"
+    },
+    "opus-24k": {
+        "output_format": "opus",
+        "sample_rate": 24000,
+        "bit_rate": 32,
+        "extension": "opus",
+        "content_type": "audio/ogg"
+    },
+    "mp3-16k": {
+        "output_format": "mp3",
+        "sample_rate": 16000,
+        "bit_rate": None,
+        "extension": "mp3",
+        "content_type": "audio/mpeg"
+    },
+    # What replies have always been sent as
+    "mp3": {
+        "output_format": "mp3",
+        "sample_rate": 24000,
+        "bit_rate": None,
+        "extension": "mp3",
+        "content_type": "audio/mpeg"
+    },
+    "wav-16k": {
+        "output_format": "wav",
+        "sample_rate": 16000,
+        "bit_rate": None,
+        "extension": "wav",
+        "content_type": "audio/wav"
+    }
+}
+
+DEFAULT_AUDIO_PROFILE = "mp3"
+
+# Profile picked when a client only names a codec or MIME type
+_CODEC_PROFILES = {
+    "opus": "opus-16k",
+    "ogg": "opus-16k",
+    "audio/ogg": "opus-16k",
+    "audio/opus": "opus-16k",
+    "mp3": "mp3",
+    "mpeg": "mp3",
+    "audio/mpeg": "mp3",
+    "audio/mp3": "mp3",
+    "wav": "wav-16k",
+    "audio/wav": "wav-16k",
+    "audio/x-wav": "wav-16k"
+}
+
+
+def negotiate_format(accept: Optional[str], default: str = DEFAULT_AUDIO_PROFILE) -> Dict[str, Any]:
+    """
+    Pick the reply audio profile for what a client accepts
+
+    Args:
+        accept: Comma-separated profile names, codecs or MIME types in order
+            of preference, optionally weighted like an Accept header
+            ("opus-16k", "opus, mp3;q=0.5", "audio/ogg"); None or "*" for
+            the default
+        default: Profile used when nothing offered is supported
+
+    Returns:
+        Copy of the profile with its 'name' added
+
+    Raises:
+        ValueError: If the default profile does not exist
+    """
+    if default not in AUDIO_PROFILES:
+        raise ValueError(f"Unknown audio profile: {default}")
+
+    offers = []
+    for position, item in enumerate((accept or "").split(",")):
+        name, _, params = item.strip().lower().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            # Highest quality first, ties keep the client's order
+            offers.append((-quality, position, name.strip()))
+
+    for _, _, name in sorted(offers):
+        if name == "*" or name == "audio/*":
+            break
+        profile = name if name in AUDIO_PROFILES else _CODEC_PROFILES.get(name)
+        if profile is not None:
+            return dict(AUDIO_PROFILES[profile], name=profile)
+    return dict(AUDIO_PROFILES[default], name=default)
+
+
+def decode_wav(audio_data: bytes):
+    """
+    Decode a PCM WAV file
+
+    Args:
+        audio_data: WAV file contents
+
+    Returns:
+        Float32 samples in [-1, 1] shaped (frames, channels), the WAV
+        parameters, and the raw PCM frames for re-encoding parts of the file
+
+    Raises:
+        ValueError: If the WAV is compressed or has an unsupported sample width
+        wave.Error: If the data is not a WAV file
+    """
+    with wave.open(io.BytesIO(audio_data), "rb") as wav:
+        params = wav.getparams()
+        frames = wav.readframes(params.nframes)
+
+    dtype = _SAMPLE_DTYPES.get(params.sampwidth)
+    if dtype is None or params.comptype != "NONE":
+        raise ValueError(f"Unsupported WAV sample format: {params.sampwidth} bytes, {params.comptype}")
+
+    samples = np.frombuffer(frames, dtype=dtype).reshape(-1, params.nchannels).astype(np.float32)
+    if dtype is np.uint8:
+        samples -= 128.0
+    samples /= float(2 ** (8 * params.sampwidth - 1))
+    return samples, params, frames
+
+
+def downmix(samples: np.ndarray) -> np.ndarray:
+    """Average (frames, channels) samples into one mono channel"""
+    return samples.mean(axis=1) if samples.ndim == 2 else samples
+
+
+def resample(samples: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """
+    Resample mono audio in the frequency domain
+
+    The spectrum is truncated (or zero-padded) to the new length, which
+    also removes everything above the new Nyquist frequency, so
+    downsampling needs no separate anti-aliasing filter.
+
+    Args:
+        samples: Mono float samples
+        source_rate: Sample rate of the samples in Hz
+        target_rate: Wanted sample rate in Hz
+
+    Returns:
+        Float32 samples at target_rate
+    """
+    if source_rate == target_rate or len(samples) == 0:
+        return samples.astype(np.float32, copy=False)
+
+    length = max(1, round(len(samples) * target_rate / source_rate))
+    spectrum = np.fft.rfft(samples)
+    bins = length // 2 + 1
+    if bins <= len(spectrum):
+        spectrum = spectrum[:bins]
+    else:
+        spectrum = np.concatenate([spectrum, np.zeros(bins - len(spectrum), dtype=spectrum.dtype)])
+    return (np.fft.irfft(spectrum, n=length) * (length / len(samples))).astype(np.float32)
+
+
+def encode_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    """
+    Encode mono float samples as a 16-bit PCM WAV file
+
+    Args:
+        samples: Mono float samples in [-1, 1]
+        sample_rate: Sample rate in Hz
+
+    Returns:
+        WAV file contents
+    """
+    pcm = np.clip(np.round(samples * 32767.0), -32768, 32767).astype("<i2")
+    output = io.BytesIO()
+    with wave.open(output, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return output.getvalue()
+
+
+def normalize_wav(audio_data: bytes, sample_rate: int = 16000) -> Dict[str, Any]:
+    """
+    Convert WAV audio to mono 16-bit PCM at one sample rate
+
+    Voice enrollment and recognition only use mono speech at 16 kHz, so
+    stereo or 44.1/48 kHz recordings are several times larger than they
+    need to be. Audio that isn't PCM WAV, or is already in the target
+    format, is passed through untouched.
+
+    Args:
+        audio_data: Uploaded audio
+        sample_rate: Target sample rate in Hz
+
+    Returns:
+        Dictionary with 'audio', 'converted', 'bytes_in', 'bytes_out',
+        'bytes_saved' and 'elapsed_ms'
+    """
+    start = time.perf_counter()
+    audio = audio_data
+    try:
+        with wave.open(io.BytesIO(audio_data), "rb") as wav:
+            params = wav.getparams()
+        if (params.nchannels, params.sampwidth, params.framerate) != (1, 2, sample_rate):
+            samples, params, _ = decode_wav(audio_data)
+            audio = encode_wav(resample(downmix(samples), params.framerate, sample_rate), sample_rate)
+    except (wave.Error, ValueError, EOFError):
+        pass
+
+    return {
+        "audio": audio,
+        "converted": audio is not audio_data,
+        "bytes_in": len(audio_data),
+        "bytes_out": len(audio),
+        "bytes_saved": len(audio_data) - len(audio),
+        "elapsed_ms": (time.perf_counter() - start) * 1000
+    }
@@ -0,0 +1,141 @@
+import re
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List
+
+# Sentence terminators (full-width Chinese punctuation included), optionally
+# followed by closing quotes/brackets that belong to the same sentence. A
+# half-width period only ends a sentence when followed by whitespace or the
+# end of the text, so decimals such as "3.5" are left intact.
+_SENTENCE_END = re.compile(r'(?:[。！？；!?;…]+|\.(?=\s|$)|\n+)[”’"\'」』）)]*')
+
+
+class SentenceSplitter:
+    """
+    Incrementally splits streamed text into complete sentences
+    """
+    def __init__(self, min_chars: int = 4):
+        """
+        Initialize the splitter
+
+        Args:
+            min_chars: Sentences shorter than this are merged into the next one
+                so that interjections like "嗯。" don't cost a TTS call each
+        """
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Add a chunk of text
+
+        Args:
+            text: Next chunk of the streamed text
+
+        Returns:
+            Sentences completed by this chunk, in order
+        """
+        self._buffer += text
+        sentences = []
+        start = 0
+
+        for match in _SENTENCE_END.finditer(self._buffer):
+            # A terminator at the very end may still grow (closing quotes,
+            # "……") or turn out to be a decimal point, so wait for more text
+            if match.end() == len(self._buffer):
+                break
+            sentence = self._buffer[start:match.end()].strip()
+            if len(sentence) >= self.min_chars:
+                sentences.append(sentence)
+                start = match.end()
+
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """
+        Return whatever text is left once the stream has ended
+
+        Returns:
+            Remaining sentences, in order
+        """
+        sentences = self.feed("")
+        rest = self._buffer.strip()
+        self._buffer = ""
+        if rest:
+            sentences.append(rest)
+        return sentences
+
+
+def split_sentences(text: str, min_chars: int = 4) -> List[str]:
+    """
+    Split text into sentences at sentence-ending punctuation
+
+    Args:
+        text: Text to split
+        min_chars: Minimum sentence length, see SentenceSplitter
+
+    Returns:
+        List of non-empty sentences in their original order
+    """
+    splitter = SentenceSplitter(min_chars=min_chars)
+    return splitter.feed(text) + splitter.flush()
+
+
+class SegmentPipeline:
+    """
+    Renders text segments concurrently and hands the results back in order
+
+    Each submitted segment starts rendering immediately, so segment N+1 is
+    being synthesized while segment N is still being uploaded or consumed.
+    The number of segments in flight is bounded by ``depth``.
+    """
+    def __init__(
+        self,
+        render: Callable[[int, Any], Awaitable[Dict[str, Any]]],
+        depth: int = 2
+    ):
+        """
+        Initialize the pipeline
+
+        Args:
+            render: Coroutine function taking (index, segment) and
+                returning the rendered segment; segments are usually text
+            depth: Maximum number of segments rendered at the same time
+        """
+        self._render = render
+        self.depth = max(1, depth)
+        self._pending: Deque[asyncio.Future] = deque()
+        self._submitted = 0
+
+    @property
+    def full(self) -> bool:
+        """Whether the pipeline has reached its in-flight limit"""
+        return len(self._pending) >= self.depth
+
+    def submit(self, segment: Any):
+        """Start rendering the next segment"""
+        task = asyncio.ensure_future(self._render(self._submitted, segment))
+        self._pending.append(task)
+        self._submitted += 1
+
+    def ready(self) -> List[Dict[str, Any]]:
+        """Pop every finished segment at the head of the queue, in order"""
+        results = []
+        while self._pending and self._pending[0].done():
+            results.append(self._pending.popleft().result())
+        return results
+
+    async def next(self) -> Dict[str, Any]:
+        """Wait for the oldest in-flight segment"""
+        return await self._pending.popleft()
+
+    async def drain(self):
+        """Yield all remaining segments in order"""
+        while self._pending:
+            yield await self.next()
+
+    def cancel(self):
+        """Cancel all segments that have not been handed back yet"""
+        while self._pending:
+            self._pending.popleft().cancel()
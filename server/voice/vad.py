@@ -0,0 +1,201 @@
+import io
+import time
+import wave
+import threading
+from typing import Any, Dict, List
+
+import numpy as np
+
+from .transcode import decode_wav
+
+
+class VoiceActivityDetector:
+    """
+    Energy-based voice activity detection for uploaded WAV audio
+
+    The audio is cut into fixed-length frames and the RMS level of every
+    frame is computed in one vectorized pass. Everything before the first
+    and after the last run of speech frames is trimmed, keeping a little
+    padding so word onsets aren't clipped. Audio that isn't PCM WAV is
+    passed through untouched.
+    """
+    def __init__(
+        self,
+        frame_ms: int = 30,
+        threshold_dbfs: float = -40.0,
+        min_speech_ms: int = 120,
+        padding_ms: int = 200
+    ):
+        """
+        Initialize the detector
+
+        Args:
+            frame_ms: Frame length in milliseconds
+            threshold_dbfs: Frames louder than this (dB relative to full
+                scale) count as speech
+            min_speech_ms: Shortest run of speech frames that counts as
+                speech, so clicks and pops don't
+            padding_ms: Audio kept before the first and after the last
+                speech frame
+        """
+        self.frame_ms = frame_ms
+        self.threshold_dbfs = threshold_dbfs
+        self.min_speech_ms = min_speech_ms
+        self.padding_ms = padding_ms
+
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "silent": 0,
+            "bytes_in": 0,
+            "bytes_saved": 0,
+            "total_ms": 0.0
+        }
+
+    def process(self, audio_data: bytes) -> Dict[str, Any]:
+        """
+        Trim leading and trailing silence
+
+        Args:
+            audio_data: Uploaded audio, normally a PCM WAV file
+
+        Returns:
+            Dictionary with the trimmed "audio", whether it "has_speech",
+            its "duration" and "kept_seconds", the bytes before/after and
+            saved, and "elapsed_ms" spent
+        """
+        start = time.perf_counter()
+        try:
+            result = self._trim(audio_data)
+        except (wave.Error, EOFError, ValueError):
+            # Not a PCM WAV file we can read; leave it to the recognizer
+            result = {"audio": audio_data, "has_speech": True, "duration": None, "kept_seconds": None}
+
+        result["bytes_in"] = len(audio_data)
+        result["bytes_out"] = len(result["audio"])
+        result["bytes_saved"] = result["bytes_in"] - result["bytes_out"]
+        result["elapsed_ms"] = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["silent"] += int(not result["has_speech"])
+            self._stats["bytes_in"] += result["bytes_in"]
+            self._stats["bytes_saved"] += result["bytes_saved"]
+            self._stats["total_ms"] += result["elapsed_ms"]
+        return result
+
+    def _analyze(self, audio_data: bytes) -> Dict[str, Any]:
+        """Decode a PCM WAV file and compute the level of every frame in dBFS"""
+        samples, params, frames = decode_wav(audio_data)
+        channels = params.nchannels
+
+        frame_len = max(1, params.framerate * self.frame_ms // 1000)
+        n_frames = len(samples) // frame_len
+
+        # RMS level of every frame across all channels
+        framed = samples[:n_frames * frame_len].reshape(n_frames, frame_len * channels)
+        rms = np.sqrt(np.mean(np.square(framed), axis=1))
+
+        return {
+            "params": params,
+            "frames": frames,
+            "total": len(samples),
+            "frame_len": frame_len,
+            "level": 20 * np.log10(rms + 1e-10)
+        }
+
+    @staticmethod
+    def _encode(params, frames: bytes, first: int, last: int) -> bytes:
+        """WAV file holding samples [first, last) of the decoded audio"""
+        width = params.sampwidth * params.nchannels
+        output = io.BytesIO()
+        with wave.open(output, "wb") as wav:
+            wav.setnchannels(params.nchannels)
+            wav.setsampwidth(params.sampwidth)
+            wav.setframerate(params.framerate)
+            wav.writeframes(frames[first * width:last * width])
+        return output.getvalue()
+
+    def _trim(self, audio_data: bytes) -> Dict[str, Any]:
+        analysis = self._analyze(audio_data)
+        params, total, frame_len, level = analysis["params"], analysis["total"], analysis["frame_len"], analysis["level"]
+        duration = total / params.framerate
+
+        # Frames that start a run of at least min_speech_ms of speech
+        run = max(1, self.min_speech_ms // self.frame_ms)
+        loud = (level > self.threshold_dbfs).astype(np.int32)
+        if len(level) < run:
+            starts = np.empty(0, dtype=np.intp)
+        else:
+            starts = np.flatnonzero(np.convolve(loud, np.ones(run, dtype=np.int32), mode="valid") >= run)
+
+        if len(starts) == 0:
+            return {"audio": audio_data, "has_speech": False, "duration": duration, "kept_seconds": 0.0}
+
+        pad = self.padding_ms * params.framerate // 1000
+        first = max(0, starts[0] * frame_len - pad)
+        last = min(total, (starts[-1] + run) * frame_len + pad)
+        if first == 0 and last == total:
+            return {"audio": audio_data, "has_speech": True, "duration": duration, "kept_seconds": duration}
+
+        return {
+            "audio": self._encode(params, analysis["frames"], first, last),
+            "has_speech": True,
+            "duration": duration,
+            "kept_seconds": (last - first) / params.framerate
+        }
+
+    def split(self, audio_data: bytes, max_chunk_seconds: float = 15.0, min_silence_ms: int = 300) -> List[bytes]:
+        """
+        Split audio into chunks at pauses between words
+
+        Chunks are cut in the middle of pauses of at least min_silence_ms,
+        choosing the latest pause that keeps a chunk within
+        max_chunk_seconds. A stretch without any pause is cut hard at the
+        limit. Audio that isn't PCM WAV is returned as a single chunk.
+
+        Args:
+            audio_data: WAV audio to split
+            max_chunk_seconds: Longest chunk in seconds
+            min_silence_ms: Shortest pause to cut at
+
+        Returns:
+            WAV files of the chunks, in order
+        """
+        try:
+            analysis = self._analyze(audio_data)
+        except (wave.Error, EOFError, ValueError):
+            return [audio_data]
+
+        params, total, frame_len, level = analysis["params"], analysis["total"], analysis["frame_len"], analysis["level"]
+        max_chunk = int(max_chunk_seconds * params.framerate)
+        if total <= max_chunk:
+            return [audio_data]
+
+        # Middle of every run of quiet frames that is long enough, in samples
+        quiet = np.concatenate(([0], (level <= self.threshold_dbfs).astype(np.int8), [0]))
+        edges = np.flatnonzero(np.diff(quiet))
+        run_starts, run_ends = edges[0::2], edges[1::2]
+        long_enough = (run_ends - run_starts) * self.frame_ms >= min_silence_ms
+        pauses = ((run_starts[long_enough] + run_ends[long_enough]) // 2) * frame_len
+
+        chunks = []
+        first = 0
+        while total - first > max_chunk:
+            candidates = pauses[(pauses > first) & (pauses <= first + max_chunk)]
+            last = int(candidates[-1]) if len(candidates) else first + max_chunk
+            chunks.append(self._encode(params, analysis["frames"], first, last))
+            first = last
+        chunks.append(self._encode(params, analysis["frames"], first, total))
+        return chunks
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get cumulative counters
+
+        Returns:
+            Dictionary with requests processed, silent inputs, bytes in and
+            saved, and total processing time in milliseconds
+        """
+        with self._lock:
+            return dict(self._stats)
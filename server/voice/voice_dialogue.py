@@ -1,13 +1,144 @@
 import os
+import sys
 import json
 import time
+import uuid
+import asyncio
+import logging
+import inspect
+import functools
 import tempfile
-from typing import Dict, Any, List, Optional
+import contextlib
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, AsyncIterator, List, Optional, Set
 
 from .voice_enrollment import VoiceManager
 from .speech_synthesis import TextToSpeech
 from .speech_recognition import SpeechRecognizer
 from .oss_storage import OssStorage
+from .audio_cache import AudioCache
+from .tts_pipeline import SegmentPipeline, SentenceSplitter
+from .vad import VoiceActivityDetector
+from .transcode import DEFAULT_AUDIO_PROFILE, negotiate_format, normalize_wav
+from .session_history import HistoryPolicy
+from .session_store import SessionStore, MemorySessionStore, SqliteSessionStore
+from .admission import Overloaded, SessionLocks, UpstreamLimiter, overloaded_result
+from .metrics import Metrics, current_trace_id, trace
+
+# Concurrent Link AI calls allowed by default; the thread pool stages are
+# limited to their worker count so excess calls wait in a bounded queue
+DEFAULT_LLM_CONCURRENCY = 32
+
+
+def _shed_overload(method):
+    """Return a 503-style result when a dialogue method is shed under load"""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        try:
+            return await method(self, *args, **kwargs)
+        except Overloaded as e:
+            return overloaded_result(e)
+    return wrapper
+
+
+def _failure_type(result: Dict[str, Any]) -> str:
+    """Error type of a failed result dictionary, for the metrics"""
+    return "Overloaded" if result.get("status") == 503 else result.get("error_type", "failed")
+
+
+# Set while a turn runs, so a turn delegating to another is timed only once
+_in_turn: contextvars.ContextVar = contextvars.ContextVar("voice_in_turn", default=False)
+
+# Spans of nested turns go nowhere
+_UNTIMED = Metrics()
+
+
+@contextlib.contextmanager
+def _turn(metrics: Metrics, kind: str):
+    """Trace ID and "turn" span of a dialogue turn"""
+    with trace() as trace_id:
+        if _in_turn.get():
+            with _UNTIMED.timer("turn") as span:
+                yield trace_id, span
+            return
+        
+        token = _in_turn.set(True)
+        try:
+            with metrics.timer("turn", operation=kind) as span:
+                yield trace_id, span
+        finally:
+            _in_turn.reset(token)
+
+
+@contextlib.contextmanager
+def _turn_step(trace_id: str):
+    """
+    Trace ID and turn marker while one step of a streaming turn runs
+
+    They are set and reset around every step rather than across a yield,
+    so they never leak into the consumer's context.
+    """
+    with trace(trace_id):
+        token = _in_turn.set(True)
+        try:
+            yield
+        finally:
+            _in_turn.reset(token)
+
+
+def _traced(kind: str):
+    """
+    Run a dialogue turn under a trace ID and time it as the "turn" stage
+
+    The trace ID is added to the result, or to the "done" and "error"
+    events of a streaming turn.
+    """
+    def decorate(method):
+        if inspect.isasyncgenfunction(method):
+            @functools.wraps(method)
+            async def stream(self, *args, **kwargs):
+                trace_id = current_trace_id() or uuid.uuid4().hex
+                metrics = _UNTIMED if _in_turn.get() else self.metrics
+                with _turn_step(trace_id):
+                    span = metrics.timer("turn", operation=kind).__enter__()
+                events = method(self, *args, **kwargs)
+                exc_info = (None, None, None)
+                try:
+                    while True:
+                        with _turn_step(trace_id):
+                            try:
+                                event = await events.__anext__()
+                            except StopAsyncIteration:
+                                break
+                        if event["type"] in ("done", "error"):
+                            event["trace_id"] = trace_id
+                        if event["type"] == "error":
+                            span.fail(_failure_type(event))
+                        yield event
+                except BaseException:
+                    exc_info = sys.exc_info()
+                    raise
+                finally:
+                    with _turn_step(trace_id):
+                        try:
+                            await events.aclose()
+                        finally:
+                            span.__exit__(*exc_info)
+            return stream
+        
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            with _turn(self.metrics, kind) as (trace_id, span):
+                result = await method(self, *args, **kwargs)
+                result["trace_id"] = trace_id
+                if not result.get("success", True):
+                    span.fail(_failure_type(result))
+                return result
+        return wrapper
+    return decorate
+
 
 class VoiceDialogue:
     """
@@ -23,7 +154,47 @@ class VoiceDialogue:
         link_ai_app_code: str,
         voice_db_path: str = 'server/voice/voice_db.json',
         audio_cache_dir: str = 'server/voice/cache',
-        language: str = "zh-CN"
+        language: str = "zh-CN",
+        tts_pipeline_depth: int = 2,
+        link_ai_pool_size: int = 100,
+        link_ai_keepalive_timeout: float = 30.0,
+        link_ai_timeout: float = 60.0,
+        link_ai_connect_timeout: float = 10.0,
+        asr_workers: int = 4,
+        tts_workers: int = 8,
+        storage_workers: int = 8,
+        tts_cache_memory_bytes: int = 32 * 1024 * 1024,
+        tts_cache_disk_bytes: int = 512 * 1024 * 1024,
+        poll_pending_voices: bool = False,
+        asr_backend: str = "google",
+        asr_backend_options: Optional[Dict[str, Any]] = None,
+        asr_short_backend: Optional[str] = None,
+        asr_short_backend_options: Optional[Dict[str, Any]] = None,
+        asr_short_utterance_seconds: float = 3.0,
+        trim_silence: bool = True,
+        reject_silence: bool = False,
+        vad_threshold_dbfs: float = -40.0,
+        chunked_asr: bool = False,
+        asr_chunk_seconds: float = 15.0,
+        history_max_turns: Optional[int] = None,
+        history_max_chars: Optional[int] = None,
+        history_max_tokens: Optional[int] = None,
+        history_summarize: bool = False,
+        session_store: Optional[SessionStore] = None,
+        session_db_path: Optional[str] = None,
+        session_ttl: Optional[float] = 3600.0,
+        max_sessions: int = 10000,
+        session_memory_bytes: int = 64 * 1024 * 1024,
+        session_workers: int = 4,
+        upstream_limits: Optional[Dict[str, Optional[int]]] = None,
+        upstream_max_queue: int = 64,
+        upstream_max_wait: float = 5.0,
+        serialize_sessions: bool = True,
+        session_max_pending: Optional[int] = 4,
+        oss_options: Optional[Dict[str, Any]] = None,
+        audio_format: str = DEFAULT_AUDIO_PROFILE,
+        enrollment_sample_rate: Optional[int] = 16000,
+        metrics: Optional[Metrics] = None
     ):
         """
         Initialize the voice dialogue system
@@ -36,72 +207,506 @@ class VoiceDialogue:
             link_ai_api_key: Link AI API key
             link_ai_app_code: Link AI app code
             voice_db_path: Path to store voice database
-            audio_cache_dir: Directory to cache audio files
+            audio_cache_dir: Directory to cache synthesized audio in
             language: Language for speech recognition
+            tts_pipeline_depth: Number of sentences synthesized ahead in
+                pipelined mode
+            link_ai_pool_size: Maximum number of pooled Link AI connections
+            link_ai_keepalive_timeout: Seconds an idle Link AI connection is
+                kept open for reuse
+            link_ai_timeout: Seconds allowed for a whole Link AI request, or
+                between two chunks of a streamed reply
+            link_ai_connect_timeout: Seconds allowed to open a connection
+            asr_workers: Threads for blocking speech recognition calls
+            tts_workers: Threads for blocking DashScope calls (synthesis and
+                voice enrollment)
+            storage_workers: Pooled OSS connections (and the threads serving
+                them), also used for local audio analysis before uploads
+            tts_cache_memory_bytes: Size limit of the in-memory TTS cache
+            tts_cache_disk_bytes: Size limit of the on-disk TTS cache
+            poll_pending_voices: Refresh the status of voices that are still
+                being cloned in the background
+            asr_backend: Speech recognition backend (google, vosk, whisper
+                or stub, see asr_backends)
+            asr_backend_options: Keyword arguments of the ASR backend
+            asr_short_backend: Optional ASR backend for short utterances
+            asr_short_backend_options: Keyword arguments of the short backend
+            asr_short_utterance_seconds: Longest utterance sent to the
+                short backend
+            trim_silence: Trim leading and trailing silence from uploaded
+                WAV audio before recognition and voice cloning
+            reject_silence: Fail audio without any speech before it is sent
+                to the recognizer or uploaded
+            vad_threshold_dbfs: Level above which a frame counts as speech,
+                both for silence trimming and for chunked recognition splits
+            chunked_asr: Recognize long voice messages as chunks split at
+                pauses, asr_workers chunks at a time
+            asr_chunk_seconds: Longest chunk sent to the recognizer at once
+            history_max_turns: Most recent user turns (with their replies)
+                kept per session and sent to Link AI, None (the default)
+                for no limit; older turns are dropped from the stored
+                session, not only from the request
+            history_max_chars: Character budget of the kept history
+            history_max_tokens: Estimated token budget of the kept history
+            history_summarize: Fold turns that leave the history window into
+                a summary sent as a system message
+            session_store: Session store to use instead of the ones below
+            session_db_path: Keep sessions in a SQLite database at this path,
+                shared by all worker processes, instead of in memory
+            session_ttl: Seconds a session may stay idle before it expires
+            max_sessions: Most sessions kept in memory
+            session_memory_bytes: Size limit of the in-memory sessions
+            session_workers: Threads for the calls into a session store that
+                isn't in memory, so a slow or locked database never stalls
+                the event loop
+            upstream_limits: Concurrent calls allowed per upstream ("llm",
+                "asr", "tts", "storage"), None for no limit; defaults to
+                32 for Link AI and the worker count for the other stages
+            upstream_max_queue: Calls allowed to wait for an upstream slot;
+                further calls are rejected with a 503-style result
+            upstream_max_wait: Seconds a call may wait for an upstream slot
+            serialize_sessions: Run the turns of one session one at a time
+                so concurrent requests can't interleave its history
+            session_max_pending: Requests a session may have running or
+                waiting before further ones are rejected
+            oss_options: Keyword arguments of OssStorage, e.g. bucket_name,
+                endpoint or the multipart upload settings
+            audio_format: Reply audio profile for clients that don't ask
+                for one (see transcode.AUDIO_PROFILES)
+            enrollment_sample_rate: Convert WAV voice samples to mono 16-bit
+                PCM at this rate before uploading them, None to upload
+                them as they are
+            metrics: Metrics to record stage timings, outcomes and payload
+                sizes in; disabled (no exporters) by default
         """
-        # Initialize components
-        self.voice_manager = VoiceManager(
-            api_key=dashscope_api_key,
-            voice_db_path=voice_db_path
-        )
+        # The voice manager, TTS, recognizer and storage are only created on
+        # first use (or by initialize), so constructing the dialogue neither
+        # imports the cloud SDKs nor waits on the network
+        storage_options = {"pool_size": storage_workers}
+        storage_options.update(oss_options or {})
+        self._component_factories: Dict[str, Callable[[], Any]] = {
+            "voice_manager": lambda: self._create_voice_manager(
+                api_key=dashscope_api_key,
+                voice_db_path=voice_db_path,
+                poll_pending_voices=poll_pending_voices
+            ),
+            "tts": lambda: TextToSpeech(
+                api_key=dashscope_api_key,
+                cache=self.tts_cache,
+                pool_size=tts_workers
+            ),
+            "speech_recognizer": lambda: SpeechRecognizer(
+                language=language,
+                backend=asr_backend,
+                backend_options=asr_backend_options,
+                short_backend=asr_short_backend,
+                short_backend_options=asr_short_backend_options,
+                short_utterance_seconds=asr_short_utterance_seconds,
+                chunk_seconds=asr_chunk_seconds,
+                vad=self.detector
+            ),
+            "storage": lambda: OssStorage(
+                access_key_id=oss_access_key_id,
+                access_key_secret=oss_access_key_secret,
+                **storage_options
+            )
+        }
+        self._components: Dict[str, Any] = {}
+        self._components_lock = threading.RLock()
         
-        self.tts = TextToSpeech(
-            api_key=dashscope_api_key
+        # Identical (text, voice, params) requests are served from the cache
+        os.makedirs(audio_cache_dir, exist_ok=True)
+        self.tts_cache = AudioCache(
+            cache_dir=os.path.join(audio_cache_dir, "tts"),
+            max_memory_bytes=tts_cache_memory_bytes,
+            max_disk_bytes=tts_cache_disk_bytes
         )
         
-        self.speech_recognizer = SpeechRecognizer(
-            language=language
-        )
+        self.chunked_asr = chunked_asr
         
-        self.storage = OssStorage(
-            access_key_id=oss_access_key_id,
-            access_key_secret=oss_access_key_secret
-        )
+        # Also finds the pauses chunked recognition splits long audio at
+        self.detector = VoiceActivityDetector(threshold_dbfs=vad_threshold_dbfs)
+        self.vad = self.detector if trim_silence or reject_silence else None
+        self.trim_silence = trim_silence
+        self.reject_silence = reject_silence
+        
+        self.metrics = metrics or Metrics()
+        
+        # Replies are synthesized straight into the negotiated format
+        self.audio_format = negotiate_format(None, default=audio_format)["name"]
+        self.enrollment_sample_rate = enrollment_sample_rate
         
         # Link AI API settings
         self.link_ai_api_url = link_ai_api_url
         self.link_ai_api_key = link_ai_api_key
         self.link_ai_app_code = link_ai_app_code
+        self.link_ai_pool_size = link_ai_pool_size
+        self.link_ai_keepalive_timeout = link_ai_keepalive_timeout
+        self.link_ai_timeout = link_ai_timeout
+        self.link_ai_connect_timeout = link_ai_connect_timeout
+        
+        # Blocking SDK calls run on one bounded thread pool per stage so
+        # they never stall the event loop
+        self.stage_workers = {
+            "asr": asr_workers,
+            "tts": tts_workers,
+            "storage": storage_workers
+        }
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        
+        # Admission control: bounded concurrency and queueing per upstream,
+        # excess load is rejected quickly instead of piling up
+        limits = dict(self.stage_workers, llm=DEFAULT_LLM_CONCURRENCY)
+        limits.update(upstream_limits or {})
+        self.limiters = {
+            name: UpstreamLimiter(name, limit, max_queue=upstream_max_queue, max_wait=upstream_max_wait)
+            for name, limit in limits.items()
+        }
+        self.session_locks = SessionLocks(max_pending=session_max_pending) if serialize_sessions else None
+        
+        # Shared HTTP session, created on first use inside the event loop
+        self._http_session = None
+        self._http_session_loop = None
+        
+        # Background uploads of audio that was streamed to the client
+        self._archive_tasks: Set[asyncio.Future] = set()
         
         # Other settings
         self.audio_cache_dir = audio_cache_dir
-        os.makedirs(self.audio_cache_dir, exist_ok=True)
+        self.tts_pipeline_depth = tts_pipeline_depth
+        
+        # Session storage (session_id -> message history and summary); the
+        # history policy bounds each session, the store the number of them
+        if session_store is None:
+            if session_db_path:
+                session_store = SqliteSessionStore(session_db_path, ttl=session_ttl)
+            else:
+                session_store = MemorySessionStore(
+                    max_sessions=max_sessions,
+                    ttl=session_ttl,
+                    max_bytes=session_memory_bytes
+                )
+        self.session_store = session_store
+        # The in-memory store answers right away; any other one may block
+        self.stage_workers["session"] = session_workers
+        self.history_policy = HistoryPolicy(
+            max_turns=history_max_turns,
+            max_chars=history_max_chars,
+            max_tokens=history_max_tokens,
+            summarize=history_summarize
+        )
+    
+    def _create_voice_manager(self, **kwargs) -> VoiceManager:
+        manager = VoiceManager(**kwargs)
+        # Cached audio of a voice is stale once the voice changes
+        manager.add_voice_listener(self.tts.invalidate_voice)
+        return manager
+    
+    def _component(self, name: str) -> Any:
+        """Get a component, creating it on first use"""
+        component = self._components.get(name)
+        if component is None:
+            with self._components_lock:
+                component = self._components.get(name)
+                if component is None:
+                    component = self._components[name] = self._component_factories[name]()
+        return component
+    
+    async def _components_ready(self, *names: str):
+        """Create missing components on a worker thread, so SDK imports never block the event loop"""
+        missing = [name for name in names if name not in self._components]
+        if missing:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, lambda: [self._component(name) for name in missing])
+    
+    @property
+    def voice_manager(self) -> VoiceManager:
+        """Voice enrollment manager, created on first use"""
+        return self._component("voice_manager")
+    
+    @property
+    def tts(self) -> TextToSpeech:
+        """Speech synthesizer, created on first use"""
+        return self._component("tts")
+    
+    @property
+    def speech_recognizer(self) -> SpeechRecognizer:
+        """Speech recognizer, created on first use"""
+        return self._component("speech_recognizer")
+    
+    @property
+    def storage(self) -> OssStorage:
+        """OSS storage, created on first use"""
+        return self._component("storage")
+    
+    def initialize(self):
+        """
+        Create all components now instead of on first use
+        
+        This imports the SDKs and starts the OSS bucket check, which takes a
+        while, so run it on a worker thread (e.g. asyncio.to_thread) to warm
+        a server up in the background once it accepts requests.
+        """
+        for name in self._component_factories:
+            self._component(name)
+    
+    async def __aenter__(self) -> "VoiceDialogue":
+        return self
+    
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+    
+    async def close(self):
+        """
+        Close the shared Link AI, TTS and OSS connection pools, the stage
+        thread pools, the speech recognizer's chunk pool, the voice manager
+        (status poller and voice store) and the session store
+        """
+        if self._http_session is not None and not self._http_session.closed:
+            await self._http_session.close()
+        self._http_session = None
+        self._http_session_loop = None
         
-        # Session storage (session_id -> message history)
-        self.sessions = {}
+        # Let background archival finish before its storage goes away
+        if self._archive_tasks:
+            await asyncio.gather(*self._archive_tasks, return_exceptions=True)
+        
+        executors, self._executors = self._executors, {}
+        for executor in executors.values():
+            executor.shutdown(wait=False)
+        
+        # Closing pooled websockets or joining the status poller waits, keep
+        # it off the event loop; components never created have nothing to close
+        loop = asyncio.get_running_loop()
+        for name in ("tts", "storage", "speech_recognizer", "voice_manager"):
+            component = self._components.get(name)
+            if component is not None:
+                await loop.run_in_executor(None, component.close)
+        self.session_store.close()
+    
+    async def _run_blocking(self, stage: str, func, *args, **kwargs):
+        """
+        Call an upstream through the thread pool of a pipeline stage
+
+        Holds a slot of the stage's upstream limiter for the duration of
+        the call, and times it (including the wait for the slot).
+
+        Args:
+            stage: Stage name ("asr", "tts" or "storage")
+            func: Blocking callable
+            *args, **kwargs: Arguments for the callable
+
+        Returns:
+            The callable's return value
+
+        Raises:
+            Overloaded: If no slot of the upstream became free in time
+        """
+        with self.metrics.timer(stage, operation=getattr(func, "__name__", "call")) as span:
+            async with self.limiters[stage].slot():
+                result = await self._run_on_pool(stage, func, *args, **kwargs)
+            self._record_result(span, result)
+            return result
+    
+    async def _call_upstream(self, stage: str, func, *args, **kwargs):
+        """
+        Await an async upstream call, holding a slot of the stage's limiter
+
+        Args:
+            stage: Upstream name ("storage")
+            func: Coroutine function, e.g. an OssStorage *_async method
+            *args, **kwargs: Arguments for the function
+
+        Returns:
+            The function's return value
+
+        Raises:
+            Overloaded: If no slot of the upstream became free in time
+        """
+        with self.metrics.timer(stage, operation=getattr(func, "__name__", "call")) as span:
+            async with self.limiters[stage].slot():
+                result = await func(*args, **kwargs)
+            self._record_result(span, result)
+            return result
+    
+    @staticmethod
+    def _record_result(span, result: Any):
+        """Mark a stage's span failed or tag it with the upstream request ID"""
+        if not isinstance(result, dict):
+            return
+        if result.get("success") is False:
+            span.fail(_failure_type(result))
+        if result.get("request_id"):
+            span.set(request_id=result["request_id"])
+    
+    async def _run_on_pool(self, stage: str, func, *args, **kwargs):
+        """
+        Run a blocking call on the thread pool of a pipeline stage
+
+        Local work such as audio analysis uses this directly, as it doesn't
+        count against the stage's upstream limit.
+
+        Args:
+            stage: Stage name ("asr", "tts", "storage" or "session")
+            func: Blocking callable
+            *args, **kwargs: Arguments for the callable
+
+        Returns:
+            The callable's return value
+        """
+        executor = self._executors.get(stage)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=self.stage_workers[stage],
+                thread_name_prefix=f"voice-{stage}"
+            )
+            self._executors[stage] = executor
+        
+        # Carry the trace ID (and any other context) onto the worker thread
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(context.run, func, *args, **kwargs))
+    
+    async def _preprocess_audio(self, audio_data: bytes, stage: str) -> Optional[Dict[str, Any]]:
+        """
+        Run voice activity detection on uploaded audio
+        
+        Args:
+            audio_data: Uploaded audio
+            stage: Thread pool to run the detector on
+            
+        Returns:
+            VoiceActivityDetector.process result, or None if disabled. The
+            "audio" is only trimmed when trim_silence is on
+        """
+        if self.vad is None:
+            return None
+        result = await self._run_on_pool(stage, self.vad.process, audio_data)
+        if not self.trim_silence:
+            result["audio"] = audio_data
+            result["bytes_out"] = result["bytes_in"]
+            result["bytes_saved"] = 0
+        return result
+    
+    async def _get_http_session(self):
+        """
+        Get the shared Link AI HTTP session, creating it if needed
+
+        Connections are pooled and kept alive between chat turns, so DNS
+        lookup and TLS handshake are only paid when the pool grows.
+        """
+        import aiohttp
+        
+        loop = asyncio.get_running_loop()
+        
+        # A session is bound to the loop it was created in
+        if (
+            self._http_session is None
+            or self._http_session.closed
+            or self._http_session_loop is not loop
+        ):
+            await self._close_stale_http_session()
+            connector = aiohttp.TCPConnector(
+                limit=self.link_ai_pool_size,
+                keepalive_timeout=self.link_ai_keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            self._http_session = aiohttp.ClientSession(
+                connector=connector,
+                headers={"Authorization": f"Bearer {self.link_ai_api_key}"}
+            )
+            self._http_session_loop = loop
+        
+        return self._http_session
+    
+    async def _close_stale_http_session(self):
+        """
+        Close the shared Link AI session of an event loop no longer in use
+
+        The session is closed on its own loop if that still runs in another
+        thread, otherwise here. Sockets of a loop that was closed can't be
+        shut down cleanly any more, but the session and its connector are
+        released either way.
+        """
+        session, loop = self._http_session, self._http_session_loop
+        self._http_session = None
+        self._http_session_loop = None
+        if session is None or session.closed:
+            return
+        
+        try:
+            if loop is not None and loop.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(session.close(), loop))
+            else:
+                await session.close()
+        except Exception as e:
+            # A stopped loop that wasn't closed can't finish the close
+            logging.warning(f"Error closing the Link AI session of a previous event loop: {e}")
+            session.detach()
     
     def _get_session_messages(self, session_id: str) -> List[Dict[str, str]]:
         """Get messages for a session"""
-        if session_id not in self.sessions:
-            self.sessions[session_id] = []
-        return self.sessions[session_id]
+        session = self.session_store.get(session_id)
+        return session["messages"] if session is not None else []
+    
+    async def _call_session_store(self, func, *args):
+        """Call the session store, off the event loop unless it is in memory"""
+        if isinstance(self.session_store, MemorySessionStore):
+            return func(*args)
+        return await self._run_on_pool("session", func, *args)
     
-    def _save_session_message(self, session_id: str, role: str, content: str):
+    async def _save_session_message(self, session_id: str, role: str, content: str):
         """Save a message to a session"""
-        messages = self._get_session_messages(session_id)
-        messages.append({"role": role, "content": content})
-        self.sessions[session_id] = messages
+        def append(session: Dict[str, Any]) -> Dict[str, Any]:
+            session["messages"].append({"role": role, "content": content})
+            # Keep only what the history window can still use
+            session["messages"], session["summary"] = self.history_policy.compact(
+                session["messages"], session["summary"]
+            )
+            return session
+        
+        await self._call_session_store(self.session_store.update, session_id, append)
+    
+    async def _history_payload(self, session_id: str) -> List[Dict[str, str]]:
+        """Messages of a session to send to Link AI"""
+        session = await self._call_session_store(self.session_store.get, session_id)
+        if session is None:
+            return []
+        return self.history_policy.payload(session["messages"], session["summary"])
+    
+    def _session_turn(self, session_id: str):
+        """Context manager that holds the session's lock, if sessions are serialized"""
+        if self.session_locks is None:
+            return contextlib.nullcontext()
+        return self.session_locks.hold(session_id)
     
-    async def process_text_message(self, message: str, session_id: str, voice_id: str) -> Dict[str, Any]:
+    def admission_stats(self) -> Dict[str, Any]:
         """
-        Process a text message and return a spoken response
+        Get admission control metrics
         
+        Returns:
+            Dictionary with the UpstreamLimiter stats of every upstream
+            ("upstreams") and the SessionLocks stats ("sessions")
+        """
+        return {
+            "upstreams": {name: limiter.stats() for name, limiter in self.limiters.items()},
+            "sessions": self.session_locks.stats() if self.session_locks is not None else {}
+        }
+    
+    async def _request_link_ai(self, session_id: str) -> str:
+        """
+        Send the session history to Link AI and save the reply
+
         Args:
-            message: Text message
             session_id: Session ID
-            voice_id: Voice ID to use for response
-            
+
         Returns:
-            Dictionary with audio URL and response data
+            Assistant reply text
         """
         import aiohttp
-        import asyncio
-        
-        # Save user message to session
-        self._save_session_message(session_id, "user", message)
         
         # Prepare request to Link AI
-        messages = self._get_session_messages(session_id)
+        messages = await self._history_payload(session_id)
         
         request_body = {
             "app_code": self.link_ai_app_code,
@@ -109,26 +714,389 @@ class VoiceDialogue:
             "stream": False
         }
         
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.link_ai_api_key}"
-        }
+        timeout = aiohttp.ClientTimeout(
+            total=self.link_ai_timeout,
+            sock_connect=self.link_ai_connect_timeout
+        )
         
         # Call Link AI API
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.link_ai_api_url,
-                    json=request_body,
-                    headers=headers
-                ) as response:
-                    response_data = await response.json()
+        with self.metrics.timer("llm", operation="chat"):
+            session = await self._get_http_session()
+            async with self.limiters["llm"].slot(), session.post(
+                self.link_ai_api_url,
+                json=request_body,
+                timeout=timeout
+            ) as response:
+                if response.status != 200:
+                    raise RuntimeError(f"Link AI returned HTTP {response.status}: {await response.text()}")
+                response_data = await response.json()
+                
+                # Extract response text
+                ai_response = response_data["choices"][0]["message"]["content"]
+                
+                # Save assistant message to session
+                await self._save_session_message(session_id, "assistant", ai_response)
+        
+        self.metrics.add_bytes("llm", "received", len(ai_response.encode("utf-8")))
+        return ai_response
+    
+    async def _stream_link_ai(self, session_id: str) -> AsyncIterator[str]:
+        """
+        Send the session history to Link AI with streaming enabled
+
+        The server-sent events are parsed as they arrive and the reply is
+        saved to the session once the stream completes.
+
+        Args:
+            session_id: Session ID
+
+        Yields:
+            Pieces of the assistant reply text as they arrive
+        """
+        import aiohttp
+        
+        messages = await self._history_payload(session_id)
+        
+        request_body = {
+            "app_code": self.link_ai_app_code,
+            "messages": messages,
+            "stream": True
+        }
+        
+        # Long replies may take a while, so only bound the gap between chunks
+        timeout = aiohttp.ClientTimeout(
+            total=None,
+            sock_connect=self.link_ai_connect_timeout,
+            sock_read=self.link_ai_timeout
+        )
+        
+        parts = []
+        start = time.perf_counter()
+        
+        with self.metrics.timer("llm", operation="chat_stream"):
+            session = await self._get_http_session()
+            async with self.limiters["llm"].slot(), session.post(
+                self.link_ai_api_url,
+                json=request_body,
+                headers={"Accept": "text/event-stream"},
+                timeout=timeout
+            ) as response:
+                if response.status != 200:
+                    raise RuntimeError(f"Link AI returned HTTP {response.status}: {await response.text()}")
+                
+                async for raw_line in response.content:
+                    line = raw_line.decode("utf-8").strip()
                     
-                    # Extract response text
-                    ai_response = response_data["choices"][0]["message"]["content"]
+                    # Skip blank separators, comments and non-data fields
+                    if not line.startswith("data:"):
+                        continue
                     
-                    # Save assistant message to session
-                    self._save_session_message(session_id, "assistant", ai_response)
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    
+                    chunk = json.loads(data)
+                    choices = chunk.get("choices") or [{}]
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        if not parts:
+                            self.metrics.observe("llm_first_token_seconds", time.perf_counter() - start)
+                        parts.append(delta)
+                        yield delta
+        
+        # Save assistant message to session once the whole reply is known
+        reply = "".join(parts)
+        await self._save_session_message(session_id, "assistant", reply)
+        self.metrics.add_bytes("llm", "received", len(reply.encode("utf-8")))
+    
+    async def _reply_chunks(self, session_id: str, stream_llm: bool) -> AsyncIterator[str]:
+        """Yield the Link AI reply, either streamed or in one piece"""
+        if stream_llm:
+            async for delta in self._stream_link_ai(session_id):
+                yield delta
+        else:
+            yield await self._request_link_ai(session_id)
+    
+    def _reply_format(self, audio_format: Optional[str]) -> Dict[str, Any]:
+        """Negotiate a request's reply audio profile, falling back to the dialogue's"""
+        return negotiate_format(audio_format, default=self.audio_format)
+    
+    async def _synthesize(
+        self,
+        text: str,
+        voice_id: str,
+        profile: Dict[str, Any],
+        on_audio: Optional[Callable[[bytes], None]] = None
+    ) -> Dict[str, Any]:
+        """Synthesize text in the format of a reply audio profile"""
+        result = await self._run_blocking(
+            "tts",
+            self.tts.synthesize,
+            text=text,
+            voice_id=voice_id,
+            output_format=profile["output_format"],
+            sample_rate=profile["sample_rate"],
+            bit_rate=profile["bit_rate"],
+            on_audio=on_audio
+        )
+        if result["success"] and not result.get("cached"):
+            self.metrics.add_bytes("tts", "received", len(result["audio"]))
+        return result
+    
+    async def _upload_reply_audio(
+        self,
+        session_id: str,
+        tts_result: Dict[str, Any],
+        profile: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Upload synthesized reply audio to OSS under a content-addressed name
+
+        Identical replies reuse the existing object instead of uploading it
+        again.
+
+        Raises:
+            Overloaded: If the storage has no free slot in time
+        """
+        result = await self._call_upstream(
+            "storage",
+            self.storage.upload_bytes_dedup_async,
+            data=tts_result["audio"],
+            prefix=f"responses/{session_id}",
+            extension=profile["extension"],
+            # Freshly synthesized audio is new, only cached audio can repeat
+            check_exists=tts_result.get("cached", True)
+        )
+        if result.get("uploaded"):
+            self.metrics.add_bytes("storage", "sent", len(tts_result["audio"]))
+        return result
+    
+    async def _render_segment(
+        self,
+        index: int,
+        text: str,
+        session_id: str,
+        voice_id: str,
+        profile: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Synthesize one sentence of a reply and upload it
+
+        Args:
+            index: Position of the sentence in the reply
+            text: Sentence text
+            session_id: Session ID
+            voice_id: Voice ID to use
+            profile: Reply audio profile
+
+        Returns:
+            Dictionary with the segment's audio URL and status
+        """
+        segment = {
+            "type": "audio",
+            "index": index,
+            "text": text,
+            "audio_url": None,
+            "audio_format": profile["name"],
+            "content_type": profile["content_type"]
+        }
+        
+        try:
+            tts_result = await self._synthesize(text, voice_id, profile)
+        except Overloaded as e:
+            segment.update(overloaded_result(e))
+            return segment
+        
+        if not tts_result["success"]:
+            segment["success"] = False
+            segment["error"] = tts_result.get("error", "Failed to synthesize speech")
+            return segment
+        
+        segment["request_id"] = tts_result.get("request_id")
+        try:
+            upload_result = await self._upload_reply_audio(session_id, tts_result, profile)
+        except Overloaded as e:
+            segment.update(overloaded_result(e))
+            return segment
+        
+        if not upload_result["success"]:
+            segment["success"] = False
+            segment["error"] = upload_result.get("error", "Failed to upload audio")
+            return segment
+        
+        segment["success"] = True
+        segment["audio_url"] = upload_result["url"]
+        return segment
+    
+    @_traced("text_stream")
+    async def stream_text_message(
+        self,
+        message: str,
+        session_id: str,
+        voice_id: str,
+        stream_llm: bool = False,
+        audio_format: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a text message and yield the spoken response sentence by sentence
+
+        The reply is split at sentence boundaries and each sentence is
+        synthesized and uploaded as its own segment, so the first audio is
+        available long before the whole reply has been synthesized.
+
+        Args:
+            message: Text message
+            session_id: Session ID
+            voice_id: Voice ID to use for response
+            stream_llm: Request a streamed Link AI reply, yield the text as it
+                arrives and start synthesizing each sentence as soon as it
+                is complete
+            audio_format: Reply audio formats the client accepts, see
+                transcode.negotiate_format; None for the dialogue's default
+            
+        Yields:
+            Event dictionaries in order: "text" events with partial reply
+            text (streaming only), one "audio" event per sentence (index,
+            text, audio_url, audio_format, content_type, success), then a final "done" event with the
+            full response text, or an "error" event if Link AI failed. An
+            "error" event with status 503 and retry_after means the request
+            was shed under load
+        """
+        try:
+            async with self._session_turn(session_id):
+                # Close the turn right away if the consumer goes away early
+                turn = self._stream_turn(message, session_id, voice_id, stream_llm, self._reply_format(audio_format))
+                async with contextlib.aclosing(turn) as events:
+                    async for event in events:
+                        yield event
+        except Overloaded as e:
+            yield dict(overloaded_result(e), type="error")
+    
+    async def _stream_turn(
+        self,
+        message: str,
+        session_id: str,
+        voice_id: str,
+        stream_llm: bool,
+        profile: Dict[str, Any]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Run one turn of stream_text_message with the session lock held"""
+        await self._components_ready("tts", "storage")
+        
+        # Save user message to session
+        await self._save_session_message(session_id, "user", message)
+        
+        pipeline = SegmentPipeline(
+            lambda index, text: self._render_segment(index, text, session_id, voice_id, profile),
+            depth=self.tts_pipeline_depth
+        )
+        splitter = SentenceSplitter()
+        chunks = self._reply_chunks(session_id, stream_llm)
+        parts = []
+        
+        try:
+            while True:
+                try:
+                    chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    sentences = splitter.flush()
+                    chunk = None
+                except Overloaded as e:
+                    yield dict(overloaded_result(e), type="error")
+                    return
+                except Exception as e:
+                    yield {
+                        "type": "error",
+                        "success": False,
+                        "error": f"Error calling Link AI API: {str(e)}"
+                    }
+                    return
+                else:
+                    parts.append(chunk)
+                    if stream_llm:
+                        yield {"type": "text", "delta": chunk}
+                    sentences = splitter.feed(chunk)
+                
+                for sentence in sentences:
+                    if pipeline.full:
+                        yield await pipeline.next()
+                    pipeline.submit(sentence)
+                
+                for segment in pipeline.ready():
+                    yield segment
+                
+                if chunk is None:
+                    break
+            
+            async for segment in pipeline.drain():
+                yield segment
+        finally:
+            # Stop rendering if the consumer went away early
+            pipeline.cancel()
+            await chunks.aclose()
+        
+        yield {
+            "type": "done",
+            "success": True,
+            "response_text": "".join(parts),
+            "session_id": session_id
+        }
+    
+    @_traced("text")
+    @_shed_overload
+    async def process_text_message(
+        self,
+        message: str,
+        session_id: str,
+        voice_id: str,
+        pipelined: bool = False,
+        stream_llm: bool = False,
+        audio_format: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Process a text message and return a spoken response
+        
+        Args:
+            message: Text message
+            session_id: Session ID
+            voice_id: Voice ID to use for response
+            pipelined: Synthesize the reply sentence by sentence and return
+                one audio URL per sentence in 'audio_urls'
+            stream_llm: Stream the Link AI reply and start synthesizing
+                while it is still being generated (implies pipelined)
+            audio_format: Reply audio formats the client accepts, e.g.
+                "opus-16k" or "opus, mp3;q=0.5" (see
+                transcode.negotiate_format); None for the dialogue's default
+            
+        Returns:
+            Dictionary with audio URL, the chosen 'audio_format' and its
+            'content_type', and response data; a request shed under load
+            fails with status 503 and retry_after
+        """
+        if pipelined or stream_llm:
+            return await self._collect_segments(message, session_id, voice_id, stream_llm, audio_format)
+        
+        async with self._session_turn(session_id):
+            return await self._reply_with_audio(message, session_id, voice_id, self._reply_format(audio_format))
+    
+    async def _reply_with_audio(
+        self,
+        message: str,
+        session_id: str,
+        voice_id: str,
+        profile: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Run one turn of process_text_message with the session lock held"""
+        await self._components_ready("tts", "storage")
+        
+        # Save user message to session
+        await self._save_session_message(session_id, "user", message)
+        
+        # Call Link AI API
+        try:
+            ai_response = await self._request_link_ai(session_id)
+        except Overloaded:
+            raise
         except Exception as e:
             return {
                 "success": False,
@@ -137,11 +1105,8 @@ class VoiceDialogue:
                 "response_text": None
             }
         
-        # Synthesize speech from response
-        tts_result = self.tts.synthesize(
-            text=ai_response,
-            voice_id=voice_id
-        )
+        # Synthesize speech from response, directly in the negotiated format
+        tts_result = await self._synthesize(ai_response, voice_id, profile)
         
         if not tts_result["success"]:
             return {
@@ -151,15 +1116,8 @@ class VoiceDialogue:
                 "response_text": ai_response
             }
         
-        # Save audio to file
-        timestamp = int(time.time())
-        object_name = f"responses/{session_id}/{timestamp}.mp3"
-        
-        # Upload audio to OSS
-        upload_result = self.storage.upload_bytes(
-            data=tts_result["audio"],
-            object_name=object_name
-        )
+        # Upload audio to OSS under a content-addressed name
+        upload_result = await self._upload_reply_audio(session_id, tts_result, profile)
         
         if not upload_result["success"]:
             return {
@@ -173,11 +1131,276 @@ class VoiceDialogue:
         return {
             "success": True,
             "audio_url": upload_result["url"],
+            "audio_format": profile["name"],
+            "content_type": profile["content_type"],
+            "request_id": tts_result.get("request_id"),
             "response_text": ai_response,
             "session_id": session_id
         }
     
-    async def process_voice_message(self, audio_data: bytes, session_id: str, voice_id: str) -> Dict[str, Any]:
+    async def _collect_segments(
+        self,
+        message: str,
+        session_id: str,
+        voice_id: str,
+        stream_llm: bool = False,
+        audio_format: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Run the pipelined path to completion and build a single result"""
+        segments = []
+        failure = None
+        response_text = None
+        
+        async for event in self.stream_text_message(message, session_id, voice_id, stream_llm, audio_format):
+            if event["type"] == "error":
+                failure = event
+            elif event["type"] == "audio":
+                if not event["success"] and failure is None:
+                    failure = event
+                segments.append(event)
+            elif event["type"] == "done":
+                response_text = event["response_text"]
+        
+        if failure is not None:
+            result = {
+                "success": False,
+                "error": failure["error"],
+                "audio_url": None,
+                "response_text": response_text
+            }
+            if "status" in failure:
+                result["status"] = failure["status"]
+                result["retry_after"] = failure["retry_after"]
+            return result
+        
+        audio_urls = [segment["audio_url"] for segment in segments]
+        profile = self._reply_format(audio_format)
+        return {
+            "success": True,
+            "audio_url": audio_urls[0] if audio_urls else None,
+            "audio_urls": audio_urls,
+            "audio_format": profile["name"],
+            "content_type": profile["content_type"],
+            "segments": segments,
+            "response_text": response_text,
+            "session_id": session_id
+        }
+    
+    @_traced("audio_stream")
+    async def stream_reply_audio(
+        self,
+        message: str,
+        session_id: str,
+        voice_id: str,
+        stream_llm: bool = False,
+        audio_format: Optional[str] = None,
+        archive: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a text message and stream the spoken response's audio itself
+
+        Instead of uploading each reply to OSS and handing out a signed URL
+        the client then downloads, the audio is yielded chunk by chunk as
+        DashScope produces it, ready to be written to a chunked HTTP
+        response or a websocket. The reply is synthesized sentence by
+        sentence, up to tts_pipeline_depth sentences ahead, and the chunks
+        are yielded in order. With archive set, every sentence is uploaded
+        to OSS in the background once it is complete; the upload never
+        delays the stream.
+
+        Args:
+            message: Text message
+            session_id: Session ID
+            voice_id: Voice ID to use for response
+            stream_llm: Stream the Link AI reply and start synthesizing each
+                sentence as soon as it is complete
+            audio_format: Reply audio formats the client accepts, see
+                process_text_message. Each sentence is a complete file in
+                that format; consecutive MP3 or Ogg Opus files play back as
+                one stream
+            archive: Upload the audio to OSS in the background
+
+        Yields:
+            Event dictionaries in order: a "start" event with audio_format
+            and content_type, "audio" events with the next chunk of audio in
+            'data' (and the sentence 'index'), a "segment" event after the
+            last chunk of each sentence (index, text, success, error), then
+            a "done" event with the full response_text and, when archiving,
+            'archive': an asyncio.Future of the sentences' upload results.
+            An "error" event is yielded instead if Link AI failed, with
+            status 503 and retry_after if the request was shed under load,
+            and with 'archive' for the sentences streamed before the error.
+            The uploads belong to the dialogue, which waits for them on
+            close(), so the future can be ignored
+        """
+        profile = self._reply_format(audio_format)
+        try:
+            async with self._session_turn(session_id):
+                turn = self._stream_audio_turn(message, session_id, voice_id, stream_llm, profile, archive)
+                async with contextlib.aclosing(turn) as events:
+                    async for event in events:
+                        yield event
+        except Overloaded as e:
+            yield dict(overloaded_result(e), type="error")
+    
+    async def _stream_audio_turn(
+        self,
+        message: str,
+        session_id: str,
+        voice_id: str,
+        stream_llm: bool,
+        profile: Dict[str, Any],
+        archive: bool
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Run one turn of stream_reply_audio with the session lock held"""
+        await self._components_ready("tts", "storage")
+        
+        # Save user message to session
+        await self._save_session_message(session_id, "user", message)
+        
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.tts_pipeline_depth)
+        # (index, text, chunk queue, synthesis task) per sentence, then an
+        # error event if Link AI failed, then None
+        segments: asyncio.Queue = asyncio.Queue()
+        parts = []
+        
+        async def render(text: str, chunks: asyncio.Queue) -> Dict[str, Any]:
+            # Chunks arrive on the synthesizing thread; call_soon_threadsafe
+            # keeps them ahead of the task's own completion
+            def on_audio(data: bytes):
+                loop.call_soon_threadsafe(chunks.put_nowait, data)
+            
+            try:
+                return await self._synthesize(text, voice_id, profile, on_audio=on_audio)
+            except Overloaded as e:
+                return overloaded_result(e)
+            finally:
+                slots.release()
+                chunks.put_nowait(None)
+        
+        async def feed():
+            """Split the Link AI reply into sentences and start synthesizing them"""
+            splitter = SentenceSplitter()
+            index = 0
+            
+            async def submit(sentences: List[str]):
+                nonlocal index
+                for sentence in sentences:
+                    await slots.acquire()
+                    chunks = asyncio.Queue()
+                    segments.put_nowait((index, sentence, chunks, asyncio.ensure_future(render(sentence, chunks))))
+                    index += 1
+            
+            try:
+                async with contextlib.aclosing(self._reply_chunks(session_id, stream_llm)) as chunks:
+                    async for chunk in chunks:
+                        parts.append(chunk)
+                        await submit(splitter.feed(chunk))
+                await submit(splitter.flush())
+            except Overloaded as e:
+                segments.put_nowait(dict(overloaded_result(e), type="error"))
+            except Exception as e:
+                segments.put_nowait({
+                    "type": "error",
+                    "success": False,
+                    "error": f"Error calling Link AI API: {str(e)}"
+                })
+            finally:
+                segments.put_nowait(None)
+        
+        feeder = asyncio.ensure_future(feed())
+        # Synthesis of the sentence being streamed, no longer in the queue
+        current = None
+        uploads = []
+        error = None
+        
+        try:
+            yield {
+                "type": "start",
+                "audio_format": profile["name"],
+                "content_type": profile["content_type"]
+            }
+            
+            while True:
+                item = await segments.get()
+                if item is None:
+                    break
+                if isinstance(item, dict):
+                    error = item
+                    break
+                
+                index, text, chunks, current = item
+                while True:
+                    data = await chunks.get()
+                    if data is None:
+                        break
+                    self.metrics.add_bytes("client", "sent", len(data))
+                    yield {"type": "audio", "index": index, "data": data}
+                
+                result = await current
+                current = None
+                segment = {
+                    "type": "segment",
+                    "index": index,
+                    "text": text,
+                    "success": result["success"],
+                    "request_id": result.get("request_id")
+                }
+                if not result["success"]:
+                    segment["error"] = result.get("error", "Failed to synthesize speech")
+                elif archive:
+                    uploads.append(self._start_archive(session_id, result, profile))
+                yield segment
+        finally:
+            # Stop synthesizing if the consumer went away early
+            feeder.cancel()
+            if current is not None:
+                current.cancel()
+            while not segments.empty():
+                item = segments.get_nowait()
+                if isinstance(item, tuple):
+                    item[3].cancel()
+        
+        done = error or {
+            "type": "done",
+            "success": True,
+            "response_text": "".join(parts),
+            "session_id": session_id
+        }
+        if archive:
+            done["archive"] = self._track_archive(asyncio.gather(*uploads))
+        yield done
+    
+    def _start_archive(self, session_id: str, tts_result: Dict[str, Any], profile: Dict[str, Any]) -> asyncio.Task:
+        """Upload streamed reply audio to OSS in the background"""
+        async def upload() -> Dict[str, Any]:
+            try:
+                return await self._upload_reply_audio(session_id, tts_result, profile)
+            except Overloaded as e:
+                return overloaded_result(e)
+            except Exception as e:
+                # Nobody may be waiting for the result, so never raise
+                logging.error(f"Error archiving reply audio of session {session_id}: {e}")
+                return {"success": False, "error": str(e)}
+        
+        return self._track_archive(asyncio.ensure_future(upload()))
+    
+    def _track_archive(self, future: asyncio.Future) -> asyncio.Future:
+        """Keep a background archival future until it's done, so close() waits for it"""
+        self._archive_tasks.add(future)
+        future.add_done_callback(self._archive_tasks.discard)
+        return future
+    
+    @_traced("voice")
+    @_shed_overload
+    async def process_voice_message(
+        self,
+        audio_data: bytes,
+        session_id: str,
+        voice_id: str,
+        audio_format: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Process a voice message and return a spoken response
         
@@ -185,47 +1408,253 @@ class VoiceDialogue:
             audio_data: Audio data as bytes
             session_id: Session ID
             voice_id: Voice ID to use for response
+            audio_format: Reply audio formats the client accepts, see
+                process_text_message
             
         Returns:
             Dictionary with audio URL and response data
         """
-        # Save audio to temporary file
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-            temp_file_path = temp_file.name
-            temp_file.write(audio_data)
+        await self._components_ready("speech_recognizer")
         
-        try:
-            # Recognize speech
-            recognition_result = self.speech_recognizer.recognize_from_file(temp_file_path)
-            
-            if not recognition_result["success"]:
+        stage_ms = {}
+        bytes_saved = 0
+        
+        # Trim silence and drop empty utterances before any network call
+        preprocessed = await self._preprocess_audio(audio_data, "asr")
+        if preprocessed is not None:
+            stage_ms["vad"] = preprocessed["elapsed_ms"]
+            bytes_saved = preprocessed["bytes_saved"]
+            audio_data = preprocessed["audio"]
+            if self.reject_silence and not preprocessed["has_speech"]:
                 return {
                     "success": False,
-                    "error": recognition_result.get("error", "Failed to recognize speech"),
+                    "error": "No speech detected",
                     "audio_url": None,
-                    "response_text": None
+                    "response_text": None,
+                    "bytes_saved": bytes_saved,
+                    "stage_ms": stage_ms
                 }
-            
-            # Get recognized text
-            recognized_text = recognition_result["text"]
-            
-            # Process text message
-            text_result = await self.process_text_message(
-                message=recognized_text,
-                session_id=session_id,
-                voice_id=voice_id
+        
+        # Recognize speech straight from memory
+        start = time.perf_counter()
+        if self.chunked_asr:
+            async for event in self.stream_transcript(audio_data):
+                if event["type"] == "transcript":
+                    recognition_result = event
+        else:
+            self.metrics.add_bytes("asr", "sent", len(audio_data))
+            recognition_result = await self._run_blocking(
+                "asr",
+                self.speech_recognizer.recognize_from_bytes,
+                audio_data
             )
+        stage_ms["asr"] = (time.perf_counter() - start) * 1000
+        
+        if not recognition_result["success"]:
+            return {
+                "success": False,
+                "error": recognition_result.get("error", "Failed to recognize speech"),
+                "audio_url": None,
+                "response_text": None,
+                "bytes_saved": bytes_saved,
+                "stage_ms": stage_ms
+            }
+        
+        # Get recognized text
+        recognized_text = recognition_result["text"]
+        
+        # Process text message
+        start = time.perf_counter()
+        text_result = await self.process_text_message(
+            message=recognized_text,
+            session_id=session_id,
+            voice_id=voice_id,
+            audio_format=audio_format
+        )
+        stage_ms["reply"] = (time.perf_counter() - start) * 1000
+        
+        # Add recognized text and preprocessing figures to result
+        text_result["recognized_text"] = recognized_text
+        text_result["bytes_saved"] = bytes_saved
+        text_result["stage_ms"] = stage_ms
+        
+        return text_result
+    
+    async def stream_transcript(self, audio_data: bytes) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Recognize audio in chunks split at pauses, yielding partial transcripts
+        
+        Up to asr_workers chunks are recognized at the same time and their
+        transcripts are handed back in order as soon as each is known, so
+        callers can act on the start of a long voice message early.
+        
+        Args:
+            audio_data: WAV audio data
             
-            # Add recognized text to result
-            text_result["recognized_text"] = recognized_text
+        Yields:
+            One "partial" event per chunk (index, chunks, text, success and
+            partial_text, the transcript so far), then a "transcript" event
+            with the stitched result (text, success, error)
+        
+        Raises:
+            Overloaded: If the recognizer has no free slot in time
+        """
+        await self._components_ready("speech_recognizer")
+        
+        self.metrics.add_bytes("asr", "sent", len(audio_data))
+        chunks = await self._run_on_pool("asr", self.speech_recognizer.split_chunks, audio_data)
+        pipeline = SegmentPipeline(
+            lambda index, chunk: self._run_blocking("asr", self.speech_recognizer.recognize_from_bytes, chunk),
+            depth=self.stage_workers["asr"]
+        )
+        results = []
+        
+        try:
+            for chunk in chunks[:pipeline.depth]:
+                pipeline.submit(chunk)
             
-            return text_result
+            for index in range(len(chunks)):
+                result = await pipeline.next()
+                if index + pipeline.depth < len(chunks):
+                    pipeline.submit(chunks[index + pipeline.depth])
+                
+                results.append(result)
+                yield {
+                    "type": "partial",
+                    "index": index,
+                    "chunks": len(chunks),
+                    "text": result["text"],
+                    "success": result["success"],
+                    "partial_text": self.speech_recognizer.join_transcripts(results)["text"]
+                }
         finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
+            pipeline.cancel()
+        
+        yield dict(self.speech_recognizer.join_transcripts(results), type="transcript")
     
-    async def clone_voice_from_audio(self, audio_data: bytes, name: str, description: str) -> Dict[str, Any]:
+    @_traced("voice_stream")
+    async def stream_voice_message(
+        self,
+        audio_data: bytes,
+        session_id: str,
+        voice_id: str,
+        stream_llm: bool = False,
+        audio_format: Optional[str] = None,
+        direct_audio: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a voice message and yield transcripts and the spoken response
+        
+        Args:
+            audio_data: Audio data as bytes
+            session_id: Session ID
+            voice_id: Voice ID to use for response
+            stream_llm: See stream_text_message
+            audio_format: See stream_text_message
+            direct_audio: Stream the reply audio itself (stream_reply_audio)
+                instead of uploaded audio URLs
+            
+        Yields:
+            The "partial" and "transcript" events of stream_transcript, then
+            the events of stream_text_message, or of stream_reply_audio with
+            direct_audio (the "done" event also carries recognized_text), or
+            an "error" event if no speech was recognized
+        """
+        preprocessed = await self._preprocess_audio(audio_data, "asr")
+        if preprocessed is not None:
+            audio_data = preprocessed["audio"]
+            if self.reject_silence and not preprocessed["has_speech"]:
+                yield {"type": "error", "success": False, "error": "No speech detected"}
+                return
+        
+        recognition_result = None
+        try:
+            async for event in self.stream_transcript(audio_data):
+                if event["type"] == "transcript":
+                    recognition_result = event
+                yield event
+        except Overloaded as e:
+            yield dict(overloaded_result(e), type="error")
+            return
+        
+        if not recognition_result["success"]:
+            yield {
+                "type": "error",
+                "success": False,
+                "error": recognition_result.get("error", "Failed to recognize speech")
+            }
+            return
+        
+        recognized_text = recognition_result["text"]
+        reply = self.stream_reply_audio if direct_audio else self.stream_text_message
+        async for event in reply(recognized_text, session_id, voice_id, stream_llm=stream_llm, audio_format=audio_format):
+            if event["type"] == "done":
+                event["recognized_text"] = recognized_text
+            yield event
+    
+    @_shed_overload
+    async def clear_session(self, session_id: str) -> Dict[str, Any]:
+        """
+        Forget a session and delete the reply audio uploaded for it
+        
+        Args:
+            session_id: Session ID
+            
+        Returns:
+            Dictionary with whether the session existed ('session_deleted'),
+            the number of audio objects deleted ('deleted_objects') and status
+        """
+        await self._components_ready("storage")
+        
+        session_deleted = await self._call_session_store(self.session_store.delete, session_id)
+        delete_result = await self._call_upstream(
+            "storage",
+            self.storage.delete_prefix_async,
+            f"responses/{session_id}/"
+        )
+        
+        result = {
+            "success": delete_result["success"],
+            "session_deleted": session_deleted,
+            "deleted_objects": delete_result["deleted"]
+        }
+        if not delete_result["success"]:
+            result["error"] = delete_result.get("error", "Failed to delete audio")
+        return result
+    
+    async def wait_for_voice(self, voice_id: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        """
+        Wait until a cloned voice is ready (or has failed)
+        
+        The status is refreshed by the voice manager's background poller,
+        so waiting doesn't cost an API call per check.
+        
+        Args:
+            voice_id: ID of voice to wait for
+            timeout: Seconds to wait before raising asyncio.TimeoutError
+            
+        Returns:
+            Final voice dictionary, or None if the voice no longer exists
+        
+        Raises:
+            asyncio.TimeoutError: If the voice isn't ready within the timeout
+            Exception: The DashScope error if the status queries keep failing
+        """
+        await self._components_ready("voice_manager")
+        
+        future = asyncio.wrap_future(self.voice_manager.watch_voice(voice_id))
+        return await asyncio.wait_for(future, timeout)
+    
+    @_traced("clone")
+    @_shed_overload
+    async def clone_voice_from_audio(
+        self,
+        audio_data: bytes,
+        name: str,
+        description: str,
+        wait_until_ready: bool = False,
+        ready_timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
         """
         Clone a voice from audio data
         
@@ -233,10 +1662,45 @@ class VoiceDialogue:
             audio_data: Audio data as bytes
             name: Name for the voice
             description: Description of the voice
+            wait_until_ready: Only return once the voice has finished cloning
+            ready_timeout: Seconds to wait for the voice to be ready
             
         Returns:
             Dictionary with voice ID and status
         """
+        await self._components_ready("storage", "voice_manager")
+        
+        stage_ms = {}
+        bytes_saved = 0
+        
+        # Only upload the part of the sample that contains speech
+        preprocessed = await self._preprocess_audio(audio_data, "storage")
+        if preprocessed is not None:
+            stage_ms["vad"] = preprocessed["elapsed_ms"]
+            bytes_saved = preprocessed["bytes_saved"]
+            audio_data = preprocessed["audio"]
+            if self.reject_silence and not preprocessed["has_speech"]:
+                return {
+                    "success": False,
+                    "error": "No speech detected",
+                    "voice_id": None,
+                    "bytes_saved": bytes_saved,
+                    "stage_ms": stage_ms
+                }
+        
+        # Enrollment only needs mono speech at 16 kHz; stereo or 48 kHz
+        # recordings would upload several times the bytes for nothing
+        if self.enrollment_sample_rate:
+            normalized = await self._run_on_pool(
+                "storage",
+                normalize_wav,
+                audio_data,
+                sample_rate=self.enrollment_sample_rate
+            )
+            stage_ms["transcode"] = normalized["elapsed_ms"]
+            bytes_saved += normalized["bytes_saved"]
+            audio_data = normalized["audio"]
+        
         # Save audio to temporary file
         with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
             temp_file_path = temp_file.name
@@ -247,10 +1711,14 @@ class VoiceDialogue:
             timestamp = int(time.time())
             object_name = f"voice_samples/{timestamp}_{name.lower().replace(' ', '_')}.wav"
             
-            upload_result = self.storage.upload_file(
+            start = time.perf_counter()
+            upload_result = await self._call_upstream(
+                "storage",
+                self.storage.upload_file_async,
                 local_file_path=temp_file_path,
                 object_name=object_name
             )
+            stage_ms["upload"] = (time.perf_counter() - start) * 1000
             
             if not upload_result["success"]:
                 return {
@@ -258,19 +1726,44 @@ class VoiceDialogue:
                     "error": upload_result.get("error", "Failed to upload audio"),
                     "voice_id": None
                 }
+            self.metrics.add_bytes("storage", "sent", len(audio_data))
             
             # Create voice using audio URL
-            voice_data = self.voice_manager.create_voice(
+            start = time.perf_counter()
+            voice_data = await self._run_blocking(
+                "tts",
+                self.voice_manager.create_voice,
                 target_model="cosyvoice-v2",
                 name=name,
                 description=description,
                 audio_url=upload_result["url"]
             )
+            stage_ms["create"] = (time.perf_counter() - start) * 1000
+            
+            if wait_until_ready:
+                try:
+                    voice_data = await self.wait_for_voice(voice_data["voice_id"], ready_timeout) or voice_data
+                except asyncio.TimeoutError:
+                    return {
+                        "success": False,
+                        "error": "Timed out waiting for the voice to be ready",
+                        "voice_id": voice_data["voice_id"],
+                        "voice_data": voice_data
+                    }
+                except Exception as e:
+                    return {
+                        "success": False,
+                        "error": f"Error checking the voice status: {str(e)}",
+                        "voice_id": voice_data["voice_id"],
+                        "voice_data": voice_data
+                    }
             
             return {
                 "success": True,
                 "voice_id": voice_data["voice_id"],
-                "voice_data": voice_data
+                "voice_data": voice_data,
+                "bytes_saved": bytes_saved,
+                "stage_ms": stage_ms
             }
         finally:
             # Clean up temporary file
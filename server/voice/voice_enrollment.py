@@ -1,42 +1,137 @@
 import os
-import json
-from dashscope.audio.tts_v2 import VoiceEnrollmentService
-from typing import List, Dict, Optional
+import time
+import logging
+from concurrent.futures import Future
+from typing import Callable, List, Dict, Optional
+
+from .voice_store import VoiceStore, SqliteVoiceStore, migrate_json_db
+from .voice_status import PENDING_STATUSES, VoiceStatusPoller, voice_changes_from_api
+from .voice_sync import VoiceSync
 
 class VoiceManager:
     """
     Handles voice enrollment and management operations using DashScope API
     """
-    def __init__(self, api_key: str, voice_db_path: str = 'server/voice/voice_db.json'):
+    def __init__(
+        self,
+        api_key: str,
+        voice_db_path: str = 'server/voice/voice_db.json',
+        store: Optional[VoiceStore] = None,
+        status_max_staleness: float = 10.0,
+        poll_pending_voices: bool = False,
+        voice_list_ttl: float = 30.0,
+        voice_list_page_size: int = 100,
+        voice_list_workers: int = 4
+    ):
         """
         Initialize the voice manager
         
         Args:
             api_key: DashScope API key
-            voice_db_path: Path to store voice database JSON file
+            voice_db_path: Path of the voice database. A legacy JSON file at
+                this path is migrated once into a SQLite database next to it
+                (same name, .sqlite3 extension)
+            store: Voice store to use instead of the SQLite database
+            status_max_staleness: get_voice serves the stored voice without
+                asking DashScope if its status was refreshed within this
+                many seconds
+            poll_pending_voices: Refresh voices that are still being cloned
+                in the background instead of on every get_voice
+            voice_list_ttl: list_voices serves the stored voices without
+                asking DashScope if the last full sync is younger than this
+                many seconds
+            voice_list_page_size: Voices requested per page when syncing
+            voice_list_workers: Pages fetched concurrently when syncing
         """
+        # dashscope takes a while to import, so only load it with the manager
+        from dashscope.audio.tts_v2 import VoiceEnrollmentService
+        
         os.environ['DASHSCOPE_API_KEY'] = api_key
         self.service = VoiceEnrollmentService()
         self.voice_db_path = voice_db_path
-        self._ensure_db_exists()
-        
-    def _ensure_db_exists(self):
-        """Ensures the voice database file exists"""
-        os.makedirs(os.path.dirname(self.voice_db_path), exist_ok=True)
-        if not os.path.exists(self.voice_db_path):
-            with open(self.voice_db_path, 'w') as f:
-                json.dump([], f)
+        self._voice_listeners: List[Callable[[str], None]] = []
+        
+        if store is None:
+            root, extension = os.path.splitext(voice_db_path)
+            store = SqliteVoiceStore(f"{root}.sqlite3" if extension == ".json" else voice_db_path)
+            if extension == ".json":
+                migrate_json_db(voice_db_path, store)
+        self.store = store
+        
+        # voice_id -> monotonic time of the last status refresh from the API
+        self.status_max_staleness = status_max_staleness
+        self._synced_at: Dict[str, float] = {}
+        
+        self.poll_pending_voices = poll_pending_voices
+        self.status_poller = VoiceStatusPoller(
+            service=self.service,
+            store=self.store,
+            on_refresh=self._mark_synced
+        )
+        
+        self.voice_sync = VoiceSync(
+            service=self.service,
+            store=self.store,
+            page_size=voice_list_page_size,
+            workers=voice_list_workers,
+            ttl=voice_list_ttl,
+            on_synced=self._mark_many_synced
+        )
+    
+    def _mark_synced(self, voice_id: str):
+        """Record that a voice's status was just refreshed from the API"""
+        self._synced_at[voice_id] = time.monotonic()
+    
+    def _mark_many_synced(self, voice_ids):
+        """Record that several voices were just refreshed from the API"""
+        now = time.monotonic()
+        for voice_id in voice_ids:
+            self._synced_at[voice_id] = now
+    
+    def watch_voice(self, voice_id: str, callback: Optional[Callable[[Optional[Dict]], None]] = None) -> Future:
+        """
+        Wait for a voice to finish cloning without busy-polling
+        
+        Args:
+            voice_id: ID of voice to watch
+            callback: Called with the final voice once it is ready or failed
+            
+        Returns:
+            Future resolving to the final voice (None if it no longer exists),
+            or failing with the query error if the status can't be fetched
+        """
+        voice = self.store.get(voice_id)
+        if voice is not None and voice.get('status') not in PENDING_STATUSES:
+            future: Future = Future()
+            future.set_result(voice)
+            if callback is not None:
+                callback(voice)
+            return future
+        return self.status_poller.watch(voice_id, callback)
     
-    def _load_db(self) -> List[Dict]:
-        """Load the voice database"""
-        with open(self.voice_db_path, 'r') as f:
-            return json.load(f)
+    def close(self):
+        """Stop background polling and close the voice store"""
+        self.status_poller.stop()
+        self.store.close()
     
-    def _save_db(self, voices: List[Dict]):
-        """Save the voice database"""
-        with open(self.voice_db_path, 'w') as f:
-            json.dump(voices, f, indent=2)
+    def add_voice_listener(self, callback: Callable[[str], None]):
+        """
+        Register a callback invoked with the voice ID whenever a voice is
+        updated or deleted, e.g. to invalidate cached audio
+        
+        Args:
+            callback: Function taking the voice ID
+        """
+        self._voice_listeners.append(callback)
     
+    def _notify_voice_changed(self, voice_id: str):
+        """Call every registered voice listener"""
+        for callback in self._voice_listeners:
+            try:
+                callback(voice_id)
+            except Exception as e:
+                logging.exception(f"Error notifying voice listener for {voice_id}: {e}")
+        
     def create_voice(self, target_model: str, name: str, description: str, audio_url: str) -> Dict:
         """
         Create a new voice
@@ -72,71 +167,72 @@ class VoiceManager:
         }
         
         # Update local DB
-        voices = self._load_db()
-        voices.append(voice_data)
-        self._save_db(voices)
+        self.store.put(voice_data)
+        self._mark_synced(voice_id)
+        
+        if self.poll_pending_voices:
+            self.status_poller.watch(voice_id)
         
         # Return voice data
         return voice_data
     
-    def list_voices(self) -> List[Dict]:
+    def list_voices(self, max_staleness: Optional[float] = None) -> List[Dict]:
         """
         List all voices and update the local database with latest status
         
+        Args:
+            max_staleness: Seconds since the last sync after which DashScope
+                is listed again (default: voice_list_ttl, 0 always syncs)
+        
         Returns:
             List of voice dictionaries
         """
-        # Get voices from API
-        api_voices = self.service.list_voices(page_size=100)
-        
-        # Load our database
-        local_voices = self._load_db()
-        
-        # Update local database with latest status from API
-        for api_voice in api_voices:
-            voice_id = api_voice.get('voice_id')
-            for local_voice in local_voices:
-                if local_voice['voice_id'] == voice_id:
-                    local_voice['status'] = api_voice.get('status')
-                    local_voice['created_at'] = api_voice.get('gmt_create')
-                    break
-        
-        # Save updated database
-        self._save_db(local_voices)
+        try:
+            self.voice_sync.sync(max_staleness)
+        except Exception as e:
+            logging.error(f"Error syncing voices: {e}")
         
-        return local_voices
+        return self.store.list()
     
-    def get_voice(self, voice_id: str) -> Optional[Dict]:
+    def get_voice(self, voice_id: str, max_staleness: Optional[float] = None) -> Optional[Dict]:
         """
         Get details for a specific voice
         
         Args:
             voice_id: ID of voice to get
+            max_staleness: Seconds since the last status refresh after which
+                DashScope is queried again (default: status_max_staleness,
+                0 always queries)
             
         Returns:
             Voice dictionary or None if not found
         """
         # First check local database
-        local_voices = self._load_db()
-        local_voice = next((v for v in local_voices if v['voice_id'] == voice_id), None)
+        local_voice = self.store.get(voice_id)
         
         if not local_voice:
             return None
         
+        if self.poll_pending_voices and local_voice.get('status') in PENDING_STATUSES:
+            self.status_poller.watch(voice_id)
+        
+        if max_staleness is None:
+            max_staleness = self.status_max_staleness
+        
+        synced_at = self._synced_at.get(voice_id)
+        if synced_at is not None and time.monotonic() - synced_at <= max_staleness:
+            return local_voice
+        
         # Get latest info from API and update local database
         try:
-            api_voice = self.service.query_voices(voice_id)
+            api_voice = self.service.query_voice(voice_id)
             
             # Update local voice with API data
             if api_voice:
-                local_voice['status'] = api_voice.get('status')
-                local_voice['created_at'] = api_voice.get('gmt_create')
-                local_voice['target_model'] = api_voice.get('target_model')
-                
-                # Save updated database
-                self._save_db(local_voices)
+                local_voice = self.store.update(voice_id, voice_changes_from_api(api_voice)) or local_voice
+                self._mark_synced(voice_id)
         except Exception as e:
-            print(f"Error querying voice {voice_id}: {e}")
+            logging.error(f"Error querying voice {voice_id}: {e}")
         
         return local_voice
     
@@ -156,16 +252,11 @@ class VoiceManager:
             self.service.update_voice(voice_id, audio_url)
             
             # Update local database
-            voices = self._load_db()
-            for voice in voices:
-                if voice['voice_id'] == voice_id:
-                    voice['audio_url'] = audio_url
-                    break
-            
-            self._save_db(voices)
+            self.store.update(voice_id, {'audio_url': audio_url})
+            self._notify_voice_changed(voice_id)
             return True
         except Exception as e:
-            print(f"Error updating voice {voice_id}: {e}")
+            logging.error(f"Error updating voice {voice_id}: {e}")
             return False
     
     def delete_voice(self, voice_id: str) -> bool:
@@ -183,10 +274,10 @@ class VoiceManager:
             self.service.delete_voice(voice_id)
             
             # Update local database
-            voices = self._load_db()
-            voices = [v for v in voices if v['voice_id'] != voice_id]
-            self._save_db(voices)
+            self.store.delete(voice_id)
+            self._synced_at.pop(voice_id, None)
+            self._notify_voice_changed(voice_id)
             return True
         except Exception as e:
-            print(f"Error deleting voice {voice_id}: {e}")
+            logging.error(f"Error deleting voice {voice_id}: {e}")
             return False 
\ No newline at end of file
@@ -0,0 +1,214 @@
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from .voice_store import VoiceStore
+
+# Statuses of a voice that is still being cloned; any other status is final
+PENDING_STATUSES = frozenset({"PENDING", "DEPLOYING"})
+
+
+def voice_changes_from_api(api_voice: Dict) -> Dict:
+    """
+    Map a DashScope voice query result onto our voice fields
+
+    Args:
+        api_voice: Result of VoiceEnrollmentService.query_voice
+
+    Returns:
+        Fields to merge into the stored voice
+    """
+    return {
+        'status': api_voice.get('status'),
+        'created_at': api_voice.get('gmt_create'),
+        'target_model': api_voice.get('target_model')
+    }
+
+
+class _Watch:
+    """Polling state of one watched voice"""
+    def __init__(self, next_due: float):
+        self.next_due = next_due
+        self.attempt = 0
+        self.errors = 0
+        self.futures: List[Future] = []
+
+
+class VoiceStatusPoller:
+    """
+    Background thread refreshing voices that are still being cloned
+
+    Only watched voices are queried. Each voice is polled with exponential
+    backoff, all voices that are due are refreshed together in one pass,
+    and a voice is dropped from the watch list once it reaches a final
+    status, resolving every future waiting on it. A voice whose queries
+    keep failing is dropped too, failing its futures with the last error.
+    """
+    def __init__(
+        self,
+        service,
+        store: VoiceStore,
+        on_refresh: Optional[Callable[[str], None]] = None,
+        interval: float = 2.0,
+        max_interval: float = 60.0,
+        backoff: float = 2.0,
+        batch_size: int = 20,
+        workers: int = 4,
+        max_errors: int = 5
+    ):
+        """
+        Initialize the poller
+
+        Args:
+            service: DashScope VoiceEnrollmentService
+            store: Voice store to write refreshed statuses to
+            on_refresh: Called with the voice ID after each successful refresh
+            interval: Delay before the first poll and base of the backoff
+            max_interval: Upper bound of the delay between two polls
+            backoff: Factor the delay grows by after each poll
+            batch_size: Maximum number of voices refreshed per pass
+            workers: Threads querying the API within a pass
+            max_errors: Consecutive failed queries after which a voice is
+                no longer watched and its futures fail with the error
+        """
+        self.service = service
+        self.store = store
+        self.on_refresh = on_refresh
+        self.interval = interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_errors = max_errors
+
+        self._watched: Dict[str, _Watch] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stopping = False
+
+    def watch(self, voice_id: str, callback: Optional[Callable[[Optional[Dict]], None]] = None) -> Future:
+        """
+        Start watching a voice until it reaches a final status
+
+        Args:
+            voice_id: ID of voice to watch
+            callback: Called with the final voice (or None if the voice no
+                longer exists) once it is known
+
+        Returns:
+            Future resolving to the final voice, or None if it no longer
+            exists; it fails with the query error after max_errors
+            consecutive failed queries
+        """
+        future: Future = Future()
+        if callback is not None:
+            future.add_done_callback(
+                lambda f: callback(f.result()) if not f.cancelled() and f.exception() is None else None
+            )
+
+        with self._cond:
+            watch = self._watched.get(voice_id)
+            if watch is None:
+                watch = _Watch(next_due=time.monotonic() + self.interval)
+                self._watched[voice_id] = watch
+            watch.futures.append(future)
+            self._cond.notify()
+
+        self._ensure_started()
+        return future
+
+    def is_watching(self, voice_id: str) -> bool:
+        """Whether a voice is currently being polled"""
+        with self._cond:
+            return voice_id in self._watched
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop the background thread; watching a voice starts it again
+
+        Args:
+            timeout: Seconds to wait for the thread to finish
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        with self._cond:
+            self._stopping = False
+
+    def _ensure_started(self):
+        with self._cond:
+            if self._thread is not None or self._stopping:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="voice-status")
+            self._thread = threading.Thread(target=self._run, name="voice-status-poller", daemon=True)
+            self._thread.start()
+
+    def _next_batch(self) -> Optional[List[str]]:
+        """Wait until voices are due, returning None when stopping"""
+        with self._cond:
+            while not self._stopping:
+                now = time.monotonic()
+                due = [voice_id for voice_id, watch in self._watched.items() if watch.next_due <= now]
+                if due:
+                    due.sort(key=lambda voice_id: self._watched[voice_id].next_due)
+                    return due[:self.batch_size]
+
+                next_due = min((watch.next_due for watch in self._watched.values()), default=None)
+                self._cond.wait(None if next_due is None else next_due - now)
+        return None
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            for voice_id, api_voice, error in self._executor.map(self._query, batch):
+                self._apply(voice_id, api_voice, error)
+
+    def _query(self, voice_id: str):
+        try:
+            return voice_id, self.service.query_voice(voice_id), None
+        except Exception as e:
+            return voice_id, None, e
+
+    def _apply(self, voice_id: str, api_voice: Optional[Dict], error: Optional[Exception]):
+        voice = None
+        if error is not None:
+            logging.warning(f"Error polling voice {voice_id}: {error}")
+        elif api_voice:
+            voice = self.store.update(voice_id, voice_changes_from_api(api_voice))
+            if self.on_refresh is not None:
+                self.on_refresh(voice_id)
+
+        # Keep polling on errors and while the voice is still being cloned
+        done = error is None and (voice is None or voice.get('status') not in PENDING_STATUSES)
+
+        with self._cond:
+            watch = self._watched.get(voice_id)
+            if watch is None:
+                return
+            watch.errors = watch.errors + 1 if error is not None else 0
+            failed = watch.errors >= self.max_errors
+            if not done and not failed:
+                delay = min(self.interval * self.backoff ** watch.attempt, self.max_interval)
+                watch.attempt += 1
+                watch.next_due = time.monotonic() + delay
+                return
+            del self._watched[voice_id]
+
+        for future in watch.futures:
+            if future.done():
+                continue
+            if failed:
+                future.set_exception(error)
+            else:
+                future.set_result(voice)
@@ -0,0 +1,328 @@
+import os
+import json
+import sqlite3
+import contextlib
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+
+class VoiceStore:
+    """
+    Storage interface behind VoiceManager, keyed by voice_id
+    """
+    def get(self, voice_id: str) -> Optional[Dict]:
+        """Get a voice, or None if it doesn't exist"""
+        raise NotImplementedError
+
+    def get_many(self, voice_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Get several voices at once, keyed by voice_id; missing ones are left out"""
+        voices = {}
+        for voice_id in voice_ids:
+            voice = self.get(voice_id)
+            if voice is not None:
+                voices[voice_id] = voice
+        return voices
+
+    def put(self, voice: Dict):
+        """Insert or replace a voice"""
+        self.put_many([voice])
+
+    def put_many(self, voices: Iterable[Dict]):
+        """Insert or replace several voices in one write"""
+        raise NotImplementedError
+
+    def update(self, voice_id: str, changes: Dict) -> Optional[Dict]:
+        """
+        Atomically merge changes into a stored voice
+
+        Args:
+            voice_id: ID of voice to update
+            changes: Fields to overwrite
+
+        Returns:
+            The updated voice, or None if it doesn't exist
+        """
+        raise NotImplementedError
+
+    def update_many(self, changes: Dict[str, Dict]) -> int:
+        """
+        Atomically merge changes into several stored voices
+
+        Args:
+            changes: Fields to overwrite, keyed by voice_id
+
+        Returns:
+            Number of voices that existed and were updated
+        """
+        return sum(1 for voice_id, fields in changes.items() if self.update(voice_id, fields) is not None)
+
+    def delete(self, voice_id: str) -> bool:
+        """Delete a voice, returning whether it existed"""
+        raise NotImplementedError
+
+    def import_once(self, source: str, voices: Iterable[Dict]) -> int:
+        """
+        Atomically insert voices from a one-time source such as a legacy file
+
+        The source is recorded in the store, so importing it again does
+        nothing. A store that already holds voices counts as having
+        imported it. Voices already stored are never overwritten.
+
+        Args:
+            source: Name of the source
+            voices: Voices to insert
+
+        Returns:
+            Number of voices inserted
+        """
+        raise NotImplementedError
+
+    def list(self) -> List[Dict]:
+        """All voices in insertion order"""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def close(self):
+        """Release any resources held by the store"""
+
+
+class MemoryVoiceStore(VoiceStore):
+    """
+    Process-local store backed by a dict index
+    """
+    def __init__(self, voices: Optional[Iterable[Dict]] = None):
+        self._voices: Dict[str, Dict] = {}
+        self._imported = set()
+        self._lock = threading.Lock()
+        if voices:
+            self.put_many(voices)
+
+    def get(self, voice_id: str) -> Optional[Dict]:
+        with self._lock:
+            voice = self._voices.get(voice_id)
+            return dict(voice) if voice is not None else None
+
+    def put_many(self, voices: Iterable[Dict]):
+        with self._lock:
+            for voice in voices:
+                self._voices[voice['voice_id']] = dict(voice)
+
+    def update(self, voice_id: str, changes: Dict) -> Optional[Dict]:
+        with self._lock:
+            voice = self._voices.get(voice_id)
+            if voice is None:
+                return None
+            voice.update(changes)
+            return dict(voice)
+
+    def update_many(self, changes: Dict[str, Dict]) -> int:
+        updated = 0
+        with self._lock:
+            for voice_id, fields in changes.items():
+                voice = self._voices.get(voice_id)
+                if voice is not None:
+                    voice.update(fields)
+                    updated += 1
+        return updated
+
+    def delete(self, voice_id: str) -> bool:
+        with self._lock:
+            return self._voices.pop(voice_id, None) is not None
+
+    def import_once(self, source: str, voices: Iterable[Dict]) -> int:
+        with self._lock:
+            if source in self._imported or self._voices:
+                self._imported.add(source)
+                return 0
+            self._imported.add(source)
+            for voice in voices:
+                self._voices.setdefault(voice['voice_id'], dict(voice))
+            return len(self._voices)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            return [dict(voice) for voice in self._voices.values()]
+
+    def __len__(self) -> int:
+        return len(self._voices)
+
+
+class SqliteVoiceStore(VoiceStore):
+    """
+    Persistent store backed by SQLite
+
+    Each voice is one row keyed by voice_id, so reads are index lookups and
+    writes only touch the rows that changed. Every write runs in its own
+    transaction and WAL mode lets several worker processes share the file.
+    """
+    def __init__(self, db_path: str):
+        """
+        Open (and create if needed) the database
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS voices ("
+            " voice_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL"
+            ")"
+        )
+        # One-time imports already done, see import_once
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS imports ("
+            " source TEXT PRIMARY KEY"
+            ")"
+        )
+
+    def get(self, voice_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM voices WHERE voice_id = ?", (voice_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _select_many(self, voice_ids: Iterable[str]) -> List[tuple]:
+        """(voice_id, data) rows of the given voices; call with the lock held"""
+        voice_ids = list(voice_ids)
+        rows = []
+        # Stay below SQLite's limit on bound parameters per statement
+        for i in range(0, len(voice_ids), 500):
+            chunk = voice_ids[i:i + 500]
+            rows.extend(self._conn.execute(
+                f"SELECT voice_id, data FROM voices WHERE voice_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall())
+        return rows
+
+    def get_many(self, voice_ids: Iterable[str]) -> Dict[str, Dict]:
+        with self._lock:
+            rows = self._select_many(voice_ids)
+        return {voice_id: json.loads(data) for voice_id, data in rows}
+
+    def put_many(self, voices: Iterable[Dict]):
+        rows = [(voice['voice_id'], json.dumps(voice, ensure_ascii=False)) for voice in voices]
+        if not rows:
+            return
+        with self._lock:
+            # Upsert keeps the original rowid, and with it the list order
+            with self._transaction():
+                self._conn.executemany(
+                    "INSERT INTO voices (voice_id, data) VALUES (?, ?) "
+                    "ON CONFLICT(voice_id) DO UPDATE SET data = excluded.data",
+                    rows
+                )
+
+    def update(self, voice_id: str, changes: Dict) -> Optional[Dict]:
+        with self._lock:
+            with self._transaction():
+                row = self._conn.execute("SELECT data FROM voices WHERE voice_id = ?", (voice_id,)).fetchone()
+                if row is None:
+                    return None
+                voice = json.loads(row[0])
+                voice.update(changes)
+                self._conn.execute(
+                    "UPDATE voices SET data = ? WHERE voice_id = ?",
+                    (json.dumps(voice, ensure_ascii=False), voice_id)
+                )
+        return voice
+
+    def update_many(self, changes: Dict[str, Dict]) -> int:
+        if not changes:
+            return 0
+        with self._lock:
+            with self._transaction():
+                updates = []
+                for voice_id, data in self._select_many(changes):
+                    voice = json.loads(data)
+                    voice.update(changes[voice_id])
+                    updates.append((json.dumps(voice, ensure_ascii=False), voice_id))
+
+                self._conn.executemany("UPDATE voices SET data = ? WHERE voice_id = ?", updates)
+        return len(updates)
+
+    def delete(self, voice_id: str) -> bool:
+        with self._lock:
+            with self._transaction():
+                cursor = self._conn.execute("DELETE FROM voices WHERE voice_id = ?", (voice_id,))
+        return cursor.rowcount > 0
+
+    def import_once(self, source: str, voices: Iterable[Dict]) -> int:
+        rows = [(voice['voice_id'], json.dumps(voice, ensure_ascii=False)) for voice in voices]
+        with self._lock:
+            with self._transaction():
+                done = self._conn.execute("SELECT 1 FROM imports WHERE source = ?", (source,)).fetchone()
+                # A database filled before imports were recorded was migrated already
+                populated = self._conn.execute("SELECT 1 FROM voices LIMIT 1").fetchone()
+                self._conn.execute("INSERT OR IGNORE INTO imports (source) VALUES (?)", (source,))
+                if done or populated or not rows:
+                    return 0
+                cursor = self._conn.executemany(
+                    "INSERT INTO voices (voice_id, data) VALUES (?, ?) ON CONFLICT(voice_id) DO NOTHING",
+                    rows
+                )
+        return cursor.rowcount
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM voices ORDER BY rowid").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM voices").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """
+        Run the enclosed statements atomically
+
+        BEGIN IMMEDIATE takes the write lock up front, so a read-modify-write
+        in another process can't slip in between our read and our write.
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+
+def migrate_json_db(json_path: str, store: VoiceStore) -> int:
+    """
+    One-shot import of a legacy voice_db.json list into a store
+
+    The store records the import (see VoiceStore.import_once), so the JSON
+    file is left in place and later starts, including workers starting
+    together, neither import it again nor overwrite newer state with it.
+
+    Args:
+        json_path: Path of the legacy JSON database
+        store: Store to import into
+
+    Returns:
+        Number of voices imported
+    """
+    try:
+        with open(json_path, 'r') as f:
+            voices = json.load(f)
+    except FileNotFoundError:
+        return 0
+
+    imported = store.import_once(os.path.basename(json_path), voices)
+    if imported:
+        logging.info(f"Migrated {imported} voices from {json_path}")
+    return imported
@@ -0,0 +1,128 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .voice_store import VoiceStore
+
+
+def voice_changes_from_list(api_voice: Dict) -> Dict:
+    """
+    Map an entry of VoiceEnrollmentService.list_voices onto our voice fields
+
+    Args:
+        api_voice: One voice from the list API
+
+    Returns:
+        Fields to merge into the stored voice
+    """
+    return {
+        'status': api_voice.get('status'),
+        'created_at': api_voice.get('gmt_create')
+    }
+
+
+class VoiceSync:
+    """
+    Incremental sync of voice statuses from the DashScope voice list
+
+    Every page of the list is fetched, several pages at a time, and merged
+    into the store through a voice_id lookup. Only voices whose fields
+    actually changed are written. A sync is skipped while the previous one
+    is younger than the TTL.
+    """
+    def __init__(
+        self,
+        service,
+        store: VoiceStore,
+        page_size: int = 100,
+        workers: int = 4,
+        ttl: float = 30.0,
+        on_synced: Optional[Callable[[Iterable[str]], None]] = None
+    ):
+        """
+        Initialize the sync engine
+
+        Args:
+            service: DashScope VoiceEnrollmentService
+            store: Voice store to merge into
+            page_size: Voices requested per page
+            workers: Pages fetched concurrently
+            ttl: Seconds a completed sync stays fresh
+            on_synced: Called with the IDs of all voices seen in a sync
+        """
+        self.service = service
+        self.store = store
+        self.page_size = page_size
+        self.workers = workers
+        self.ttl = ttl
+        self.on_synced = on_synced
+
+        # Monotonic time of the last completed sync
+        self.last_synced: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def is_fresh(self, max_staleness: Optional[float] = None) -> bool:
+        """Whether the last sync is recent enough to serve the store as is"""
+        if max_staleness is None:
+            max_staleness = self.ttl
+        return self.last_synced is not None and time.monotonic() - self.last_synced <= max_staleness
+
+    def sync(self, max_staleness: Optional[float] = None) -> Dict[str, int]:
+        """
+        Sync the store with the API unless the last sync is still fresh
+
+        Args:
+            max_staleness: Override of the TTL for this call (0 forces a sync)
+
+        Returns:
+            Dictionary with the number of pages fetched, voices seen and
+            voices written (all 0 when the sync was skipped)
+        """
+        # Only one sync at a time; callers that waited reuse its result
+        with self._lock:
+            if self.is_fresh(max_staleness):
+                return {"pages": 0, "fetched": 0, "changed": 0}
+
+            api_voices, pages = self._fetch_all()
+            changed = self._merge(api_voices)
+            self.last_synced = time.monotonic()
+
+        if self.on_synced is not None:
+            self.on_synced(v.get('voice_id') for v in api_voices)
+
+        logging.info(f"Synced {len(api_voices)} voices from {pages} pages, {changed} changed")
+        return {"pages": pages, "fetched": len(api_voices), "changed": changed}
+
+    def _fetch_page(self, page_index: int) -> List[Dict]:
+        return self.service.list_voices(page_index=page_index, page_size=self.page_size) or []
+
+    def _fetch_all(self):
+        """Fetch pages in waves of `workers` until a short page marks the end"""
+        api_voices: List[Dict] = []
+        pages = 0
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="voice-sync") as executor:
+            while True:
+                wave = list(range(pages, pages + self.workers))
+                results = list(executor.map(self._fetch_page, wave))
+
+                for result in results:
+                    pages += 1
+                    api_voices.extend(result)
+                    if len(result) < self.page_size:
+                        return api_voices, pages
+
+    def _merge(self, api_voices: List[Dict]) -> int:
+        """Write the API fields of known voices that differ from the store"""
+        latest = {v.get('voice_id'): voice_changes_from_list(v) for v in api_voices}
+        local = self.store.get_many(latest)
+
+        changed = {
+            voice_id: latest[voice_id]
+            for voice_id, voice in local.items()
+            if any(voice.get(field) != value for field, value in latest[voice_id].items())
+        }
+
+        return self.store.update_many(changed)